@@ -2,21 +2,35 @@
 Simple Git module, where needed via powershell
 
 Some of the functions are based on the gitpython module
+
+Within a `session(repo)` the objects of that repo are read through a single `git cat-file --batch` process,
+and the results of describe and tag lookups are cached until HEAD or the refs change.
 """
 import os
 import subprocess
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import cachetools.func
-from github import Github
 from loguru import logger as log
 from packaging.version import parse
 
 # Token with no permissions
 PAT_NO_ACCESS = "github_pat" + "_11AAHPVFQ0IwtAmfc3cD5Z" + "_xOVII22ErRzzZ7xwwxRcNotUu4krMMbjinQcsMxjnWkYFBIDRWFlZMaHSqq"
 PAT = os.environ.get("GITHUB_TOKEN") or PAT_NO_ACCESS
-GH_CLIENT = Github(PAT)
+_gh_client = None
+
+
+def gh_client():
+    "the github client, PyGithub is only imported when github is used"
+    global _gh_client
+    if _gh_client is None:
+        from github import Github
+
+        _gh_client = Github(PAT)
+    return _gh_client
 
 
 def _run_local_git(
@@ -55,6 +69,162 @@ def _run_local_git(
     return result
 
 
+class GitSession:
+    """
+    A long-lived git session on a local repo.
+
+    - read_object - read an object ( <rev> or <rev>:<path> ) through a single `git cat-file --batch` process
+    - rev_parse - the hash of an object
+    - list_tree - the entries of a tree, without checking out the ref
+    - cached - cache a result until HEAD, the refs or the index of the repo change
+    """
+
+    def __init__(self, repo: Optional[Union[Path, str]] = None):
+        self.repo = Path(repo or ".")
+        self._lock = threading.RLock()
+        self._batch: Optional[subprocess.Popen] = None
+        self._cache: Dict[Any, Tuple[Tuple, Any]] = {}
+        self._trees: Dict[str, List[Tuple[str, str, str]]] = {}
+        self.git_dir: Optional[Path] = None
+        self.common_dir: Optional[Path] = None
+        result = _run_local_git(["git", "rev-parse", "--absolute-git-dir", "--git-common-dir"], repo=self.repo, expect_stderr=True)
+        if result:
+            git_dir, common_dir = result.stdout.decode("utf-8").splitlines()[:2]
+            self.git_dir = Path(git_dir)
+            self.common_dir = Path(common_dir) if Path(common_dir).is_absolute() else self.repo / common_dir
+
+    @property
+    def valid(self) -> bool:
+        return self.git_dir is not None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._batch:
+                self._batch.stdin.close()  # type: ignore
+                self._batch.wait()
+                self._batch = None
+
+    def read_object(self, name: str) -> Optional[Tuple[str, str, bytes]]:
+        "returns the hash, type and content of an object, or None if it is not found"
+        with self._lock:
+            if not self._batch:
+                self._batch = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    cwd=self.repo.absolute().as_posix(),
+                )
+            stdin, stdout = self._batch.stdin, self._batch.stdout
+            stdin.write(name.encode("utf-8") + b"\n")  # type: ignore
+            stdin.flush()  # type: ignore
+            header = stdout.readline().decode("utf-8").split()  # type: ignore
+            if len(header) != 3:
+                # <name> missing / ambiguous, or the process has ended
+                return None
+            sha, obj_type, size = header
+            content = stdout.read(int(size) + 1)[:-1]  # type: ignore
+            return sha, obj_type, content
+
+    def rev_parse(self, name: str) -> Optional[str]:
+        obj = self.read_object(name)
+        return obj[0] if obj else None
+
+    def list_tree(self, name: str) -> Optional[List[Tuple[str, str, str]]]:
+        "the (mode, hash, name) of the entries of a tree, trees are read only once per session"
+        obj = self.read_object(name)
+        if not obj or obj[1] != "tree":
+            return None
+        sha, _, content = obj
+        if sha not in self._trees:
+            entries = []
+            pos = 0
+            while pos < len(content):
+                space = content.index(b" ", pos)
+                nul = content.index(b"\0", space)
+                entries.append((content[pos:space].decode(), content[nul + 1 : nul + 21].hex(), content[space + 1 : nul].decode("utf-8")))
+                pos = nul + 21
+            self._trees[sha] = entries
+        return self._trees[sha]
+
+    def head(self) -> str:
+        "the content of .git/HEAD, a ref such as 'ref: refs/heads/master' or a commit hash if detached"
+        try:
+            return (self.git_dir / "HEAD").read_text().strip()  # type: ignore
+        except OSError:
+            return ""
+
+    def is_detached_at(self, rev: str) -> bool:
+        "HEAD is detached at the commit of rev"
+        head = self.head()
+        return bool(head) and not head.startswith("ref:") and head == self.rev_parse(f"{rev}^{{commit}}")
+
+    def is_clean(self) -> bool:
+        "the tracked files in the worktree have no changes, untracked files are ignored as `git checkout --force` keeps them"
+        result = _run_local_git(["git", "status", "--porcelain", "--untracked-files=no"], repo=self.repo, expect_stderr=True)
+        return bool(result) and not result.stdout.strip()  # type: ignore
+
+    def is_checked_out(self, rev: str) -> bool:
+        "HEAD is detached at the commit of rev, and the worktree is clean, so a forced checkout of rev would not change anything"
+        return self.is_detached_at(rev) and self.is_clean()
+
+    def state(self) -> Tuple:
+        "changes when HEAD, a branch or tag, or the index changes"
+        paths = [self.common_dir / "packed-refs", self.common_dir / "refs/tags", self.git_dir / "index"]  # type: ignore
+        mtimes: List[Optional[int]] = []
+        for path in paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return (self.head(), self.rev_parse("HEAD"), *mtimes)
+
+    def cached(self, key: Any, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            state = self.state()
+            if key in self._cache and self._cache[key][0] == state:
+                return self._cache[key][1]
+            result = func()
+            self._cache[key] = (state, result)
+            return result
+
+
+_sessions: Dict[Path, Tuple[GitSession, int]] = {}
+_sessions_lock = threading.Lock()
+
+
+@contextmanager
+def session(repo: Optional[Union[Path, str]] = None) -> Iterator[GitSession]:
+    """
+    Open a git session on a local repo, that is used by the functions in this module for that repo.
+    Sessions can be nested, the session is closed when the outermost block ends.
+    """
+    key = Path(repo or ".").resolve()
+    with _sessions_lock:
+        if key in _sessions:
+            git_session, count = _sessions[key]
+        else:
+            git_session, count = GitSession(repo), 0
+        _sessions[key] = (git_session, count + 1)
+    try:
+        yield git_session
+    finally:
+        with _sessions_lock:
+            git_session, count = _sessions.pop(key)
+            if count > 1:
+                _sessions[key] = (git_session, count - 1)
+            else:
+                git_session.close()
+
+
+def active_session(repo: Optional[Union[Path, str]] = None) -> Optional[GitSession]:
+    "the open session on a repo, if any"
+    if not _sessions:
+        return None
+    git_session = _sessions.get(Path(repo or ".").resolve(), (None, 0))[0]
+    return git_session if git_session and git_session.valid else None
+
+
 def clone(remote_repo: str, path: Path, shallow: bool = False, tag: Optional[str] = None) -> bool:
     """git clone [--depth 1] [--branch <tag_name>] <remote> <directory>"""
     cmd = ["git", "clone"]
@@ -80,7 +250,12 @@ def get_local_tag(repo: Optional[Union[str, Path]] = None, abbreviate: bool = Tr
         repo = Path(".")
     elif isinstance(repo, str):
         repo = Path(repo)
+    if git_session := active_session(repo):
+        return git_session.cached(("local_tag", abbreviate), lambda: _get_local_tag(repo, abbreviate))  # type: ignore
+    return _get_local_tag(repo, abbreviate)
 
+
+def _get_local_tag(repo: Path, abbreviate: bool) -> Union[str, None]:
     result = _run_local_git(["git", "describe"], repo=repo.as_posix(), expect_stderr=True)
     if not result:
         return None
@@ -102,17 +277,22 @@ def get_local_tags(repo: Optional[Path] = None, minver: Optional[str] = None) ->
     """
     get list of tag of a local repo
     """
-    if not repo:
-        repo = Path(".")
+    repo = Path(repo or ".")
+    if git_session := active_session(repo):
+        tags = git_session.cached("tags", lambda: _get_local_tags(repo))  # type: ignore
+    else:
+        tags = _get_local_tags(repo)
+    if minver:
+        tags = [tag for tag in tags if parse(tag) >= parse(minver)]
+    return sorted(tags)
+
 
+def _get_local_tags(repo: Path) -> List[str]:
     result = _run_local_git(["git", "tag", "-l"], repo=repo.as_posix(), expect_stderr=True)
     if not result or result.returncode != 0:
         return []
     tags = result.stdout.decode("utf-8").replace("\r", "").split("\n")
-    tags = [tag for tag in tags if tag.startswith("v")]
-    if minver:
-        tags = [tag for tag in tags if parse(tag) >= parse(minver)]
-    return sorted(tags)
+    return [tag for tag in tags if tag.startswith("v")]
 
 
 @cachetools.func.ttl_cache(maxsize=16, ttl=60)  # 60 seconds
@@ -123,7 +303,7 @@ def get_tags(repo: str, minver: Optional[str] = None) -> List[str]:
     if not repo or not isinstance(repo, str) or "/" not in repo:  # type: ignore
         return []
     try:
-        gh_repo = GH_CLIENT.get_repo(repo)
+        gh_repo = gh_client().get_repo(repo)
     except ConnectionError as e:
         # TODO: unable to capture the exeption
         log.warning(f"Unable to get tags - {e}")
@@ -138,6 +318,9 @@ def checkout_tag(tag: str, repo: Optional[Union[str, Path]] = None) -> bool:
     """
     checkout a specific git tag
     """
+    if (git_session := active_session(repo)) and git_session.is_checked_out(f"tags/{tag}"):
+        log.debug(f"{repo} is already at {tag}")
+        return True
     cmd = ["git", "checkout", "tags/" + tag, "--detach", "--quiet", "--force"]
     result = _run_local_git(cmd, repo=repo, expect_stderr=True, capture_output=True)
     if not result:
@@ -149,10 +332,70 @@ def checkout_tag(tag: str, repo: Optional[Union[str, Path]] = None) -> bool:
     return True
 
 
+def list_tree_folders(ref: str, path: str = "", repo: Optional[Union[Path, str]] = None) -> Optional[List[str]]:
+    """
+    list all folders below a path in a git tree, without checking out the ref
+    git ls-tree -r -d --name-only <ref> -- <path>
+
+    returns the folder paths relative to the repo root, or None if the ref or repo is not found
+    """
+    if git_session := active_session(repo):
+        return _walk_tree_folders(git_session, ref, path)
+    cmd = ["git", "ls-tree", "-r", "-d", "--name-only", ref]
+    if path:
+        cmd += ["--", path]
+    result = _run_local_git(cmd, repo=repo, expect_stderr=True)
+    if not result:
+        return None
+    return result.stdout.decode("utf-8").replace("\r", "").splitlines()
+
+
+def _walk_tree_folders(git_session: GitSession, ref: str, path: str) -> Optional[List[str]]:
+    "list_tree_folders, reading the trees from the session"
+    path = path.strip("/")
+    entries = git_session.list_tree(f"{ref}:{path}" if path else f"{ref}^{{tree}}")
+    if entries is None:
+        # ls-tree lists nothing for a path that is not in the tree of an existing ref
+        return [] if path and git_session.rev_parse(f"{ref}^{{tree}}") else None
+    # same order as ls-tree: each folder before its subfolders, in tree order
+    folders = [path] if path else []
+
+    def walk(parent: str, entries: List[Tuple[str, str, str]]):
+        for mode, sha, name in entries:
+            if mode == "40000":
+                folder = f"{parent}/{name}" if parent else name
+                folders.append(folder)
+                walk(folder, git_session.list_tree(sha) or [])
+
+    walk(path, entries)
+    return folders
+
+
+def get_ref_commits(repo: Optional[Union[Path, str]] = None) -> Optional[Dict[str, str]]:
+    """
+    get the commit hash of all tags and branches of a local repo, in a single git call
+    annotated tags are resolved to the commit they point to
+
+    returns a dict of full refname ( refs/tags/v1.20.0 , refs/heads/master ) -> commit hash, or None if the repo is not found
+    """
+    cmd = ["git", "for-each-ref", "--format=%(refname) %(objectname) %(*objectname)", "refs/tags", "refs/heads"]
+    result = _run_local_git(cmd, repo=repo, expect_stderr=True)
+    if not result:
+        return None
+    commits = {}
+    for line in result.stdout.decode("utf-8").replace("\r", "").splitlines():
+        refname, objectname, *peeled = line.split(" ")
+        commits[refname] = peeled[0] if peeled and peeled[0] else objectname
+    return commits
+
+
 def synch_submodules(repo: Optional[Union[Path, str]] = None) -> bool:
     """
     make sure any submodules are in syncj
     """
+    if not (Path(repo or ".") / ".gitmodules").exists():
+        # no submodules to sync
+        return True
     cmds = [
         ["git", "submodule", "sync", "--quiet"],
         ["git", "submodule", "update", "--quiet"],
@@ -170,6 +413,9 @@ def checkout_commit(commit_hash: str, repo: Optional[Union[Path, str]] = None) -
     """
     Checkout a specific commit
     """
+    if (git_session := active_session(repo)) and git_session.is_checked_out(commit_hash):
+        log.debug(f"{repo} is already at {commit_hash}")
+        return True
     cmd = ["git", "checkout", commit_hash, "--quiet", "--force"]
     result = _run_local_git(cmd, repo=repo, expect_stderr=True)
     if not result:
@@ -255,14 +501,23 @@ def pull(repo: Union[Path, str], branch: str = "main") -> bool:
     return result.returncode == 0
 
 
-def get_git_describe(folder: Optional[str] = None):
+def get_git_describe(folder: Optional[str] = None, ref: Optional[str] = None):
     """ "based on MicroPython makeversionhdr
     returns : current git tag, commits ,commit hash : "v1.19.1-841-g3446"
+    ref: describe this ref (branch, tag or commit) rather than the checked out HEAD
     """
+    if git_session := active_session(folder):
+        return git_session.cached(("describe", ref), lambda: _get_git_describe(folder, ref))
+    return _get_git_describe(folder, ref)
+
+
+def _get_git_describe(folder: Optional[str] = None, ref: Optional[str] = None):
     # Note: git describe doesn't work if no tag is available
+    # --dirty only applies to the working tree, so not to a ref
+    cmd = ["git", "describe", "--tags", "--always", "--match", "v[1-9].*"] + ([ref] if ref else ["--dirty"])
     try:
         git_describe = subprocess.check_output(
-            ["git", "describe", "--tags", "--dirty", "--always", "--match", "v[1-9].*"],
+            cmd,
             stderr=subprocess.STDOUT,
             universal_newlines=True,
             cwd=folder,
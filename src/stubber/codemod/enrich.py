@@ -3,8 +3,9 @@ Enrich firmware stubs by copying docstrings and parameter infromation from doc-s
 Both (.py or .pyi) files are supported.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from libcst.codemod import CodemodContext, diff_code, exec_transform_with_prettyprint
 from libcst.tool import _default_config  # type: ignore
@@ -20,7 +21,39 @@ from stubber.utils.post import run_black
 #########################################################################################
 
 
-def enrich_file(target_path: Path, docstub_path: Path, diff: bool = False, write_back: bool = False) -> Optional[str]:
+def index_docstubs(docstub_path: Path) -> Dict[str, Path]:
+    """
+    Index all doc-stubs in a folder by module name, including the aliases with and without a leading `u`.
+    A doc-stub with the exact module name is always preferred over an alias, and .pyi files over .py files.
+    """
+    files = sorted(docstub_path.rglob("*.pyi")) + sorted(docstub_path.rglob("*.py"))
+    index: Dict[str, Path] = {}
+    for docstub_file in files:
+        index.setdefault(docstub_file.stem, docstub_file)
+    for docstub_file in files:
+        # uos.pyi -> os , os.pyi -> uos
+        alias = docstub_file.stem[1:] if docstub_file.stem[0].lower() == "u" else "u" + docstub_file.stem
+        index.setdefault(alias, docstub_file)
+    return index
+
+
+def find_docstub(target_path: Path, docstub_path: Path, index: Optional[Dict[str, Path]] = None) -> Path:
+    """find a matching doc-stub file for a firmware stub, raises FileNotFoundError if there is none"""
+    if index is None:
+        index = index_docstubs(docstub_path)
+    if target_path.stem in index:
+        return index[target_path.stem]
+    raise FileNotFoundError(f"No doc-stub file found for {target_path}")
+
+
+def enrich_file(
+    target_path: Path,
+    docstub_path: Path,
+    diff: bool = False,
+    write_back: bool = False,
+    *,
+    index: Optional[Dict[str, Path]] = None,
+) -> Optional[str]:
     """
     Enrich a firmware stubs using the doc-stubs in another folder.
     Both (.py or .pyi) files are supported.
@@ -30,33 +63,24 @@ def enrich_file(target_path: Path, docstub_path: Path, diff: bool = False, write
         docstub_path: the path to the folder containg the doc-stubs
         diff: if True, return the diff between the original and the enriched source file
         write_back: if True, write the enriched source file back to the source_path
+        index: an index of the doc-stubs in the docstub_path, as returned by index_docstubs
 
     Returns:
     - None or a string containing the diff between the original and the enriched source file
     """
+    # find a matching doc-stub file in the docstub_path
+    docstub_file = find_docstub(target_path, docstub_path, index)
+    return merge_file(target_path, docstub_file, diff=diff, write_back=write_back)
+
+
+def merge_file(target_path: Path, docstub_file: Path, diff: bool = False, write_back: bool = False) -> Optional[str]:
+    """
+    Merge a single doc-stub file into a firmware stub.
+    Returns None or a string containing the diff between the original and the enriched source file
+    """
     config: Dict[str, Any] = _default_config()
     context = CodemodContext()
 
-    # find a matching doc-stub file in the docstub_path
-    docstub_file = None
-    candidates = []
-    for ext in [".py", ".pyi"]:
-        candidates = list(docstub_path.rglob(target_path.stem + ext))
-        if target_path.stem[0].lower() == "u":
-            # also look for candidates without leading u
-            candidates += list(docstub_path.rglob(target_path.stem[1:] + ext))
-        else:
-            # also look for candidates with leading u
-            candidates += list(docstub_path.rglob("u" + target_path.stem + ext))
-
-    for docstub_file in candidates:
-        if docstub_file.exists():
-            break
-        else:
-            docstub_file = None
-    if docstub_file is None:
-        raise FileNotFoundError(f"No doc-stub file found for {target_path}")
-
     log.debug(f"Merge {target_path} from {docstub_file}")
     # read source file
     oldcode = target_path.read_text()
@@ -81,28 +105,53 @@ def enrich_file(target_path: Path, docstub_path: Path, diff: bool = False, write
     return diff_code(oldcode, newcode, 5, filename=target_path.name) if diff else newcode
 
 
+def _merge_files(target_paths: List[Path], docstub_file: Path, write_back: bool) -> List[Optional[str]]:
+    """merge one doc-stub into all firmware stubs that use it, so the doc-stub is parsed only once"""
+    return [merge_file(target_path, docstub_file, diff=True, write_back=write_back) for target_path in target_paths]
+
+
 def enrich_folder(
-    source_folder: Path, docstub_path: Path, show_diff: bool = False, write_back: bool = False, require_docstub: bool = False
+    source_folder: Path,
+    docstub_path: Path,
+    show_diff: bool = False,
+    write_back: bool = False,
+    require_docstub: bool = False,
+    jobs: int = 1,
 ) -> int:
     """\
         Enrich a folder with containing firmware stubs using the doc-stubs in another folder.
-        
+        The doc-stub folder is indexed once, and the firmware stubs are grouped by their doc-stub.
+        With jobs > 1 the groups are enriched in parallel in a pool of processes.
+
         Returns the number of files enriched.
     """
-    count = 0
+    index = index_docstubs(docstub_path)
     # list all the .py and .pyi files in the source folder
     source_files = sorted(list(source_folder.rglob("**/*.py")) + list(source_folder.rglob("**/*.pyi")))
+    # group the source files by doc-stub
+    groups: Dict[Path, List[Path]] = {}
     for source_file in source_files:
         try:
-            diff = enrich_file(source_file, docstub_path, diff=True, write_back=write_back)
-            if diff:
-                count += 1
-                if show_diff:
-                    print(diff)
+            groups.setdefault(find_docstub(source_file, docstub_path, index), []).append(source_file)
         except FileNotFoundError as e:
             # no docstub to enrich with
             if require_docstub:
                 raise (FileNotFoundError(f"No doc-stub file found for {source_file}")) from e
+
+    if jobs > 1 and len(groups) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(groups))) as executor:
+            futures = [executor.submit(_merge_files, files, docstub_file, write_back) for docstub_file, files in groups.items()]
+            results = [f.result() for f in futures]
+    else:
+        results = [_merge_files(files, docstub_file, write_back) for docstub_file, files in groups.items()]
+
+    diffs = {f: d for files, group_diffs in zip(groups.values(), results) for f, d in zip(files, group_diffs)}
+    count = 0
+    for source_file in sorted(diffs):
+        if diff := diffs[source_file]:
+            count += 1
+            if show_diff:
+                print(diff)
     # run black on the destination folder
     # no Autoflake as this removes some relevan (unused) imports
     run_black(source_folder)
@@ -6,6 +6,7 @@
 # LICENSE file in the root directory of this source tree.
 #
 import argparse
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
@@ -26,6 +27,34 @@ from stubber.cst_transformer import (
 # # log = logging.getLogger(__name__)
 #########################################################################################
 
+Annotations = Dict[Tuple[str, ...], TypeInfo]
+
+
+@lru_cache(maxsize=128)
+def _parse_docstub(stub_file: str, mtime_ns: int, size: int) -> Tuple[str, Optional[cst.Module], Annotations]:
+    """read, parse and collect the annotations of a doc-stub, cached on the path, modification time and size"""
+    stub_source = Path(stub_file).read_text(encoding="utf-8")
+    if not stub_source:
+        return stub_source, None, {}
+    try:
+        stub_tree = cst.parse_module(stub_source)
+    except cst.ParserSyntaxError as e:
+        log.error(f"Error parsing {stub_file}: {e}")
+        return stub_source, None, {}
+    typing_collector = StubTypingCollector()
+    stub_tree.visit(typing_collector)
+    return stub_source, stub_tree, typing_collector.annotations
+
+
+def parse_docstub(stub_path: Path) -> Tuple[str, Optional[cst.Module], Annotations]:
+    """
+    Get the source, the parsed module and the annotations of a doc-stub.
+    The result is cached, so merging several files with the same doc-stub only parses it once.
+    The cached module and annotations are shared, and must not be modified.
+    """
+    stat = stub_path.stat()
+    return _parse_docstub(str(stub_path), stat.st_mtime_ns, stat.st_size)
+
 
 class MergeCommand(VisitorBasedCodemodCommand):
     """
@@ -65,32 +94,16 @@ class MergeCommand(VisitorBasedCodemodCommand):
         self.stack: List[str] = []
         # stubfile is the path to the doc-stub file
         self.stub_path = Path(stub_file)
-        # read the stub file from the path
-        self.stub_source = self.stub_path.read_text(encoding="utf-8")
         # store the annotations
-        self.annotations: Dict[
-            Tuple[str, ...],  # key: tuple of canonical class/function name
-            TypeInfo,  # value: TypeInfo
-        ] = {}
+        self.annotations: Annotations = {}
 
         self.stub_imports: Dict[str, ImportItem] = {}
         self.all_imports: List[Union[cst.Import, cst.ImportFrom]] = []
-        # parse the doc-stub file
-        if self.stub_source:
-            try:
-                # parse the doc-stub file
-                stub_tree = cst.parse_module(self.stub_source)
-            except cst.ParserSyntaxError as e:
-                log.error(f"Error parsing {self.stub_path}: {e}")
-                return
-            # create the collectors
-            typing_collector = StubTypingCollector()
-            import_collector = GatherImportsVisitor(context)
-            # visit the doc-stub file with all collectors
-            stub_tree.visit(typing_collector)
-            self.annotations = typing_collector.annotations
-
+        # read and parse the doc-stub file, or re-use an earlier parse of the same file
+        self.stub_source, stub_tree, self.annotations = parse_docstub(self.stub_path)
+        if stub_tree:
             # Store the imports that were added to the stub file
+            import_collector = GatherImportsVisitor(context)
             stub_tree.visit(import_collector)
             self.stub_imports = import_collector.symbol_mapping
             self.all_imports = import_collector.all_imports
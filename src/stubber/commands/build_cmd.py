@@ -9,6 +9,7 @@ from tabulate import tabulate
 from stubber.commands.cli import stubber_cli
 from stubber.publish.package import GENERIC_U
 from stubber.publish.publish import build_multiple
+from stubber.publish.pypi import set_offline
 from stubber.utils.config import CONFIG
 
 
@@ -20,8 +21,8 @@ from stubber.utils.config import CONFIG
     "-V",
     "versions",
     multiple=True,
-    default=[CONFIG.stable_version],
-    show_default=True,
+    default=lambda: [CONFIG.stable_version],
+    show_default="stable version",
     help="multiple: ",
 )
 @click.option(
@@ -54,6 +55,20 @@ from stubber.utils.config import CONFIG
     default=False,
     help="build package even if no changes detected",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    show_default=True,
+    help="number of packages to process in parallel",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="use the cached PyPI versions only",
+)
 def cli_build(
     family: str,
     versions: Union[str, List[str]],
@@ -61,6 +76,8 @@ def cli_build(
     boards: Union[str, List[str]],
     clean: bool,
     force: bool,
+    jobs: int,
+    offline: bool,
     # stub_type: str,
 ):
     """
@@ -74,6 +91,8 @@ def cli_build(
 
     # db = get_database(publish_path=CONFIG.publish_path, production=production)
     log.info(f"Build {family} {versions} {ports} {boards}")
+    if offline:
+        set_offline()
 
     results = build_multiple(
         family=family,
@@ -83,6 +102,7 @@ def cli_build(
         production=True,  # use production database during build
         force=force,
         clean=clean,
+        jobs=jobs,
     )
     # log the number of results with no error
     log.info(f"Built {len([r for r in results if not r['error']])} stub packages")
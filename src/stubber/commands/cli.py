@@ -1,14 +1,67 @@
 """
 command line interface - main group
 """
+import importlib
 import sys
+from typing import Dict, List, Optional
 
 import click
 from loguru import logger as log
 from stubber import __version__
 
 
-@click.group(chain=True)
+class LazyGroup(click.Group):
+    """
+    A click group that imports the module of a command only when that command is used.
+
+    - add_lazy_command - register a command by name, as "module:function", with its short help
+    - list_commands - the registered and the already imported commands
+    - get_command - import the module of the command on first use
+    - format_commands - list the commands in the help, without importing their modules
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # command name -> "module:function"
+        self.lazy_commands: Dict[str, str] = {}
+        # command name -> short help
+        self.lazy_help: Dict[str, str] = {}
+
+    def add_lazy_command(self, name: str, import_path: str, short_help: str = "") -> None:
+        self.lazy_commands[name] = import_path
+        self.lazy_help[name] = short_help
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            module_name, func_name = self.lazy_commands[cmd_name].split(":")
+            # importing the module adds the command to this group
+            command = getattr(importlib.import_module(module_name), func_name)
+            if cmd_name not in self.commands:
+                self.add_command(command, cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        # same as click.MultiCommand.format_commands, but uses the registered help of the commands that are not imported
+        names = self.list_commands(ctx)
+        if not names:
+            return
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            if command := self.commands.get(name):
+                if not command.hidden:
+                    rows.append((name, command.get_short_help_str(limit)))
+            else:
+                # shortened in the same way as the help of an imported command
+                rows.append((name, click.Command(name, help=self.lazy_help[name]).get_short_help_str(limit)))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+@click.group(chain=True, cls=LazyGroup)
 @click.version_option(package_name="micropython-stubber", prog_name="micropython-stubber✏️ ")
 @click.option(
     "-v",
@@ -33,15 +33,17 @@ from .cli import stubber_cli
 )
 @click.option("--diff", default=False, help="Show diff", show_default=True, is_flag=True)
 @click.option("--dry-run", default=False, help="Dry run does not write the files back", show_default=True, is_flag=True)
+@click.option("--jobs", "-j", type=int, default=1, show_default=True, help="number of files to enrich in parallel")
 def cli_enrich_folder(
     stubs_folder: Union[str, Path],
     docstubs_folder: Union[str, Path],
     diff: bool = False,
     dry_run: bool = False,
+    jobs: int = 1,
 ):
     """
     Enrich the stubs in stub_folder with the docstubs in docstubs_folder.
     """
     write_back = not dry_run
     log.info(f"Enriching {stubs_folder} with {docstubs_folder}")
-    _ = enrich_folder(Path(stubs_folder), Path(docstubs_folder), show_diff=diff, write_back=write_back, require_docstub=False)
+    _ = enrich_folder(Path(stubs_folder), Path(docstubs_folder), show_diff=diff, write_back=write_back, require_docstub=False, jobs=jobs)
@@ -32,6 +32,8 @@ from .cli import stubber_cli
 )
 @click.option("--family", "-f", "basename", default="micropython", help="Micropython family.", show_default=True)
 @click.option("--black/--no-black", "-b/-nb", default=True, help="Run black", show_default=True)
+@click.option("--jobs", "-j", type=int, default=1, show_default=True, help="number of rst files to process in parallel")
+@click.option("--force", is_flag=True, default=False, show_default=True, help="re-generate all docstubs, not only the changed ones")
 @click.pass_context
 def cli_docstubs(
     ctx: click.Context,
@@ -39,6 +41,8 @@ def cli_docstubs(
     target: str = CONFIG.stub_path.as_posix(),
     black: bool = True,
     basename: str = "micropython",
+    jobs: int = 1,
+    force: bool = False,
 ):
     """
     Build stubs from documentation.
@@ -64,7 +68,7 @@ def cli_docstubs(
     dst_path = Path(target) / f"{basename}-{v_tag}-docstubs"
 
     log.info(f"Get docstubs for MicroPython {utils.clean_version(v_tag, drop_v=False)}")
-    generate_from_rst(rst_path, dst_path, v_tag, release=release, suffix=".pyi")
+    generate_from_rst(rst_path, dst_path, v_tag, release=release, suffix=".pyi", jobs=jobs, force=force)
 
     # no need to generate .pyi in post processing
     log.info("::group:: start post processing of retrieved stubs")
@@ -29,12 +29,37 @@ from .cli import stubber_cli
 @click.option("--version", "--tag", default="", type=str, help="Version number to use. [default: Git tag]")
 @click.option("--pyi/--no-pyi", default=True, help="Create .pyi files for the (new) frozen modules", show_default=True)
 @click.option("--black/--no-black", default=True, help="Run black on the (new) frozen modules", show_default=True)
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    show_default=True,
+    help="number of manifests and port/board folders to process in parallel",
+)
+@click.option(
+    "--link",
+    "link_mode",
+    default="copy",
+    type=click.Choice(["copy", "reflink", "hardlink"]),
+    show_default=True,
+    help="How to write the frozen files, reflink and hardlink keep a single copy of each file in a blob store in the cache folder",
+)
+@click.option(
+    "--skip-unchanged/--no-skip-unchanged",
+    default=False,
+    show_default=True,
+    help="Only write the frozen files that changed since the previous run",
+)
 def cli_get_frozen(
     stub_folder: str = CONFIG.stub_path.as_posix(),
     # path: str = config.repo_path.as_posix(),
     version: str = "",
     pyi: bool = True,
     black: bool = True,
+    jobs: int = 1,
+    link_mode: str = "copy",
+    skip_unchanged: bool = False,
 ):
     """
     Get the frozen stubs for MicroPython.
@@ -58,7 +83,15 @@ def cli_get_frozen(
     family = "micropython"
     stub_path = Path(stub_folder) / f"{family}-{utils.clean_version(version, flat=True)}-frozen"
     stub_paths.append(stub_path)
-    freeze_any(stub_path, version=version, mpy_path=CONFIG.mpy_path, mpy_lib_path=CONFIG.mpy_lib_path)
+    freeze_any(
+        stub_path,
+        version=version,
+        mpy_path=CONFIG.mpy_path,
+        mpy_lib_path=CONFIG.mpy_lib_path,
+        jobs=jobs,
+        link_mode=link_mode,
+        skip_unchanged=skip_unchanged,
+    )
     log.info("::group:: start post processing of retrieved stubs")
-    utils.do_post_processing(stub_paths, pyi, black)
+    utils.do_post_processing(stub_paths, pyi, black, jobs=jobs)
     log.info("::group:: Done")
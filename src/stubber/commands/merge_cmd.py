@@ -43,11 +43,13 @@ from .cli import stubber_cli
     show_default=True,
     help="multiple: ",
 )
+@click.option("--jobs", "-j", type=int, default=1, show_default=True, help="number of files to enrich in parallel")
 def cli_merge_docstubs(
     versions: Union[str, List[str]],
     boards: Union[str, List[str]],
     ports: Union[str, List[str]],
     family: str,
+    jobs: int = 1,
 ):
     """
     Enrich the stubs in stub_folder with the docstubs in docstubs_folder.
@@ -60,4 +62,4 @@ def cli_merge_docstubs(
         versions = list(versions)
     # single version should be a string
     log.info(f"Merge docstubs for {family} {versions}")
-    _ = merge_all_docstubs(versions=versions, family=family, boards=boards, ports=ports, mpy_path=CONFIG.mpy_path)
+    _ = merge_all_docstubs(versions=versions, family=family, boards=boards, ports=ports, mpy_path=CONFIG.mpy_path, jobs=jobs)
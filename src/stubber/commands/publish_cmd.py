@@ -9,6 +9,7 @@ from loguru import logger as log
 from stubber.commands.cli import stubber_cli
 from stubber.publish.package import GENERIC_U
 from stubber.publish.publish import publish_multiple
+from stubber.publish.pypi import set_offline
 from tabulate import tabulate
 from stubber.utils.config import CONFIG
 
@@ -21,8 +22,8 @@ from stubber.utils.config import CONFIG
     "-V",
     "versions",
     multiple=True,
-    default=[CONFIG.stable_version],
-    show_default=True,
+    default=lambda: [CONFIG.stable_version],
+    show_default="stable version",
     help="multiple: ",
 )
 @click.option(
@@ -76,6 +77,20 @@ from stubber.utils.config import CONFIG
     default=False,
     help="clean folders after processing and publishing",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    type=int,
+    default=1,
+    show_default=True,
+    help="number of packages to process in parallel",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="use the cached PyPI versions only",
+)
 def cli_publish(
     family: str,
     versions: Union[str, List[str]],
@@ -86,6 +101,8 @@ def cli_publish(
     force: bool = False,
     dry_run: bool = False,
     clean: bool = False,
+    jobs: int = 1,
+    offline: bool = False,
 ):
     """
     Commandline interface to publish stubs.
@@ -98,6 +115,8 @@ def cli_publish(
     # db = get_database(publish_path=CONFIG.publish_path, production=production)
     destination = "pypi" if production else "test-pypi"
     log.info(f"Publish {family} {versions} {ports} {boards} to {destination}")
+    if offline:
+        set_offline()
 
     results = publish_multiple(
         family=family,
@@ -109,5 +128,6 @@ def cli_publish(
         force=force,
         dry_run=dry_run,
         clean=clean,
+        jobs=jobs,
     )
     log.info(tabulate(results, headers="keys"))
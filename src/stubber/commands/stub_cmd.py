@@ -20,10 +20,11 @@ from .cli import stubber_cli
 
 @stubber_cli.command(name="stub")
 @click.option("--source", "-s", type=click.Path(exists=True, file_okay=True, dir_okay=True))
-def cli_stub(source: Union[str, Path]):
+@click.option("--jobs", "-j", type=int, default=1, show_default=True, help="number of module groups to stub in parallel")
+def cli_stub(source: Union[str, Path], jobs: int = 1):
     "Create or update .pyi type hint files."
 
     log.info("Generate type hint files (pyi) in folder: {}".format(source))
-    OK = generate_pyi_files(Path(source))
-    do_post_processing([Path(source)], pyi=False, black=True)  # do not generate pyi files twice
+    OK = generate_pyi_files(Path(source), jobs=jobs)
+    do_post_processing([Path(source)], pyi=False, black_format=True)  # do not generate pyi files twice
     return 0 if OK else 1
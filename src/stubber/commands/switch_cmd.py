@@ -3,13 +3,13 @@ switch to a specific version of the micropython repos
 """
 
 
+import functools
 from pathlib import Path
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 import click
 
-import stubber.basicgit as git
-from stubber.utils.config import CONFIG
+from stubber.utils.config import CONFIG, micropython_versions
 from stubber.utils.repos import fetch_repos, repo_paths
 
 from .cli import stubber_cli
@@ -19,17 +19,45 @@ from .cli import stubber_cli
 #########################################################################################
 
 
-# get version list from Git tags in the repo that is provided on the command line
+FALLBACK_VERSION_LIST = ["v1.91.1", "v1.20.0", "latest"]
+"offline fallback"
 
-try:
-    VERSION_LIST = git.get_tags("micropython/micropython", minver="v1.9.3") + ["latest"]
-except Exception:
-    # offline fallback
-    VERSION_LIST = ["v1.91.1", "v1.20.0", "latest"]
+
+@functools.lru_cache(maxsize=None)
+def version_list() -> List[str]:
+    "get version list from the (cached) micropython git tags, only when a version needs to be checked"
+    try:
+        versions = micropython_versions(CONFIG.cache_path, CONFIG.mpy_path, minver="v1.9.3") + ["latest"]
+    except Exception:
+        versions = ["latest"]
+    return FALLBACK_VERSION_LIST if versions == ["latest"] else versions
+
+
+def __getattr__(name: str):
+    "VERSION_LIST can still be imported from this module"
+    if name == "VERSION_LIST":
+        return version_list()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def check_version(ctx: click.Context, param: click.Parameter, value: Optional[str]) -> Optional[str]:
+    "check the version against the version list, case insensitive, as click.Choice does"
+    if value is None:
+        return value
+    versions = version_list()
+    for version in versions:
+        if version.lower() == value.lower():
+            return version
+    raise click.BadParameter(f"{value!r} is not one of {', '.join(map(repr, versions))}.", ctx=ctx, param=param)
 
 
 @stubber_cli.command(name="switch")
-@click.argument("tag", required=False, type=click.Choice(VERSION_LIST, case_sensitive=False))
+@click.argument(
+    "tag",
+    required=False,
+    callback=check_version,
+    shell_complete=lambda ctx, param, incomplete: [v for v in version_list() if v.startswith(incomplete)],
+)
 @click.option("--path", "-p", default=CONFIG.repo_path.as_posix(), type=click.Path(file_okay=False, dir_okay=True))
 def cli_switch(path: Union[str, Path], tag: Optional[str] = None):
     """
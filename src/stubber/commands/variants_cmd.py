@@ -16,8 +16,8 @@ from .cli import stubber_cli
     "--Version",
     "-V",
     "version",
-    default=CONFIG.stable_version,
-    show_default=True,
+    default=lambda: CONFIG.stable_version,
+    show_default="stable version",
     help="The version of mpy-cross to use",
 )
 @click.option(
@@ -34,9 +34,10 @@ from .cli import stubber_cli
 def cli_variants(
     ctx: click.Context,
     target_folder: str = "",
-    version: str = CONFIG.stable_version,
+    version: str = "",
 ) -> int:
     """Update all variants of createstubs*.py."""
+    version = version or CONFIG.stable_version
     board_path = Path(stubber.__file__).parent / "board"
     if target_folder:
         target_path = Path(target_folder).absolute()
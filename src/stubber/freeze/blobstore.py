@@ -0,0 +1,161 @@
+"""
+Content-addressed store for the frozen files.
+
+Each unique file content is stored once as a blob, named after the sha256 of its content,
+and is materialized in the stubs folders as a reflink, a hard link or a copy of the blob.
+The store also records which blob was materialized for each file in a frozen stubs folder,
+so that unchanged files can be skipped on the next run.
+
+Note: a hard link shares the file with the blob and all other folders, a file that is changed in place
+(such as by black) changes all of them. Such blobs are detected by their changed size or mtime and are stored again.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from loguru import logger as log
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore # not available on Windows
+
+LINK_MODES = ["copy", "reflink", "hardlink"]
+FICLONE = 0x40049409  # linux ioctl to clone a file on btrfs / xfs
+INDEX_VERSION = 1
+
+
+def reflink(src: Path, dest: Path) -> bool:
+    "create a copy-on-write clone of src, returns False if the file system does not support this"
+    if fcntl is None:  # pragma: no cover
+        return False
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        dest.unlink(missing_ok=True)
+        return False
+
+
+class BlobStore:
+    """
+    Content-addressed store of file blobs.
+
+    - add - store the content of a file, and return its digest
+    - materialize - create a file with the content of a blob, as a reflink, hard link or copy
+    - folders - the digests of the files that were materialized in each folder
+    """
+
+    def __init__(self, path: Path, link_mode: str = "reflink"):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"link_mode must be one of {LINK_MODES}")
+        self.path = Path(path)
+        self.link_mode = link_mode
+        self._lock = threading.Lock()
+        self._digests: Dict[Tuple[str, int, int], str] = {}  # (path, mtime_ns, size) -> digest
+        # digest -> (size, mtime_ns) of the blob when it was stored
+        self.blobs: Dict[str, Tuple[int, int]] = {}
+        # folder -> target -> digest
+        self.folders: Dict[str, Dict[str, str]] = {}
+        self.stats: Dict[str, int] = {}
+        self.load()
+
+    @property
+    def index_file(self) -> Path:
+        return self.path / "index.json"
+
+    def load(self) -> None:
+        if not self.index_file.exists():
+            return
+        try:
+            data = json.loads(self.index_file.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read blob store index {self.index_file}: {e}")
+            return
+        if data.get("version") == INDEX_VERSION:
+            self.blobs = {d: tuple(s) for d, s in data.get("blobs", {}).items()}  # type: ignore
+            self.folders = data.get("folders", {})
+
+    def save(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            content = json.dumps({"version": INDEX_VERSION, "blobs": self.blobs, "folders": self.folders})
+        tmp = self.index_file.with_suffix(".tmp")
+        tmp.write_text(content)
+        tmp.replace(self.index_file)
+
+    def blob_path(self, digest: str) -> Path:
+        return self.path / digest[:2] / digest[2:]
+
+    def digest(self, file: Path) -> str:
+        "sha256 of the file content, cached on the path, mtime and size of the file"
+        stat = os.stat(file)
+        key = (str(file), stat.st_mtime_ns, stat.st_size)
+        if key not in self._digests:
+            self._digests[key] = hashlib.sha256(Path(file).read_bytes()).hexdigest()
+        return self._digests[key]
+
+    def _is_valid(self, digest: str) -> bool:
+        "the blob exists, and has not been changed in place since it was stored"
+        try:
+            stat = self.blob_path(digest).stat()
+        except OSError:
+            return False
+        return self.blobs.get(digest) == (stat.st_size, stat.st_mtime_ns)
+
+    def add(self, file: Path) -> str:
+        "store the content of a file, if it is not yet stored, and return its digest"
+        digest = self.digest(file)
+        if self._is_valid(digest):
+            return digest
+        blob = self.blob_path(digest)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        # write to a unique temp file, so that concurrent adds of the same content do not conflict
+        fd, tmp = tempfile.mkstemp(dir=blob.parent, prefix=".tmp")
+        os.close(fd)
+        shutil.copyfile(file, tmp)
+        os.replace(tmp, blob)
+        stat = blob.stat()
+        with self._lock:
+            self.blobs[digest] = (stat.st_size, stat.st_mtime_ns)
+        return digest
+
+    def materialize(self, digest: str, dest: Path) -> str:
+        "create dest with the content of the blob, returns the method used: reflink, hardlink or copy"
+        blob = self.blob_path(digest)
+        if dest.exists() or dest.is_symlink():
+            dest.unlink()
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        method = "copy"
+        if self.link_mode == "reflink" and reflink(blob, dest):
+            method = "reflink"
+        elif self.link_mode == "hardlink":
+            try:
+                os.link(blob, dest)
+                method = "hardlink"
+            except OSError:
+                pass
+        if method == "copy":
+            shutil.copyfile(blob, dest)
+        with self._lock:
+            self.stats[method] = self.stats.get(method, 0) + 1
+        return method
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def set_folder(self, folder: Path, targets: Dict[str, str]) -> None:
+        with self._lock:
+            self.folders[folder.as_posix()] = targets
+
+    def get_folder(self, folder: Path) -> Optional[Dict[str, str]]:
+        with self._lock:
+            return self.folders.get(folder.as_posix())
@@ -6,14 +6,16 @@ uses the manifest file to generate frozen stubs
 
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 from loguru import logger as log
 from stubber import utils
 from stubber.tools.manifestfile import MODE_FREEZE, ManifestFile, ManifestFileError, ManifestOutput
 from stubber.utils.config import CONFIG
 
+from .blobstore import BlobStore
 from .common import apply_frozen_module_fixes, get_freeze_path, get_portboard
 
 
@@ -50,45 +52,150 @@ def make_path_vars(
     }
 
 
-def freeze_one_manifest_2(manifest: Path, frozen_stub_path: Path, mpy_path: Path, mpy_lib_path: Path, version: str):
-    # apparently there can be multiple manifest files to a board ?
-    # save cwd for 'misbehaving' older esp8266 manifest files
-    cwd = Path.cwd()
+def get_manifest_files(manifest: Path, mpy_path: Path, mpy_lib_path: Path) -> Tuple[str, str, List[ManifestOutput]]:
+    """
+    Execute a manifest file, and return the port, board and the files to freeze.
+    Relative paths in the manifest are resolved using the path vars and the manifest location,
+    the process working directory is not changed.
+    """
     # so we need to get the port and board from the path
     log.info(f"input_manifest: {manifest}")
     port, board = get_portboard(manifest)
     log.info(f"port-board: '{port}-{board}'")
 
     path_vars = make_path_vars(port=port, board=board, mpy_path=mpy_path, mpy_lib_path=mpy_lib_path)
-    upy_manifest = ManifestFile(MODE_FREEZE, path_vars)
+    # assume manifest needs to be run from the port's folder
+    upy_manifest = ManifestFile(MODE_FREEZE, path_vars, cwd=path_vars["PORT_DIR"])
     try:
-        # assume manifestneeds to be run from the port's folder
-        os.chdir(path_vars["PORT_DIR"])
         upy_manifest.execute(manifest.as_posix())
     except ManifestFileError as er:
         log.error('freeze error executing "{}": {}'.format(manifest, er.args[0]))
         raise er
     log.info(f"total {len(upy_manifest.files())} files")
+    return port, board, upy_manifest.files()
 
-    # restore working directory
-    os.chdir(cwd)
-    # save the frozen files to the stubs
-    copy_frozen_to_stubs(frozen_stub_path, port, board, upy_manifest.files(), version, mpy_path=mpy_path)
+
+def _get_manifest_files(manifest: Path, mpy_path: Path, mpy_lib_path: Path) -> Union[Tuple[str, str, List[ManifestOutput]], Exception]:
+    "get_manifest_files for use in a worker process, returns the exception rather than raising it"
+    try:
+        return get_manifest_files(manifest, mpy_path, mpy_lib_path)
+    except Exception as e:
+        return e
 
 
-def copy_frozen_to_stubs(stub_path: Path, port: str, board: str, files: List[ManifestOutput], version: str, mpy_path: Path):
+def freeze_one_manifest_2(manifest: Path, frozen_stub_path: Path, mpy_path: Path, mpy_lib_path: Path, version: str):
+    # apparently there can be multiple manifest files to a board ?
+    port, board, files = get_manifest_files(manifest, mpy_path, mpy_lib_path)
+    # save the frozen files to the stubs
+    copy_frozen_to_stubs(frozen_stub_path, port, board, files, version, mpy_path=mpy_path)
+
+
+def freeze_manifests_2(
+    manifests: List[Path],
+    frozen_stub_path: Path,
+    mpy_path: Path,
+    mpy_lib_path: Path,
+    version: str,
+    jobs: int = 1,
+    store: Optional[BlobStore] = None,
+    skip_unchanged: bool = False,
+) -> int:
+    """
+    Process a list of manifests, and copy the frozen files to the stubs folder.
+    With jobs > 1 the manifests are executed in a pool of processes, and the port/board folders are copied in a pool of threads.
+    With a blob store, the files are materialized from the store instead, so that files frozen by multiple boards
+    are stored only once. With skip_unchanged
+    the files that have not changed since the previous run are not written again.
+    returns the number of manifests that were processed
+    """
+    if jobs > 1 and len(manifests) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_get_manifest_files, manifests, [mpy_path] * len(manifests), [mpy_lib_path] * len(manifests)))
+    else:
+        results = [_get_manifest_files(m, mpy_path, mpy_lib_path) for m in manifests]
+
+    # the last manifest for a port/board folder wins, as each copy replaces the folder
+    boards: Dict[Path, Tuple[str, str, List[ManifestOutput]]] = {}
+    count = 0
+    for manifest, result in zip(manifests, results):
+        if isinstance(result, Exception):
+            log.error(f"Error processing manifest {manifest} : {result}")
+            continue
+        count += 1
+        port, board, _ = result
+        freeze_path, _ = get_freeze_path(frozen_stub_path, port, board)
+        boards.pop(freeze_path, None)
+        boards[freeze_path] = result
+
+    if skip_unchanged:
+        # the stubs folder is not cleaned, so remove the port/board folders that are no longer frozen
+        for folder in frozen_stub_path.glob("*/*"):
+            if folder.is_dir() and folder.absolute() not in boards:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def copy_board(result: Tuple[str, str, List[ManifestOutput]]):
+        port, board, files = result
+        copy_frozen_to_stubs(
+            frozen_stub_path,
+            port,
+            board,
+            files,
+            version,
+            mpy_path=mpy_path,
+            store=store,
+            skip_unchanged=skip_unchanged,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        for future in [executor.submit(copy_board, result) for result in boards.values()]:
+            try:
+                future.result()
+            except Exception as e:
+                log.error(f"Error copying frozen files : {e}")
+                count -= 1
+    if store:
+        store.save()
+        log.info(f"frozen files: {', '.join(f'{n} {k}' for k, n in sorted(store.stats.items()))}")
+    return count
+
+
+def copy_frozen_to_stubs(
+    stub_path: Path,
+    port: str,
+    board: str,
+    files: List[ManifestOutput],
+    version: str,
+    mpy_path: Path,
+    store: Optional[BlobStore] = None,
+    skip_unchanged: bool = False,
+):
     """
     copy the frozen files from the manifest to the stubs folder
 
     stubpath = the destination : # stubs/{family}-{version}-frozen
+    store = materialize the files from a blob store, rather than copying them
+    skip_unchanged = keep the files in the folder that have not changed since the previous run (requires a store)
     """
     freeze_path, board = get_freeze_path(stub_path, port, board)
 
     log.info(f"copy frozen: {port}-{board} to {freeze_path}")
-    freeze_path.mkdir(parents=True, exist_ok=True)
-    # clean target folder
-    shutil.rmtree(freeze_path, ignore_errors=True)
+    if store:
+        materialize_frozen(freeze_path, files, store, skip_unchanged)
+    else:
+        # clean target folder
+        shutil.rmtree(freeze_path, ignore_errors=True)
+        freeze_path.mkdir(parents=True, exist_ok=True)
+        copy_frozen_files(freeze_path, files)
 
+    apply_frozen_module_fixes(freeze_path, mpy_path=mpy_path)
+
+    # make a module manifest
+    FAMILY = "micropython"
+    utils.make_manifest(freeze_path, FAMILY, port=port, board=board, version=version, stubtype="frozen")
+
+
+def copy_frozen_files(freeze_path: Path, files: List[ManifestOutput]):
+    "copy the frozen files to the folder"
     # print(tabulate(files))
     # copy the frozen files to the stubs
     for f in files:
@@ -102,8 +209,31 @@ def copy_frozen_to_stubs(stub_path: Path, port: str, board: str, files: List[Man
             raise er
             # try to continue
 
-    apply_frozen_module_fixes(freeze_path, mpy_path=mpy_path)
 
-    # make a module manifest
-    FAMILY = "micropython"
-    utils.make_manifest(freeze_path, FAMILY, port=port, board=board, version=version, stubtype="frozen")
+def materialize_frozen(freeze_path: Path, files: List[ManifestOutput], store: BlobStore, skip_unchanged: bool = False):
+    """
+    materialize the frozen files in the folder from the blob store.
+    With skip_unchanged, the files with the same content as in the previous run are kept, as well as their .pyi files,
+    all other files in the folder are removed.
+    """
+    targets = {Path(f.target_path).as_posix(): store.add(Path(f.full_path)) for f in files}
+    previous = store.get_folder(freeze_path) if skip_unchanged else None
+    if previous is None:
+        # clean target folder
+        shutil.rmtree(freeze_path, ignore_errors=True)
+        previous = {}
+    else:
+        keep = {t for t, d in targets.items() if previous.get(t) == d}
+        keep |= {str(Path(t).with_suffix(".pyi").as_posix()) for t in keep}
+        for file in [f for f in freeze_path.rglob("*") if f.is_file()]:
+            if file.relative_to(freeze_path).as_posix() not in keep:
+                file.unlink()
+    freeze_path.mkdir(parents=True, exist_ok=True)
+    for target, digest in targets.items():
+        dest = freeze_path / target
+        if previous.get(target) == digest and dest.exists():
+            store.count("unchanged")
+            continue
+        log.trace(f"materializing {target} in {freeze_path}")
+        store.materialize(digest, dest)
+    store.set_folder(freeze_path, targets)
@@ -17,7 +17,6 @@ The all_stubs folder should be mapped/symlinked to the micropython_stubs/stubs r
 # - 1.13 - using manifests.py, and support for variant
 # - 1.12 - using manifests.py, possible also include content of /port/modules folder ?
 # - 1.11 and older - include content of /port/modules folder if it exists
-import os
 import shutil  # start moving from os & glob to pathlib
 from pathlib import Path
 from typing import List, Optional
@@ -25,8 +24,9 @@ from typing import List, Optional
 from loguru import logger as log
 from packaging.version import Version
 from stubber import utils
+from stubber.freeze.blobstore import BlobStore
 from stubber.freeze.freeze_folder import freeze_folders  # Micropython < v1.12
-from stubber.freeze.freeze_manifest_2 import freeze_one_manifest_2
+from stubber.freeze.freeze_manifest_2 import freeze_manifests_2
 from stubber.utils.config import CONFIG
 from stubber.codemod.add_comment import AddComment
 
@@ -60,17 +60,29 @@ def add_comment_to_path(path: Path, comment: str) -> None:
     pass
 
 
-def freeze_any(stub_folder: Path, version: str, mpy_path: Optional[Path] = None, mpy_lib_path: Optional[Path] = None) -> int:
+def freeze_any(
+    stub_folder: Path,
+    version: str,
+    mpy_path: Optional[Path] = None,
+    mpy_lib_path: Optional[Path] = None,
+    jobs: int = 1,
+    link_mode: str = "copy",
+    skip_unchanged: bool = False,
+) -> int:
     """
     Get and parse the to-be-frozen .py modules for micropython to extract the static type information
      - requires that the MicroPython and Micropython-lib repos are checked out and available on a local path
      - repos should be cloned side-by-side as some of the manifests refer to micropython-lib scripts using a relative path
 
     The micropython-* repos must be checked out to the required version/tag.
+    With jobs > 1 the manifests of all ports and boards are processed in parallel.
+
+    With a link_mode of reflink or hardlink, or with skip_unchanged, the frozen files are stored once in a blob store
+    in the cache folder, and materialized in the stubs folder using the link_mode.
+    With skip_unchanged only the files that changed since the previous run are written.
 
     """
     count = 0
-    current_dir = os.getcwd()
     mpy_path = Path(mpy_path).absolute() if mpy_path else CONFIG.mpy_path.absolute()
     mpy_lib_path = Path(mpy_lib_path).absolute() if mpy_lib_path else CONFIG.mpy_path.absolute()
     if not stub_folder:
@@ -89,26 +101,29 @@ def freeze_any(stub_folder: Path, version: str, mpy_path: Optional[Path] = None,
         all_manifests = get_manifests(mpy_path)
 
         # process all_manifests under the ports folder and update the frozen files in the stubs folder
-        # we are goning to jump around, avoid relative paths
+        # the manifests are processed using absolute paths, without changing the working directory
         frozen_stub_path = frozen_stub_path.absolute()
         mpy_path = mpy_path.absolute()
         mpy_lib_path = mpy_lib_path.absolute()
 
+        store = BlobStore(CONFIG.cache_path / "frozen_blobs", link_mode) if link_mode != "copy" or skip_unchanged else None
         if len(all_manifests) > 0:
             log.info(f"manifests: {len(all_manifests)}")
-            shutil.rmtree(frozen_stub_path, ignore_errors=True)
+            if not skip_unchanged:
+                shutil.rmtree(frozen_stub_path, ignore_errors=True)
         else:
             log.warning("no manifests found")
-        for manifest in all_manifests:
-            try:
-                freeze_one_manifest_2(manifest, frozen_stub_path, mpy_path, mpy_lib_path, version)
-                count += 1
-            except Exception as e:
-                log.error(f"Error processing manifest {manifest} : {e}")
+        count = freeze_manifests_2(
+            all_manifests,
+            frozen_stub_path,
+            mpy_path,
+            mpy_lib_path,
+            version,
+            jobs=jobs,
+            store=store,
+            skip_unchanged=skip_unchanged,
+        )
 
     # add comment line to each file with the micropython version it was generated from
     add_comment_to_path(frozen_stub_path, f"# Micropython {version} frozen stubs")
-
-    # restore cwd
-    os.chdir(current_dir)
     return count
@@ -0,0 +1,254 @@
+"""
+Build the wheel and sdist of a stub-only package, without starting a poetry process.
+
+Only the subset of the `[tool.poetry]` section that is used by the stub packages is supported.
+Packages that use anything else raise an `UnsupportedPackageError`, so that the caller can fall back to `poetry build`.
+
+ref: https://peps.python.org/pep-0427/ , https://packaging.python.org/en/latest/specifications/core-metadata/
+"""
+
+import base64
+import csv
+import hashlib
+import io
+import re
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from packaging.version import Version
+
+from stubber import __version__
+
+WHEEL_TAG = "py3-none-any"
+# fixed timestamp for all archive members, so that an unchanged package builds to identical files
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+TAR_MTIME = 315532800  # 1980-01-01
+
+SUPPORTED_KEYS = {
+    "name",
+    "version",
+    "description",
+    "authors",
+    "license",
+    "readme",
+    "homepage",
+    "documentation",
+    "repository",
+    "keywords",
+    "classifiers",
+    "packages",
+    "include",
+    "exclude",
+    "dependencies",
+    "dev-dependencies",
+    "group",
+}
+
+
+class UnsupportedPackageError(Exception):
+    """The package uses pyproject features that are not supported by the stub builder"""
+
+
+def distribution_name(name: str) -> str:
+    """The escaped name as used in the distribution file names"""
+    return re.sub(r"[-_.]+", "_", name).lower()
+
+
+def poetry_constraint(constraint: str) -> str:
+    """
+    Convert a poetry version constraint to a PEP 440 specifier.
+    Supports the caret (^), tilde (~) and wildcard (*) operators, and plain PEP 440 specifiers.
+    """
+    if "|" in constraint:
+        raise UnsupportedPackageError(f"Unsupported version constraint {constraint}")
+    specs = []
+    for part in constraint.split(","):
+        part = part.strip()
+        if part in ("*", ""):
+            continue
+        if part[0] in "^~" and part[1:2] != "=":
+            release = [int(p) for p in Version(part[1:]).release]
+            if part[0] == "^":
+                # bump the first non-zero part, or the last part if all are zero
+                idx = next((i for i, p in enumerate(release) if p != 0), len(release) - 1)
+            else:
+                # ~1.2.3 -> <1.3 , ~1 -> <2
+                idx = 0 if len(release) == 1 else 1
+            upper = release[: idx + 1]
+            upper[-1] += 1
+            specs += [f">={part[1:]}", f"<{'.'.join(str(p) for p in upper)}{'.0' if len(upper) == 1 else ''}"]
+        elif part[0].isdigit():
+            specs.append(f"=={part}")
+        else:
+            specs.append(part.replace(" ", ""))
+    return ",".join(specs)
+
+
+def _author(author: str) -> Tuple[str, str]:
+    """split 'name <email>' into name and email"""
+    if m := re.match(r"^(?P<name>[^<]*?)\s*<(?P<email>[^>]+)>$", author.strip()):
+        return m["name"], m["email"]
+    return author.strip(), ""
+
+
+def core_metadata(package_path: Path, poetry: Dict[str, Any]) -> str:
+    """Create the core metadata (METADATA / PKG-INFO) for the package"""
+    unsupported = set(poetry) - SUPPORTED_KEYS
+    if unsupported:
+        raise UnsupportedPackageError(f"Unsupported keys in [tool.poetry]: {sorted(unsupported)}")
+
+    lines = [
+        "Metadata-Version: 2.1",
+        f"Name: {poetry['name']}",
+        f"Version: {Version(poetry['version'])}",
+        f"Summary: {poetry.get('description', '')}",
+    ]
+    if "homepage" in poetry:
+        lines.append(f"Home-page: {poetry['homepage']}")
+    if "license" in poetry:
+        lines.append(f"License: {poetry['license']}")
+    if poetry.get("keywords"):
+        lines.append(f"Keywords: {','.join(poetry['keywords'])}")
+    if poetry.get("authors"):
+        authors = [_author(a) for a in poetry["authors"]]
+        lines.append(f"Author: {', '.join(name for name, _ in authors)}")
+        if emails := [email for _, email in authors if email]:
+            lines.append(f"Author-email: {', '.join(emails)}")
+    requires_python = ""
+    requires_dist = []
+    for name, constraint in poetry.get("dependencies", {}).items():
+        if not isinstance(constraint, str):
+            raise UnsupportedPackageError(f"Unsupported dependency specification for {name}")
+        if name.lower() == "python":
+            requires_python = poetry_constraint(constraint)
+        else:
+            spec = poetry_constraint(constraint)
+            requires_dist.append(f"{name} ({spec})" if spec else name)
+    if requires_python:
+        lines.append(f"Requires-Python: {requires_python}")
+    lines.extend(f"Classifier: {c}" for c in poetry.get("classifiers", []))
+    lines.extend(f"Requires-Dist: {r}" for r in requires_dist)
+    for key in ("documentation", "repository"):
+        if key in poetry:
+            lines.append(f"Project-URL: {key.capitalize()}, {poetry[key]}")
+
+    readme = ""
+    if "readme" in poetry:
+        readme_path = package_path / poetry["readme"]
+        if readme_path.suffix.lower() == ".md":
+            lines.append("Description-Content-Type: text/markdown")
+        elif readme_path.suffix.lower() == ".rst":
+            lines.append("Description-Content-Type: text/x-rst")
+        readme = readme_path.read_text(encoding="utf-8")
+    return "\n".join(lines) + "\n\n" + readme
+
+
+def package_files(package_path: Path, poetry: Dict[str, Any]) -> List[Path]:
+    """
+    The sorted list of files to include in the distribution, relative to the package folder.
+    Combines the `packages` and `include` sections, and removes the files matching the `exclude` patterns.
+    """
+    files = set()
+    for pkg in poetry.get("packages", []):
+        if not isinstance(pkg, dict) or set(pkg) != {"include"}:
+            raise UnsupportedPackageError(f"Unsupported package specification {pkg}")
+        files.update(package_path.glob(pkg["include"]))
+    for pattern in poetry.get("include", []):
+        if not isinstance(pattern, str):
+            raise UnsupportedPackageError(f"Unsupported include specification {pattern}")
+        files.update(package_path.glob(pattern))
+    excluded = set()
+    for pattern in poetry.get("exclude", []):
+        for match in package_path.glob(pattern):
+            excluded.add(match)
+            excluded.update(match.rglob("*"))
+    return sorted(f.relative_to(package_path) for f in files - excluded if f.is_file())
+
+
+def _record_hash(data: bytes) -> str:
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def build_wheel(package_path: Path, pyproject: Dict[str, Any], dist_path: Path) -> Path:
+    """Build a PEP 427 wheel of the stub-only package, and return the path to the wheel file"""
+    poetry = pyproject["tool"]["poetry"]
+    metadata = core_metadata(package_path, poetry)
+    base = f"{distribution_name(poetry['name'])}-{Version(poetry['version'])}"
+    dist_info = f"{base}.dist-info"
+
+    contents: List[Tuple[str, bytes]] = [(f.as_posix(), (package_path / f).read_bytes()) for f in package_files(package_path, poetry)]
+    license_file = package_path / "LICENSE.md"
+    if license_file.exists():
+        contents.append((f"{dist_info}/{license_file.name}", license_file.read_bytes()))
+    contents.append((f"{dist_info}/METADATA", metadata.encode("utf-8")))
+    wheel = f"Wheel-Version: 1.0\nGenerator: micropython-stubber ({__version__})\nRoot-Is-Purelib: true\nTag: {WHEEL_TAG}\n"
+    contents.append((f"{dist_info}/WHEEL", wheel.encode("utf-8")))
+
+    record = io.StringIO()
+    writer = csv.writer(record, lineterminator="\n")
+    for name, data in contents:
+        writer.writerow([name, _record_hash(data), len(data)])
+    writer.writerow([f"{dist_info}/RECORD", "", ""])
+    contents.append((f"{dist_info}/RECORD", record.getvalue().encode("utf-8")))
+
+    dist_path.mkdir(parents=True, exist_ok=True)
+    wheel_path = dist_path / f"{base}-{WHEEL_TAG}.whl"
+    with zipfile.ZipFile(wheel_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in contents:
+            info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, data)
+    return wheel_path
+
+
+def build_sdist(package_path: Path, pyproject: Dict[str, Any], dist_path: Path) -> Path:
+    """Build a source distribution of the stub-only package, and return the path to the .tar.gz file"""
+    poetry = pyproject["tool"]["poetry"]
+    metadata = core_metadata(package_path, poetry)
+    base = f"{distribution_name(poetry['name'])}-{Version(poetry['version'])}"
+
+    files = set(package_files(package_path, poetry))
+    for extra in ["pyproject.toml", poetry.get("readme", ""), "LICENSE.md"]:
+        if extra and (package_path / extra).exists():
+            files.add(Path(extra))
+    contents = [(f.as_posix(), (package_path / f).read_bytes()) for f in sorted(files)]
+    contents.append(("PKG-INFO", metadata.encode("utf-8")))
+
+    dist_path.mkdir(parents=True, exist_ok=True)
+    sdist_path = dist_path / f"{base}.tar.gz"
+    with tarfile.open(sdist_path, "w:gz", format=tarfile.PAX_FORMAT) as tar:
+        for name, data in contents:
+            info = tarfile.TarInfo(f"{base}/{name}")
+            info.size = len(data)
+            info.mtime = TAR_MTIME
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+    return sdist_path
+
+
+def check_package(package_path: Path, pyproject: Dict[str, Any]) -> List[str]:
+    """
+    Check if the package can be built by the stub builder.
+    Returns a list of errors, an empty list means the package is valid.
+    Raises UnsupportedPackageError if the package uses features that are not supported by the stub builder.
+    """
+    errors = []
+    poetry = pyproject.get("tool", {}).get("poetry", {})
+    for key in ("name", "version", "description", "authors"):
+        if not poetry.get(key):
+            errors.append(f"[tool.poetry] is missing '{key}'")
+    if errors:
+        return errors
+    try:
+        Version(poetry["version"])
+    except ValueError:
+        errors.append(f"Invalid version: {poetry['version']}")
+        return errors
+    core_metadata(package_path, poetry)
+    if not package_files(package_path, poetry):
+        errors.append("No files to package")
+    return errors
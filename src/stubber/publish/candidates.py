@@ -11,10 +11,12 @@ what versions are available. This module provides functions to :
 """
 
 
+import json
 import re
 from pathlib import Path
 from typing import Any, Dict, Generator, List, Optional, Union
 
+from loguru import logger as log
 from packaging.version import parse
 
 import stubber.basicgit as git
@@ -28,6 +30,9 @@ OLDEST_VERSION = "1.16"
 
 V_LATEST = "latest"
 
+INDEX_VERSION = 1
+"Version of the candidate index file format, an index with a different version is discarded"
+
 
 def subfolder_names(path: Path):
     "returns a list of names of the subfolders of the given path"
@@ -43,7 +48,7 @@ def version_candidates(
     "get a list of versions for the given family and suffix"
     if path.exists():
         folder_re = prefix + "-(.*)-" + suffix
-        for name in subfolder_names(path):
+        for name in get_candidate_index().stub_folders(path):
             if match := re.match(folder_re, name):
                 folder_ver = clean_version(match[1])
                 if folder_ver == V_LATEST or parse(folder_ver) >= parse(oldest):
@@ -88,6 +93,133 @@ def list_micropython_port_boards(
     return list(subfolder_names(boards_path))
 
 
+def list_micropython_ports_boards(
+    version: str,
+    family: str = "micropython",
+    mpy_path: Path = CONFIG.mpy_path,
+) -> Optional[Dict[str, List[str]]]:
+    """
+    get all micropython ports and their boards for a given version, read from the git tree of that version
+    the repo is not checked out, so this can run in parallel with anything that uses the working tree.
+    returns a dict of port -> boards, or None if the version is not found in the repo
+    """
+    if family != "micropython":
+        # todo: add support for other families
+        return {}
+    folders = git.list_tree_folders(version_ref(version), "ports", repo=mpy_path)
+    if folders is None:
+        return None
+    ports: Dict[str, List[str]] = {}
+    for folder in folders:
+        parts = folder.split("/")
+        # ports/<port> or ports/<port>/boards/<board>
+        if len(parts) == 2:
+            ports.setdefault(parts[1], [])
+        elif len(parts) == 4 and parts[2] == "boards":
+            ports.setdefault(parts[1], []).append(parts[3])
+    return ports
+
+
+def version_ref(version: str) -> str:
+    "the full git refname for a micropython version, latest is the master branch"
+    return "refs/heads/master" if version in ["latest", "master"] else f"refs/tags/{version}"
+
+
+class CandidateIndex:
+    """
+    Cached index of the micropython ports and boards per version, and of the folders in the stub paths.
+    The index is stored as a json file in the cache folder, as the stub folders are keyed by their local path and mtime.
+
+    - ports_boards - the ports and boards of versions, keyed by the git commit of each version,
+        so a moved tag or a new commit on master is picked up automatically
+    - stub_folders - the subfolders of a stub path, keyed by the modification time of that path,
+        which changes when a folder is added or removed
+    """
+
+    def __init__(self, filename: Optional[Path] = None):
+        self.filename = filename
+        self.trees: Dict[str, Dict[str, List[str]]] = {}
+        self.folders: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        if not self.filename or not self.filename.exists():
+            return
+        try:
+            with open(self.filename, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read candidate index {self.filename}: {e}")
+            return
+        if data.get("version") != INDEX_VERSION:
+            log.debug(f"Discarding candidate index {self.filename} with version {data.get('version')}")
+            return
+        self.trees = data.get("trees", {})
+        self.folders = data.get("stub_folders", {})
+
+    def save(self) -> None:
+        "save the index if it has changed"
+        if not self.dirty or not self.filename:
+            return
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        content = json.dumps({"version": INDEX_VERSION, "trees": self.trees, "stub_folders": self.folders}, indent=1)
+        tmp = self.filename.with_suffix(".tmp")
+        tmp.write_text(content)
+        tmp.replace(self.filename)
+        self.dirty = False
+
+    def ports_boards(
+        self, versions: List[str], family: str = "micropython", mpy_path: Path = CONFIG.mpy_path
+    ) -> List[Optional[Dict[str, List[str]]]]:
+        """
+        get the ports and boards for each of the versions, in the same order.
+        The commits of all versions are resolved with a single git call, only the versions with a new commit are read from git.
+        """
+        commits = git.get_ref_commits(repo=mpy_path) or {}
+        shas = [commits.get(version_ref(v)) for v in versions]
+        result = [self.trees.get(sha) if sha else None for sha in shas]
+        missing = [i for i, r in enumerate(result) if r is None]
+        if missing:
+            log.debug(f"Reading ports and boards of {len(missing)} versions from {mpy_path}")
+            # the trees of all versions are read through a single git process
+            with git.session(mpy_path):
+                found = [list_micropython_ports_boards(versions[i], family=family, mpy_path=mpy_path) for i in missing]
+            for i, ports in zip(missing, found):
+                result[i] = ports
+                sha = shas[i]
+                if sha and ports is not None and family == "micropython":
+                    self.trees[sha] = ports
+                    self.dirty = True
+            self.save()
+        return result
+
+    def stub_folders(self, path: Path) -> List[str]:
+        "get the names of the subfolders of a stub path"
+        if not path.exists():
+            return []
+        key = str(path.resolve())
+        mtime = path.stat().st_mtime_ns
+        entry = self.folders.get(key)
+        if not entry or entry["mtime"] != mtime:
+            entry = {"mtime": mtime, "names": sorted(subfolder_names(path))}
+            self.folders[key] = entry
+            self.dirty = True
+            self.save()
+        return list(entry["names"])
+
+
+_index: Optional[CandidateIndex] = None
+
+
+def get_candidate_index() -> CandidateIndex:
+    """The shared candidate index, stored in the cache folder"""
+    global _index
+    if _index is None:
+        _index = CandidateIndex(CONFIG.cache_path / "candidate_index.json")
+    return _index
+
+
 def frozen_candidates(
     family: str = "micropython",
     versions: Union[str, List[str]] = V_LATEST,
@@ -196,11 +328,18 @@ def docstub_candidates(
 
 
 def board_candidates(
-    family: str = "micropython", versions: Union[str, List[str]] = V_LATEST, *, mpy_path: Path = CONFIG.mpy_path, pt: str = FIRMWARE_STUBS
+    family: str = "micropython",
+    versions: Union[str, List[str]] = V_LATEST,
+    *,
+    mpy_path: Path = CONFIG.mpy_path,
+    pt: str = FIRMWARE_STUBS,
+    index: Optional[CandidateIndex] = None,
 ):
     """
     generate a list of possible board stub candidates for the given family and version.
     list is based on the micropython repo:  /ports/<list of ports>/boards/<list of boards>
+    the folders are read from the git tree of each version, the micropython repo is not checked out.
+    the result is cached in the candidate index, keyed by the commit of each version.
     """
     if is_auto(versions):
         versions = list(micropython_versions(start=OLDEST_VERSION))
@@ -208,19 +347,16 @@ def board_candidates(
         versions = [versions]
     versions = [clean_version(v, flat=False) for v in versions]
 
-    for version in versions:
-        # check out the micropthon repo for this version
-        if version in ["latest", "master"]:
-            r = git.switch_branch(repo=mpy_path, branch="master")
-        else:
-            r = git.checkout_tag(repo=mpy_path, tag=version)
-        if not r:
-            return []
-        ports = list_micropython_ports(family=family, mpy_path=mpy_path)
-        for port in ports:
+    index = index or get_candidate_index()
+    for version, ports in zip(versions, index.ports_boards(versions, family=family, mpy_path=mpy_path)):
+        if ports is None:
+            return
+        for port, boards in ports.items():
+            if port in CONFIG.BLOCKED_PORTS:
+                continue
             # Yield the generic port exactly one time
             yield {"family": family, "version": version, "port": port, "board": GENERIC_U, "pkg_type": pt}
-            for board in list_micropython_port_boards(family=family, mpy_path=mpy_path, port=port):
+            for board in boards:
                 if board not in GENERIC:
                     yield {"family": family, "version": version, "port": port, "board": board, "pkg_type": pt}
 
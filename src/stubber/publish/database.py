@@ -1,18 +1,149 @@
-"""basic interface to the json database"""
+"""basic interface to the package database
 
+The database is an append-only JSON-lines file, with one package record per line.
+All records are loaded into an in-memory index keyed on (name, mpy_version, pkg_version) when the database is opened.
+New records are only appended to the file on commit, so a commit never rewrites the existing records.
+"""
+
+import json
+import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from loguru import logger as log
+from packaging.version import parse
+
+Record = Dict[str, Any]
+
+
+class PackageDB:
+    """
+    Append-only database of the published packages.
+
+    - add - add a record, the record is written to disk on the next commit
+    - commit - append all added records to the file in a single write
+    - rollback - discard all records added since the last commit
+    - transaction - context manager that commits on success, and rolls back on an exception
+    - get - get the record for a specific package version
+    - get_latest - get the record with the highest package version
+    - get_by_query - get all records that match a query (full scan)
+    """
+
+    def __init__(self, filename: Union[Path, str]):
+        self.filename = Path(filename)
+        self._records: List[Record] = []
+        self._pending: List[Record] = []
+        # (name, mpy_version) -> {pkg_version: record}
+        self._index: Dict[Tuple[str, str], Dict[str, Record]] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _load(self) -> None:
+        if not self.filename.exists():
+            return
+        with open(self.filename, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # an interrupted commit can leave a partial last line
+                    log.warning(f"Skipping invalid record on line {n} of {self.filename}")
+                    continue
+                self._index_record(record)
+
+    def _index_record(self, record: Record) -> None:
+        self._records.append(record)
+        # later records for the same package version replace earlier ones
+        self._index.setdefault((record["name"], record["mpy_version"]), {})[record["pkg_version"]] = record
 
-from pysondb import PysonDB
+    def add(self, record: Record) -> None:
+        """Add a record to the database, the record is written to disk on the next commit."""
+        record = dict(record)
+        self._pending.append(record)
+        self._index_record(record)
+
+    def commit(self) -> None:
+        """Append all pending records to the database file in a single write."""
+        if not self._pending:
+            return
+        lines = "".join(json.dumps(r) + "\n" for r in self._pending)
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.filename, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+
+    def rollback(self) -> None:
+        """Discard all records that have been added since the last commit."""
+        if not self._pending:
+            return
+        records = self._records[: len(self._records) - len(self._pending)]
+        self._pending, self._records, self._index = [], [], {}
+        for record in records:
+            self._index_record(record)
+
+    @contextmanager
+    def transaction(self) -> Iterator["PackageDB"]:
+        """Commit all records added in the block, or roll back if an exception occurs."""
+        try:
+            yield self
+        except Exception:
+            self.rollback()
+            raise
+        self.commit()
+
+    def get(self, name: str, mpy_version: str, pkg_version: str) -> Optional[Record]:
+        """Get the record of a specific package version."""
+        return self._index.get((name, mpy_version), {}).get(pkg_version)
+
+    def get_latest(self, name: str, mpy_version: str) -> Optional[Record]:
+        """Get the record with the highest package version for a package and micropython version."""
+        versions = self._index.get((name, mpy_version))
+        if not versions:
+            return None
+        return versions[max(versions, key=parse)]
+
+    def get_by_query(self, query: Callable[[Record], bool]) -> Dict[str, Record]:
+        """Get all records that match the query, by scanning all records"""
+        return {str(n): r for n, r in enumerate(self._records) if query(r)}
+
+    def get_all(self) -> List[Record]:
+        """Get all records, in the order they were added"""
+        return list(self._records)
+
+
+def migrate_jsondb(jsondb_path: Path, db: PackageDB) -> int:
+    """
+    Import all records from a PysonDB `.jsondb` file, returns the number of records.
+    """
+    with open(jsondb_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    with db.transaction():
+        for record in data.get("data", {}).values():
+            db.add(record)
+    return len(data.get("data", {}))
 
 
-def get_database(publish_path: Union[Path, str], production: bool = False) -> PysonDB:
+def get_database(publish_path: Union[Path, str], production: bool = False) -> PackageDB:
     """
-    Open the json database at the given path.
+    Open the package database at the given path.
 
     The database should be located in a subfolder `/publish` of the root path.
-    The database name is determined by the production flag as `package_data[_test].jsondb`
+    The database name is determined by the production flag as `package_data[_test].jsonl`
+    If only a PysonDB database `package_data[_test].jsondb` exists, its records are migrated to the new database.
     """
     publish_path = Path(publish_path)
-    db_path = publish_path / f"package_data{'' if production else '_test'}.jsondb"
-    return PysonDB(db_path.as_posix())
+    db_name = f"package_data{'' if production else '_test'}"
+    db_path = publish_path / f"{db_name}.jsonl"
+    db = PackageDB(db_path)
+    legacy_path = publish_path / f"{db_name}.jsondb"
+    if not db_path.exists() and legacy_path.exists():
+        count = migrate_jsondb(legacy_path, db)
+        log.info(f"Migrated {count} records from {legacy_path} to {db_path}")
+    return db
@@ -52,6 +52,7 @@ def merge_all_docstubs(
     boards: Optional[Union[List[str], str]] = None,
     *,
     mpy_path: Path = CONFIG.mpy_path,
+    jobs: int = 1,
 ):
     """merge docstubs and board stubs to merged stubs"""
     if versions is None:
@@ -103,7 +104,7 @@ def merge_all_docstubs(
                 log.debug(f"skipping {merged_path.name}, no firmware stubs found")
                 continue
         log.info(f"Merge docstubs for {merged_path.name} {candidate['version']}")
-        result = copy_and_merge_docstubs(board_path, merged_path, doc_path)
+        result = copy_and_merge_docstubs(board_path, merged_path, doc_path, jobs=jobs)
         # Add methods from docstubs to the firmware stubs that do not exist in the firmware stubs
         # Add the __call__ method to the machine.Pin and pyb.Pin class
         add_machine_pin_call(merged_path, candidate["version"])
@@ -113,12 +114,13 @@ def merge_all_docstubs(
     return merged
 
 
-def copy_and_merge_docstubs(fw_path: Path, dest_path: Path, docstub_path: Path):
+def copy_and_merge_docstubs(fw_path: Path, dest_path: Path, docstub_path: Path, jobs: int = 1):
     """
     Parameters:
         fw_path: Path to firmware stubs (absolute path)
         dest_path: Path to destination (absolute path)
         mpy_version: micropython version ('1.18')
+        jobs: number of files to enrich in parallel
 
     Copy files from the firmware stub folders to the merged
     - 1 - Copy all firmware stubs to the package folder
@@ -161,7 +163,7 @@ def copy_and_merge_docstubs(fw_path: Path, dest_path: Path, docstub_path: Path):
                 (dest_path / name).with_suffix(suffix).unlink()
 
     # 2 - Enrich the firmware stubs with the document stubs
-    result = enrich_folder(dest_path, docstub_path=docstub_path, write_back=True)
+    result = enrich_folder(dest_path, docstub_path=docstub_path, write_back=True, jobs=jobs)
 
     # copy the docstubs manifest.json file to the package folder
     # if (docstub_path / "modules.json").exists():
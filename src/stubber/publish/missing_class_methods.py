@@ -9,7 +9,7 @@ from loguru import logger as log
 
 from stubber.codemod.add_method import CallAdder, CallFinder
 from stubber.utils.config import CONFIG
-from stubber.utils.post import run_black
+from stubber.utils.post import format_files
 from stubber.utils.versions import clean_version
 
 
@@ -18,8 +18,7 @@ def add_machine_pin_call(merged_path: Path, version: str):
     Add the __call__ method to the machine.Pin and pyb.Pin class
     in all pyb and machine/umachine stubs
     """
-    # TODO: this should be done in the merge_docstubs.py to avoid needing to run black twice
-    # and to avoid having to parse the file twice
+    # TODO: this should be done in the merge_docstubs.py to avoid having to parse the file twice
 
     # first find the __call__ method in the default stubs
     mod_path = CONFIG.stub_path / f"micropython-{clean_version(version, flat=True)}-docstubs/machine.pyi"
@@ -44,5 +43,5 @@ def add_machine_pin_call(merged_path: Path, version: str):
         machine_module = cst.parse_module(source)
         new_module = machine_module.visit(CallAdder(call_finder.call_meth))
         mod_path.write_text(new_module.code)
-        run_black(mod_path)
+    format_files(mod_paths)
     return True
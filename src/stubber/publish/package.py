@@ -7,9 +7,8 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Union
 
 from loguru import logger as log
-from packaging.version import parse
-from pysondb import PysonDB
 
+from stubber.publish.database import PackageDB
 from stubber.publish.enums import COMBO_STUBS, CORE_STUBS, DOC_STUBS, StubSource
 from stubber.publish.stubpacker import StubPackage, StubSources
 from stubber.utils.config import CONFIG
@@ -49,7 +48,7 @@ def package_name(pkg_type: str, *, port: str = "", board: str = "", family: str
 
 
 def get_package(
-    db: PysonDB,
+    db: PackageDB,
     *,
     pkg_type: str,
     version: str,
@@ -80,22 +79,15 @@ def get_package(
     )
 
 
-def get_package_info(db: PysonDB, pub_path: Path, *, pkg_name: str, mpy_version: str) -> Union[Dict, None]:
+def get_package_info(db: PackageDB, pub_path: Path, *, pkg_name: str, mpy_version: str) -> Union[Dict, None]:
     """
     get a package's record from the json db if it can be found
     matches om the package name and version
         pkg_name: package name (micropython-esp32-stubs)
         mpy_version: micropython/firmware version (1.18)
     """
-    # find in the database
-    recs = db.get_by_query(query=lambda x: x["mpy_version"] == mpy_version and x["name"] == pkg_name)
-    # dict to list
-    recs = [{"id": key, "data": recs[key]} for key in recs]
-    # sort
-    packages = sorted(recs, key=lambda x: parse(x["data"]["pkg_version"]))
-
-    if len(packages) > 0:
-        pkg_from_db = packages[-1]["data"]
+    # find the latest package version in the database
+    if pkg_from_db := db.get_latest(pkg_name, mpy_version):
         log.debug(f"Found latest {pkg_name} == {pkg_from_db['pkg_version']}")
         return pkg_from_db
     else:
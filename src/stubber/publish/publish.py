@@ -3,17 +3,79 @@ prepare a set of stub files for publishing to PyPi
 
 !!Note: anything excluded in .gitignore is not packaged by poetry
 """
-from typing import Any, Dict, List, Union
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from loguru import logger as log
 
 from stubber.publish.candidates import board_candidates, filter_list
-from stubber.publish.database import get_database
+from stubber.publish.database import PackageDB, get_database
 from stubber.publish.enums import COMBO_STUBS
-from stubber.publish.package import GENERIC_U, get_package
+from stubber.publish.package import GENERIC_U, get_package, package_name
+from stubber.publish.pypi import CacheChanges, get_cache, prefetch_pypi_versions, use_cache
+from stubber.publish.stubpacker import Status, StubPackage
 from stubber.utils.config import CONFIG
 
 
+class DeferredDB:
+    """
+    Collects the records that a package adds to the database, so that they can be written
+    to the real database by the main process.
+    Only `add` and `commit` are supported, as that is all that `StubPackage.publish` uses.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+
+    def commit(self) -> None:
+        pass
+
+
+def _init_worker(cache_file: Optional[Path], offline: bool) -> None:
+    """
+    Use the PyPI cache and offline mode of the main process in a worker process, also when the workers are spawned.
+    The worker does not save the cache, but returns its changes to the main process.
+    """
+    use_cache(cache_file, offline=offline, read_only=True)
+
+
+def _executor(jobs: int) -> ProcessPoolExecutor:
+    """A process pool of `jobs` workers that share the PyPI cache of the main process"""
+    cache = get_cache()
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(cache.cache_file, cache.offline))
+
+
+def _failed(package: StubPackage, e: BaseException) -> Status:
+    """Record an error raised while building or publishing a package in its status"""
+    log.error(f"{package.package_name}: {e!r}")
+    package.status["error"] = repr(e)
+    return package.status
+
+
+def _build_one(package: StubPackage, force: bool, production: bool) -> Tuple[Status, CacheChanges]:
+    """Build a single package in a worker process, and return its status and the changes to the PyPI cache"""
+    try:
+        package.build(force=force, production=production)
+    except Exception as e:
+        _failed(package, e)
+    return package.status, get_cache().take_changes()
+
+
+def _publish_one(package: StubPackage, **kwargs) -> Tuple[Status, List[Dict[str, Any]], CacheChanges]:
+    """Publish a single package in a worker process, returns its status, the records for the database and the PyPI cache changes"""
+    deferred = DeferredDB()
+    try:
+        package.publish(db=deferred, **kwargs)  # type: ignore
+    except Exception as e:
+        # the package may already be uploaded, so still return its records and cache changes
+        _failed(package, e)
+    return package.status, deferred.records, get_cache().take_changes()
+
+
 def build_multiple(
     family: str = "micropython",
     versions: List[str] = ["v1.19.1"],
@@ -22,9 +84,11 @@ def build_multiple(
     production: bool = False,
     clean: bool = False,
     force: bool = False,
+    jobs: int = 1,
 ) -> List[Dict[str, Any]]:  # sourcery skip: default-mutable-arg
     """
     Build a bunch of stub packages
+    jobs: the number of packages to build concurrently, each in a separate process.
     """
     db = get_database(CONFIG.publish_path, production=production)
     results: List[Dict[str, Any]] = []
@@ -33,6 +97,24 @@ def build_multiple(
         log.error("Could not find any packages that can be build.")
         return results
     log.info(f"checking {len(worklist)} possible board candidates")
+    # get the published versions of all packages in one go
+    prefetch_pypi_versions([package_name(**todo) for todo in worklist], production=production)
+
+    if jobs > 1:
+        packages = get_packages(db, worklist)
+        with _executor(jobs) as executor:
+            futures = [executor.submit(_build_one, package, force, production) for package in packages]
+            for package, f in zip(packages, futures):
+                try:
+                    status, changes = f.result()
+                except Exception as e:
+                    # the worker process failed, continue with the other packages
+                    results.append(_failed(package, e))
+                    continue
+                results.append(status)
+                get_cache().merge(changes)
+        get_cache().save()
+        return results
 
     for todo in worklist:
         if package := get_package(db, **todo):
@@ -53,9 +135,12 @@ def publish_multiple(
     build: bool = False,
     force: bool = False,
     dry_run: bool = False,
+    jobs: int = 1,
 ) -> List[Dict[str, Any]]:  # sourcery skip: default-mutable-arg
     """
     Publish a bunch of stub packages
+    jobs: the number of packages to publish concurrently, each in a separate process.
+          The database is only updated by the main process.
     """
     db = get_database(CONFIG.publish_path, production=production)
     results = []
@@ -64,6 +149,38 @@ def publish_multiple(
     if len(worklist) == 0:
         log.error("Could not find any packages than can be published.")
         return results
+    # get the published versions of all packages in one go
+    prefetch_pypi_versions([package_name(**todo) for todo in worklist], production=production)
+
+    if jobs > 1:
+        packages = get_packages(db, worklist)
+        with _executor(jobs) as executor:
+            futures = [
+                executor.submit(
+                    _publish_one,
+                    package,
+                    clean=clean,
+                    force=force,
+                    build=build,
+                    production=production,
+                    dry_run=dry_run,
+                )
+                for package in packages
+            ]
+            for package, f in zip(packages, futures):
+                try:
+                    status, records, changes = f.result()
+                except Exception as e:
+                    # the worker process failed, continue to commit the records of the other packages
+                    results.append(_failed(package, e))
+                    continue
+                results.append(status)
+                get_cache().merge(changes)
+                with db.transaction():
+                    for record in records:
+                        db.add(record)
+        get_cache().save()
+        return results
 
     for todo in worklist:
         if package := get_package(db, **todo):
@@ -81,6 +198,17 @@ def publish_multiple(
     return results
 
 
+def get_packages(db: PackageDB, worklist: List[Dict[str, Any]]) -> List[StubPackage]:
+    """Get or create the packages for all items in the worklist"""
+    packages = []
+    for todo in worklist:
+        if package := get_package(db, **todo):
+            packages.append(package)
+        else:
+            log.error(f"Failed to create package for {todo}")
+    return packages
+
+
 def build_worklist(
     family: str,
     versions: Union[List[str], str],
@@ -1,35 +1,270 @@
 """
 Read versions published to PyPi or test.PyPi.
-uses the pypi-simple package to get the versions from the simple index.
+Uses the simple repository API (PEP 503 / PEP 691) to get the versions from the simple index.
+
+The versions are kept in an on-disk cache with a time-to-live.
+Stale entries are revalidated with the ETag of the previous response,
+and in offline mode only the cache is used.
 """
 
-from typing import Optional
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
-from packaging.version import Version, parse
-from pypi_simple import PyPISimple, NoSuchProjectError
+import requests
 from loguru import logger as log
+from packaging.version import InvalidVersion, Version, parse
+from pypi_simple import parse_filename
+from requests.adapters import HTTPAdapter
+
+from stubber.utils.config import CONFIG
+
+PYPI_ENDPOINT = "https://pypi.org/simple/"
+TEST_PYPI_ENDPOINT = "https://test.pypi.org/simple/"
+
+CACHE_TTL = 60 * 60
+"seconds before a cached entry is revalidated"
+ACCEPT = "application/vnd.pypi.simple.v1+json, application/vnd.pypi.simple.v1+html;q=0.2, text/html;q=0.01"
+TIMEOUT = 30
+
+CacheChanges = Dict[str, Dict[str, Dict]]
+"endpoint -> project -> cached entry"
 
 
-def get_pypi_versions(package_name: str, base: Optional[Version] = None, production: bool = True):
-    """Get all versions of a package from a PyPI endpoint."""
-    package_info = None
-    if production:
-        endpoint = "https://pypi.org/simple/"
+def endpoint_for(production: bool) -> str:
+    return PYPI_ENDPOINT if production else TEST_PYPI_ENDPOINT
+
+
+def _normalize(name: str) -> str:
+    "PEP 503 normalized project name"
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _parse_versions(response: requests.Response) -> List[str]:
+    """Get the versions of the wheels listed on a project page, from a JSON or HTML response"""
+    if "json" in response.headers.get("Content-Type", ""):
+        filenames = [f["filename"] for f in response.json().get("files", [])]
     else:
-        endpoint = "https://test.pypi.org/simple/"
+        filenames = re.findall(r"<a\s[^>]*>\s*([^<]+?)\s*</a>", response.text, flags=re.IGNORECASE)
+    versions = set()
+    for filename in filenames:
+        try:
+            _, version, package_type = parse_filename(filename)
+        except ValueError:
+            continue
+        if package_type == "wheel" and version:
+            versions.add(version)
+    return sorted(versions)
+
+
+class PyPIVersionCache:
+    """
+    On-disk cache of the wheel versions per project, for one or more simple index endpoints.
+
+    - get - get the versions of a project, from the cache or from the index
+    - prefetch - get the versions of many projects concurrently, over a shared connection pool
+
+    A read-only cache, as used in the worker processes, does not write the cache file.
+    The entries that it changed are passed to the main process with `take_changes` and `merge`,
+    so that only the main process saves the cache.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None, ttl: float = CACHE_TTL, offline: bool = False, read_only: bool = False):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.offline = offline
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        # endpoint -> project -> {"versions": [...], "etag": ..., "fetched": ...}
+        self.entries: Dict[str, Dict[str, Dict]] = {}
+        # the entries changed since the last call to take_changes
+        self.changes: CacheChanges = {}
+        self.load()
+
+    def load(self) -> None:
+        if not self.cache_file or not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read PyPI cache {self.cache_file}: {e}")
+
+    def save(self) -> None:
+        if not self.cache_file or self.read_only:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            content = json.dumps(self.entries, indent=1)
+        # a unique temp file, so that concurrent saves do not replace each other's temp file
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", prefix=self.cache_file.stem, dir=self.cache_file.parent)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def take_changes(self) -> CacheChanges:
+        """Get and reset the entries changed since the previous call"""
+        with self._lock:
+            changes, self.changes = self.changes, {}
+        return changes
+
+    def merge(self, changes: CacheChanges) -> None:
+        """Merge the entries changed by another process, keeping the most recently fetched entry"""
+        with self._lock:
+            for endpoint, projects in changes.items():
+                for project, entry in projects.items():
+                    current = self.entries.get(endpoint, {}).get(project)
+                    if current is None or entry["fetched"] >= current["fetched"]:
+                        self._set_entry(endpoint, project, entry)
+
+    def _set_entry(self, endpoint: str, project: str, entry: Dict) -> None:
+        "set an entry, the lock must be held"
+        self.entries.setdefault(endpoint, {})[project] = entry
+        self.changes.setdefault(endpoint, {})[project] = entry
+
+    def _entry(self, endpoint: str, project: str) -> Optional[Dict]:
+        with self._lock:
+            return self.entries.get(endpoint, {}).get(_normalize(project))
+
+    def _is_fresh(self, entry: Optional[Dict]) -> bool:
+        return entry is not None and (self.offline or time.time() - entry["fetched"] < self.ttl)
+
+    def _fetch(self, endpoint: str, project: str, session: requests.Session) -> List[str]:
+        """Fetch the project page, revalidating the cached entry with its ETag"""
+        entry = self._entry(endpoint, project)
+        headers = {"Accept": ACCEPT}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        url = f"{endpoint.rstrip('/')}/{_normalize(project)}/"
+        response = session.get(url, headers=headers, timeout=TIMEOUT)
+        if response.status_code == 304 and entry:
+            log.trace(f"{project} not modified on {endpoint}")
+            versions = entry["versions"]
+        elif response.status_code == 404:
+            log.debug(f"Package {project} not found on {endpoint}")
+            versions = []
+        else:
+            response.raise_for_status()
+            versions = _parse_versions(response)
+        with self._lock:
+            self._set_entry(
+                endpoint,
+                _normalize(project),
+                {
+                    "versions": versions,
+                    "etag": response.headers.get("ETag"),
+                    "fetched": time.time(),
+                },
+            )
+        return versions
+
+    def get(self, endpoint: str, project: str, session: Optional[requests.Session] = None, refresh: bool = False) -> List[str]:
+        """
+        Get the versions of a project, from the cache if it is fresh (or offline), else from the index.
+        refresh: revalidate the cached entry, even if it is fresh
+        """
+        entry = self._entry(endpoint, project)
+        if self._is_fresh(entry) and not (refresh and not self.offline):
+            return entry["versions"]  # type: ignore
+        if self.offline:
+            log.warning(f"Offline: no cached versions for {project} on {endpoint}")
+            return []
+        if session:
+            versions = self._fetch(endpoint, project, session)
+        else:
+            with requests.Session() as session:
+                versions = self._fetch(endpoint, project, session)
+        self.save()
+        return versions
+
+    def add_version(self, endpoint: str, project: str, version: str) -> None:
+        """Add a version that has just been published to the cached entry of the project"""
+        with self._lock:
+            entry = self.entries.get(endpoint, {}).get(_normalize(project))
+            if entry is None or version in entry["versions"]:
+                return
+            entry["versions"] = sorted(entry["versions"] + [version])
+            self._set_entry(endpoint, _normalize(project), entry)
+        self.save()
+
+    def prefetch(self, endpoint: str, projects: Iterable[str], max_workers: int = 8) -> Dict[str, List[str]]:
+        """
+        Get the versions of all projects, fetching the stale and missing entries concurrently
+        over a shared connection pool. The cache is saved once at the end.
+        """
+        projects = list(dict.fromkeys(projects))
+        stale = [p for p in projects if not self._is_fresh(self._entry(endpoint, p))]
+        if stale and not self.offline:
+            log.debug(f"Fetching versions of {len(stale)} packages from {endpoint}")
+            with requests.Session() as session:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+                session.mount(endpoint, adapter)
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {p: executor.submit(self._fetch, endpoint, p, session) for p in stale}
+                for p, f in futures.items():
+                    try:
+                        f.result()
+                    except requests.RequestException as e:
+                        log.warning(f"Could not get versions of {p} from {endpoint}: {e}")
+            self.save()
+        return {p: (self._entry(endpoint, p) or {}).get("versions", []) for p in projects}
+
+
+_cache: Optional[PyPIVersionCache] = None
+
+
+def get_cache() -> PyPIVersionCache:
+    """The shared PyPI version cache, stored in the cache folder"""
+    global _cache
+    if _cache is None:
+        _cache = PyPIVersionCache(CONFIG.cache_path / "pypi_versions.json")
+    return _cache
+
+
+def use_cache(cache_file: Optional[Path], offline: bool = False, read_only: bool = False) -> PyPIVersionCache:
+    """Use the cache in `cache_file`, for instance to share the cache of the main process with a worker process"""
+    global _cache
+    _cache = PyPIVersionCache(cache_file, offline=offline, read_only=read_only)
+    return _cache
+
+
+def set_offline(offline: bool = True) -> None:
+    """Only use the cached versions, do not contact PyPI"""
+    get_cache().offline = offline
+
+
+def prefetch_pypi_versions(package_names: Iterable[str], production: bool = True, max_workers: int = 8) -> None:
+    """Fetch the versions of many packages concurrently, and store them in the cache"""
+    get_cache().prefetch(endpoint_for(production), package_names, max_workers=max_workers)
+
 
-    try:
-        with PyPISimple(endpoint=endpoint) as client:
-            package_info = client.get_project_page(project=package_name)
-    except NoSuchProjectError:
-        log.debug(f"Package {package_name} not found on {endpoint}")
-        return []
+def add_published_version(package_name: str, version: str, production: bool = True) -> None:
+    """Add a version that has just been published to the cache, so that the next version is not based on stale data"""
+    get_cache().add_version(endpoint_for(production), package_name, version)
 
-    if not package_info:
-        return []
 
-    versions = [parse(pkg.version) for pkg in package_info.packages if pkg.package_type == "wheel" and pkg.version]
-    # print(versions)
+def get_pypi_versions(package_name: str, base: Optional[Version] = None, production: bool = True, refresh: bool = False):
+    """
+    Get all versions of a package from a PyPI endpoint.
+    refresh: ask the index for the versions, even if they are cached recently
+    """
+    endpoint = endpoint_for(production)
+    versions = []
+    for v in get_cache().get(endpoint, package_name, refresh=refresh):
+        try:
+            versions.append(parse(v))
+        except InvalidVersion:
+            continue
 
     if base:
         # if base provided then filter
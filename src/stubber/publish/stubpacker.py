@@ -1,9 +1,11 @@
 """Create a stub-only package for a specific version of micropython"""
 
+import functools
 import hashlib
 import json
 import shutil
 import subprocess
+from collections import Counter
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
 
@@ -19,11 +21,12 @@ from typing import NewType
 import tomli_w
 from loguru import logger as log
 from packaging.version import Version, parse
-from pysondb import PysonDB
 
+from stubber.publish import builder
 from stubber.publish.bump import bump_version
+from stubber.publish.database import PackageDB
 from stubber.publish.enums import StubSource
-from stubber.publish.pypi import Version, get_pypi_versions
+from stubber.publish.pypi import Version, add_published_version, get_pypi_versions
 from stubber.utils.config import CONFIG
 from stubber.utils.versions import clean_version
 
@@ -39,6 +42,23 @@ STUB_SKIPPER = {
     
 }
 
+MANIFEST_VERSION = 1
+"version of the file hash manifest format"
+
+
+def writes_pyproject(method):
+    """write the changes to the pyproject.toml file only once, after the decorated method returns or raises"""
+
+    @functools.wraps(method)
+    def wrapper(self: "StubPackage", *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.write_pyproject()
+            self.log_toml_io()
+
+    return wrapper
+
 
 class StubPackage:
     """
@@ -54,11 +74,13 @@ class StubPackage:
         - to_json - return the package as json
 
         - create_update_pyproject_toml - create or update the `pyproject.toml` file
+        - write_pyproject - write the in-memory `pyproject.toml` to disk, if it has been changed
         - create_readme - create the readme file
         - create_license - create the license file
         - copy_stubs - copy the stubs to the package folder
         - update_included_stubs - update the included stubs in the `pyproject.toml` file
-        - create_hash - create a hash of the package files
+        - calculate_hash - create a hash of the package files, using the file hash manifest
+        - changed_files - list the files that changed since the hashes were last updated
 
         - update_package_files - combines clean, copy, and create reeadme & updates
     """
@@ -89,6 +111,13 @@ class StubPackage:
             STUB_PATH - root-relative path to the folder where the stubs are stored ('./stubs').
 
         """
+        # in-memory copy of the pyproject.toml file
+        self._pyproject: Optional[Dict[str, Any]] = None
+        self._pyproject_path: Optional[Path] = None
+        self._pyproject_dirty = False
+        self.toml_io: Counter = Counter()
+        "number of pyproject.toml reads and writes, and how many were saved by caching"
+
         if json_data is not None:
             self.from_dict(json_data)
 
@@ -103,6 +132,7 @@ class StubPackage:
             self.stub_hash = None  # intial hash
             """hash of the the stub files"""
             self.create_update_pyproject_toml()
+            self.write_pyproject()
 
             self.stub_sources: StubSources = []
             # save the stub sources
@@ -136,45 +166,38 @@ class StubPackage:
     @property
     def pkg_version(self) -> str:
         "return the version of the package"
-        # read the version from the toml file
-        _toml = self.toml_path
-        if not _toml.exists():
+        # read the version from the (cached) toml file
+        pyproject = self.pyproject
+        if pyproject is None:
             return self.mpy_version
-        with open(_toml, "rb") as f:
-            pyproject = tomllib.load(f)
         ver = pyproject["tool"]["poetry"]["version"]
         return str(parse(ver)) if ver != "latest" else ver
 
     @pkg_version.setter
     def pkg_version(self, version: str) -> None:
         # sourcery skip: remove-unnecessary-cast
-        "set the version of the package"
+        "set the version of the package, the change is written to disk by `write_pyproject()`"
         if not isinstance(version, str):  # type: ignore
             version = str(version)
-        # read the current file
-        _toml = self.toml_path
-        try:
-            with open(_toml, "rb") as f:
-                pyproject = tomllib.load(f)
-            pyproject["tool"]["poetry"]["version"] = version
-            # update the version in the toml file
-            with open(_toml, "wb") as output:
-                tomli_w.dump(pyproject, output)
-        except FileNotFoundError as e:
-            raise FileNotFoundError(f"pyproject.toml file not found at {_toml}") from e
-
-    def update_pkg_version(self, production: bool) -> str:
+        pyproject = self.pyproject
+        if pyproject is None:
+            raise FileNotFoundError(f"pyproject.toml file not found at {self.toml_path}")
+        pyproject["tool"]["poetry"]["version"] = version
+        self.pyproject = pyproject
+
+    def update_pkg_version(self, production: bool, refresh: bool = False) -> str:
         """Get the next version for the package"""
         return (
             self.get_prerelease_package_version(production)
             if self.mpy_version == "latest"
-            else self.get_next_package_version(production)
+            else self.get_next_package_version(production, refresh=refresh)
         )
 
     def get_prerelease_package_version(self, production: bool = False) -> str:
         """Get the next prerelease version for the package."""
         rc = 1
-        if describe := get_git_describe(CONFIG.mpy_path.as_posix()):
+        # the latest version is built from master, whatever is checked out
+        if describe := get_git_describe(CONFIG.mpy_path.as_posix(), ref="master"):
             # use versiontag and the nummer of commits since the last tag
             # "v1.19.1-841-g3446"
             # 'v1.22.0-preview-19-g8eb7721b4'
@@ -191,10 +214,13 @@ class StubPackage:
         else:
             raise ValueError("cannot determine next version number micropython")
 
-    def get_next_package_version(self, prod: bool = False, rc=False) -> str:
-        """Get the next version for the package."""
+    def get_next_package_version(self, prod: bool = False, rc=False, refresh: bool = False) -> str:
+        """
+        Get the next version for the package.
+        refresh: get the published versions from PyPI, rather than from the (recent) cache
+        """
         base = Version(self.pkg_version)
-        if pypi_versions := get_pypi_versions(self.package_name, production=prod, base=base):
+        if pypi_versions := get_pypi_versions(self.package_name, production=prod, base=base, refresh=refresh):
             # get the latest version from pypi
             self.pkg_version = str(pypi_versions[-1])
         else:
@@ -205,28 +231,59 @@ class StubPackage:
     # -----------------------------------------------
     @property
     def pyproject(self) -> Union[Dict[str, Any], None]:
-        "parsed pyproject.toml or None"
-        pyproject = None
+        """parsed pyproject.toml or None
+
+        The file is only read once, and then kept in memory.
+        Changes must be assigned back to `pyproject` to be written to disk by `write_pyproject()`.
+        """
         _toml = self.toml_path
+        if self._pyproject is not None and self._pyproject_path == _toml:
+            self.toml_io["read_saved"] += 1
+            return self._pyproject
+        pyproject = None
         if (_toml).exists():
             with open(_toml, "rb") as f:
                 pyproject = tomllib.load(f)
+            self.toml_io["read"] += 1
+        self._pyproject, self._pyproject_path, self._pyproject_dirty = pyproject, _toml, False
         return pyproject
 
     @pyproject.setter
     def pyproject(self, pyproject: Dict) -> None:
+        if self._pyproject_dirty:
+            self.toml_io["write_saved"] += 1
+        self._pyproject, self._pyproject_path, self._pyproject_dirty = pyproject, self.toml_path, True
+
+    def write_pyproject(self) -> None:
+        """write the pyproject.toml file to disk, if it has been changed since it was read or last written"""
+        if not self._pyproject_dirty or self._pyproject is None:
+            return
         # check if the result is a valid toml file
-
+        content = tomli_w.dumps(self._pyproject)
         try:
-            tomllib.loads(tomli_w.dumps(pyproject))
+            tomllib.loads(content)
         except tomllib.TOMLDecodeError as e:
             print("Could not create a valid TOML file")
             raise (e)
         # make sure parent folder exists
-        _toml = self.toml_path
+        _toml = self._pyproject_path or self.toml_path
         (_toml).parent.mkdir(parents=True, exist_ok=True)
         with open(_toml, "wb") as output:
-            tomli_w.dump(pyproject, output)
+            output.write(content.encode("utf-8"))
+        self.toml_io["write"] += 1
+        self._pyproject_dirty = False
+
+    def forget_pyproject(self) -> None:
+        """drop the in-memory pyproject.toml, without writing it, so that it is read again from disk"""
+        self._pyproject, self._pyproject_path, self._pyproject_dirty = None, None, False
+
+    def log_toml_io(self) -> None:
+        """log the number of pyproject.toml reads and writes, and how many were saved by caching"""
+        io = self.toml_io
+        log.debug(
+            f"{self.package_name}: pyproject.toml {io['read']} reads, {io['write']} writes, "
+            f"saved {io['read_saved']} reads and {io['write_saved']} writes"
+        )
 
     # -----------------------------------------------
 
@@ -267,6 +324,7 @@ class StubPackage:
         self.create_update_pyproject_toml()
         # set pkg version after creating the toml file
         self.pkg_version = json_data["pkg_version"]
+        self.write_pyproject()
         self.stub_sources = []
         for name, path in json_data["stub_sources"]:
             if path.startswith("stubs/"):
@@ -497,21 +555,30 @@ class StubPackage:
             for f in (self.package_path).rglob(wc):
                 f.unlink()
 
-    def calculate_hash(self, include_md: bool = True) -> str:
-        # sourcery skip: reintroduce-else, swap-if-else-branches, use-named-expression
-        """
-        Create a SHA1 hash of all files in the package, excluding the pyproject.toml file itself.
-        the hash is based on the content of the .py/.pyi and .md files in the package.
-        if include_md is False , the .md files are not hased, allowing the files in the packeges to be compared simply
-        As a single has is created across all files, the files are sorted prior to hashing to ensure that the hash is stable.
+    @property
+    def manifest_path(self) -> Path:
+        "the path to the file hash manifest, stored next to the `package.json` file"
+        return self.package_path / "hash_manifest.json"
 
-        A changed hash will not indicate which of the files in the package have been changed.
-        """
-        # BUF_SIZE is totally arbitrary,
-        BUF_SIZE = 65536 * 16  # lets read stuff in 16 x 64kb chunks!
+    def read_manifest(self) -> Dict[str, Any]:
+        """read the file hash manifest, or return an empty manifest if it does not exist or cannot be read"""
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {"version": MANIFEST_VERSION, "files": {}, "published": {}}
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> None:
+        """write the file hash manifest to disk"""
+        self.package_path.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(manifest, f, indent=4)
 
-        file_hash = hashlib.sha1()
-        # Stubs Only
+    def hashed_files(self, include_md: bool = True) -> List[Path]:
+        """The sorted list of files that are included in the package hash"""
         files = list((self.package_path).rglob("**/*.pyi"))
         if include_md:
             files += (
@@ -519,24 +586,104 @@ class StubPackage:
                 + [self.package_path / "README.md"]
                 # do not include [self.toml_file]
             )
-        for file in sorted(files):
-            # TODO: Extract function to allow for retry on file not found
+        return sorted(files)
+
+    def update_manifest(self) -> Dict[str, Any]:
+        """
+        Update the file hash manifest with the current state of the package files, and return it.
+
+        Each file is recorded with its size, mtime and SHA1 digest.
+        If the size, mtime and the set of files are unchanged since the manifest was last written,
+        the package hashes are taken from the manifest without reading any of the files.
+        Otherwise all files are read once to calculate both package hashes, and only the digests of
+        the files that have changed are replaced.
+        """
+        # BUF_SIZE is totally arbitrary,
+        BUF_SIZE = 65536 * 16  # lets read stuff in 16 x 64kb chunks!
+
+        manifest = self.read_manifest()
+        files: Dict[str, Tuple[Path, int, int]] = {}
+        for file in self.hashed_files(include_md=True):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                log.warning(f"File not found {file}")
+                # ignore file not found errors to allow the hash to be created WHILE GIT / VIRUS SCANNERS HOLD LINGERING FILES
+                continue
+            files[file.relative_to(self.package_path).as_posix()] = (file, stat.st_size, stat.st_mtime_ns)
+
+        known = manifest["files"]
+        if (
+            "hash" in manifest
+            and set(known) == set(files)
+            and all(known[rel]["size"] == size and known[rel]["mtime"] == mtime for rel, (_, size, mtime) in files.items())
+        ):
+            log.trace(f"{self.package_name}: hash manifest is up to date")
+            return manifest
+
+        # The package hash is a single hash across the content of all files, the files are sorted prior to hashing to ensure that the hash is stable.
+        pkg_hash = hashlib.sha1()
+        stub_hash = hashlib.sha1()
+        updated = {}
+        for rel, (file, size, mtime) in files.items():
+            unchanged = rel in known and known[rel]["size"] == size and known[rel]["mtime"] == mtime
+            file_hash = hashlib.sha1()
             try:
                 with open(file, "rb") as f:
                     while True:
                         data = f.read(BUF_SIZE)
                         if not data:
                             break
-                        file_hash.update(data)
+                        pkg_hash.update(data)
+                        if file.suffix == ".pyi":
+                            stub_hash.update(data)
+                        if not unchanged:
+                            file_hash.update(data)
             except FileNotFoundError:
                 log.warning(f"File not found {file}")
-                # ignore file not found errors to allow the hash to be created WHILE GIT / VIRUS SCANNERS HOLD LINGERING FILES
-        return file_hash.hexdigest()
+                continue
+            digest = known[rel]["digest"] if unchanged else file_hash.hexdigest()
+            updated[rel] = {"size": size, "mtime": mtime, "digest": digest}
+
+        manifest["files"] = updated
+        manifest["hash"] = pkg_hash.hexdigest()
+        manifest["stub_hash"] = stub_hash.hexdigest()
+        self.write_manifest(manifest)
+        return manifest
+
+    def calculate_hash(self, include_md: bool = True) -> str:
+        """
+        Create a SHA1 hash of all files in the package, excluding the pyproject.toml file itself.
+        the hash is based on the content of the .py/.pyi and .md files in the package.
+        if include_md is False , the .md files are not hased, allowing the files in the packeges to be compared simply
+        As a single has is created across all files, the files are sorted prior to hashing to ensure that the hash is stable.
+
+        The hashes are cached in the file hash manifest, use `changed_files()` to find out which files have changed.
+        """
+        manifest = self.update_manifest()
+        return manifest["hash"] if include_md else manifest["stub_hash"]
+
+    def changed_files(self, include_md: bool = True) -> List[str]:
+        """
+        Return the (package relative) files that have been added, changed or removed
+        since the hashes were last updated by `update_hashes()`.
+        """
+        manifest = self.update_manifest()
+        current = {rel: info["digest"] for rel, info in manifest["files"].items()}
+        published = manifest["published"]
+        changed = sorted(rel for rel in set(current) | set(published) if current.get(rel) != published.get(rel))
+        if not include_md:
+            changed = [rel for rel in changed if rel.endswith(".pyi")]
+        return changed
 
     def update_hashes(self, ret=False) -> None:
         """Update the package hashes. Resets is_changed() to False"""
-        self.hash = self.calculate_hash()
-        self.stub_hash = self.calculate_hash(include_md=False)
+        manifest = self.update_manifest()
+        self.hash = manifest["hash"]
+        self.stub_hash = manifest["stub_hash"]
+        # remember the file digests, so that changes can be reported per file
+        manifest["published"] = {rel: info["digest"] for rel, info in manifest["files"].items()}
+        self.write_manifest(manifest)
 
     def is_changed(self, include_md: bool = True) -> bool:
         """Check if the package has changed, based on the current and the stored hash.
@@ -565,6 +712,8 @@ class StubPackage:
         """Run a poetry commandline in the package folder.
         Note: this may write some output to the console ('All set!')
         """
+        # poetry reads the pyproject.toml file from disk
+        self.write_pyproject()
         # check for pyproject.toml in folder
         if not (self.package_path / "pyproject.toml").exists():  # pragma: no cover
             log.error(f"No pyproject.toml file found in {self.package_path}")
@@ -608,13 +757,41 @@ class StubPackage:
             json.dump(self.to_dict(), f, indent=4)
 
     def check(self) -> bool:
-        """check if the package is valid by running `poetry check`
-        Note: this will write some output to the console ('All set!')
+        """check if the package is valid.
+        Stub-only packages are checked in-process, other packages by running `poetry check`
+        Note: `poetry check` will write some output to the console ('All set!')
         """
+        _pyproject = self.pyproject
+        if _pyproject is not None:
+            try:
+                errors = builder.check_package(self.package_path, _pyproject)
+            except builder.UnsupportedPackageError as e:
+                log.debug(f"{self.package_name}: {e}, using poetry check")
+            else:
+                for error in errors:
+                    log.error(f"{self.package_name}: {error}")
+                return not errors
         return self.run_poetry(["check", "-vvv"])
 
     def poetry_build(self) -> bool:
-        """build the package by running `poetry build`"""
+        """build the package wheel and sdist.
+        Stub-only packages are built in-process, with `poetry build` as a fallback for other packages
+        """
+        _pyproject = self.pyproject
+        if _pyproject is not None:
+            try:
+                # the sdist includes the pyproject.toml file
+                self.write_pyproject()
+                dist_path = self.package_path / "dist"
+                wheel = builder.build_wheel(self.package_path, _pyproject, dist_path)
+                sdist = builder.build_sdist(self.package_path, _pyproject, dist_path)
+                log.trace(f"{self.package_name}: built {wheel.name} and {sdist.name}")
+                return True
+            except builder.UnsupportedPackageError as e:
+                log.debug(f"{self.package_name}: {e}, using poetry build")
+            except (OSError, ValueError) as e:
+                log.error(f"{self.package_name}: build failed: {e}")
+                return False
         return self.run_poetry(["build", "-vvv"])
 
     def poetry_publish(self, production: bool = False) -> bool:
@@ -668,6 +845,8 @@ class StubPackage:
             )
             self.status["error"] = "Skipped, stub folder(s) missing"
             shutil.rmtree(self.package_path.as_posix())
+            # do not re-create the package folder from the in-memory pyproject.toml
+            self.forget_pyproject()
             self._publish = False  # type: ignore
             return False
         try:
@@ -680,10 +859,12 @@ class StubPackage:
             return False
         return True
 
+    @writes_pyproject
     def build(
         self,
         production: bool,  # PyPI or Test-PyPi - USED TO FIND THE NEXT VERSION NUMBER
         force=False,  # BUILD even if no changes
+        refresh=False,  # get the published versions from PyPI, not from the cache
     ) -> (
         bool
     ):  # sourcery skip: default-mutable-arg, extract-duplicate-method, require-parameter-annotation
@@ -695,6 +876,7 @@ class StubPackage:
 
         :param production: PyPI or Test-PyPi -
         :param force: BUILD even if no changes
+        :param refresh: get the published versions from PyPI, not from the cache
         :return: True if the package was built
         """
         log.info(f"Build: {self.package_path.name}")
@@ -708,13 +890,14 @@ class StubPackage:
         if self.is_changed():
             log.info(f"Found changes to package sources: {self.package_name} {self.pkg_version} ")
             log.trace(f"Old hash {self.hash} != New hash {self.calculate_hash()}")
+            log.debug(f"{self.package_name}: changed files: {self.changed_files()}")
         elif force:
             log.info(f"Force build: {self.package_name} {self.pkg_version} ")
 
         if self.is_changed() or force:
             #  Build the distribution files
             old_ver = self.pkg_version
-            self.pkg_version = self.update_pkg_version(production)
+            self.pkg_version = self.update_pkg_version(production, refresh=refresh)
             self.status["version"] = self.pkg_version
             # to get the next version
             log.debug(
@@ -730,9 +913,10 @@ class StubPackage:
                 return False
         return True
 
+    @writes_pyproject
     def publish(
         self,
-        db: PysonDB,
+        db: PackageDB,
         *,
         production: bool,  # PyPI or Test-PyPi
         build=False,  #
@@ -762,13 +946,14 @@ class StubPackage:
             build = True
 
         if build or force or self.is_changed():
-            self.build(production=production, force=force)
+            # only an actual publish needs the published versions to be up to date
+            self.build(production=production, force=force, refresh=not dry_run)
 
         if not self._publish:
             log.debug(f"{self.package_name}: skip publishing")
             return False
 
-        self.update_pkg_version(production=production)
+        self.update_pkg_version(production=production, refresh=not dry_run)
         # Publish the package to PyPi, Test-PyPi or Github
         if self.is_changed() or force:
             if self.mpy_version == "latest":
@@ -792,6 +977,9 @@ class StubPackage:
                 self.status["result"] = (
                     "Published to PyPi" if production else "Published to Test-PyPi"
                 )
+                if not dry_run:
+                    # the cached versions are not updated until they expire
+                    add_published_version(self.package_name, self.pkg_version, production=production)
                 self.update_hashes()
                 if dry_run:
                     log.warning(f"{self.package_name}: Dry run, not saving to database")
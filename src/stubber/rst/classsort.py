@@ -5,11 +5,11 @@ ref : https://stackoverflow.com/questions/34964878/python-generate-a-dictionaryt
 with modification 
 """
 import re
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from loguru import logger as log
 
-__all__ = ["sort_classes"]
+__all__ = ["sort_classes", "ClassOrder"]
 RE_CLASS = re.compile(r"class\s+(?P<class>\w+)(\((?P<parent>\w*)\))?")
 
 
@@ -75,3 +75,70 @@ def sort_classes(classes: List[str]):
     for node in forest:
         list_node(node, l_sorted)
     return l_sorted
+
+
+class ClassOrder:
+    """
+    Incremental version of sort_classes, that keeps the parent-child relations of the classes as they are added or removed.
+    The sorted list is only rebuilt after a change, and then in a single walk over the classes.
+    The order is the same as sort_classes for a list of classes with unique names.
+    """
+
+    def __init__(self, classes: Optional[List[str]] = None):
+        self._classes: Dict[str, str] = {}  # class name -> class
+        self._parents: Dict[str, str] = {}  # class name -> parent name
+        self._children: Dict[str, List[str]] = {}  # parent name -> child names, also for parents that are not (yet) added
+        self._sorted: Optional[List[str]] = None
+        for c in classes or []:
+            self.add(c)
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+    @staticmethod
+    def _parse(c: str) -> Optional[Tuple[str, str]]:
+        "the class name and the name of its first parent, or '' if it has no parent. None if the class can not be parsed"
+        if m := RE_CLASS.match(c):
+            parent_name = m.group("parent").split(",")[0].strip() if m.group("parent") else ""
+            return m.group("class").strip(), parent_name
+        return None
+
+    def add(self, c: str):
+        "add a class, a class that can not be parsed is ignored, as in sort_classes"
+        if not (parsed := self._parse(c)):
+            return
+        class_name, parent_name = parsed
+        if not class_name or class_name in self._classes:
+            return
+        self._classes[class_name] = c
+        self._parents[class_name] = parent_name
+        self._children.setdefault(parent_name, []).append(class_name)
+        self._sorted = None
+
+    def remove(self, c: str):
+        if not (parsed := self._parse(c)):
+            return
+        class_name, parent_name = parsed
+        if not class_name or self._classes.get(class_name) != c:
+            return
+        del self._classes[class_name]
+        del self._parents[class_name]
+        self._children[parent_name].remove(class_name)
+        self._sorted = None
+
+    def sorted(self) -> List[str]:
+        "get the list of classes in parent-child order"
+        if self._sorted is None:
+            self._sorted = []
+            # classes without a parent in this module first, then the classes that are their own parent
+            roots = [n for n, p in self._parents.items() if p != n and (p == "" or p not in self._classes)]
+            roots += [n for n, p in self._parents.items() if p == n]
+            for name in roots:
+                self._walk(name, self._sorted)
+        return list(self._sorted)
+
+    def _walk(self, name: str, l_sorted: List[str]):
+        l_sorted.append(self._classes[name])
+        for child in self._children.get(name, []):
+            if child != name:
+                self._walk(child, l_sorted)
@@ -32,9 +32,9 @@ SourceDict is the 'base class'
 """
 from __future__ import annotations
 
-from typing import List, Optional, OrderedDict, Union
+from typing import Dict, List, Optional, OrderedDict, Union
 
-from .classsort import sort_classes
+from .classsort import ClassOrder
 
 # These are shown to import
 __all__ = [
@@ -45,6 +45,7 @@ __all__ = [
 ]
 
 EMPTY_DOCSTR = '""" """'
+MODULE_HEADER = ["docstr", "version", "comment", "imports", "constants"]
 
 
 def spaces(n: int = 4) -> str:
@@ -236,50 +237,64 @@ class ModuleSourceDict(SourceDict):
             classes() which returns a list of the class names in parent-child order, 
             add_import() which adds a list of imports to the module. 
         The __str__() method is also defined to return a string representation of the module.
+        The classes are indexed on their name as they are added, to avoid scanning all keys in find() and classes().
         """
+        # index of the classes: name before `(` -> key, and the parent-child order of the class keys
+        self._class_keys: Dict[str, str] = {}
+        self._class_order = ClassOrder()
         super().__init__(
-            [
-                ("docstr", [EMPTY_DOCSTR]),
-                ("version", ""),
-                ("comment", []),
-                ("imports", []),
-                ("constants", []),
-            ],
+            [(k, v) for k, v in zip(MODULE_HEADER, [[EMPTY_DOCSTR], "", [], [], []])],
             indent,
             body=0,
             lf=lf,
             name=name,
         )
 
+    def __setitem__(self, key, value):
+        indexed = key in self and isinstance(self[key], ClassSourceDict)
+        if indexed and not isinstance(value, ClassSourceDict):
+            self._unindex(key)
+        super().__setitem__(key, value)
+        if not indexed and isinstance(value, ClassSourceDict):
+            # an updated class keeps its place, as in the dict
+            self._class_keys.setdefault(key.split("(")[0], key)
+            self._class_order.add(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._unindex(key)
+
+    def pop(self, key, *args):
+        if key in self:
+            self._unindex(key)
+        return super().pop(key, *args)
+
+    def clear(self):
+        super().clear()
+        self._class_keys = {}
+        self._class_order = ClassOrder()
+
+    def _unindex(self, key: str):
+        short = key.split("(")[0]
+        if self._class_keys.get(short) == key:
+            del self._class_keys[short]
+            # another class with the same name before `(`
+            if other := next((k for k in self._class_order.sorted() if k != key and k.split("(")[0] == short), None):
+                self._class_keys[short] = other
+        self._class_order.remove(key)
+
     def sort(self):
         "make sure all classdefs are in order"
-        # new empty one
-        new = ModuleSourceDict(self.name, self.indent, self.lf)
-        # add the standard stuff using a dict comprehension
-        new.update(
-            {
-                k: v
-                for (k, v) in self.items()
-                if k
-                in [
-                    "docstr",
-                    "version",
-                    "comment",
-                    "imports",
-                    "constants",
-                ]
-            }
-        )
-        # then the classes, already sorted in parent-child order
-        for classname in self.classes():
-            new.update({classname: self[classname]})
-        # then the functions and other
-        new.update({k: v for (k, v) in self.items() if k.isdecimal() or k.startswith("def ")})
-        # now clear and update with new order
-        if len(self) != len(new):
+        # the standard stuff, then the classes in parent-child order, then the functions and other
+        order = [k for k in MODULE_HEADER if k in self]
+        order += self.classes()
+        order += [k for k in self.keys() if k.isdecimal() or k.startswith("def ")]
+        if len(self) != len(order):
             raise ValueError("Sort() changed the length of the dictionary")
-        self.clear()
-        self.update(new)
+        if list(self.keys()) != order:
+            # reorder in place, without rebuilding the dictionary
+            for k in order:
+                self.move_to_end(k)
 
     def __str__(self):
         """\
@@ -291,21 +306,17 @@ class ModuleSourceDict(SourceDict):
 
     def find(self, name: str) -> Union[str, None]:
         "find a classnode based on the name with or without the superclass"
-        keys = list(self.keys())
         if not name.startswith("class "):
             name = "class " + name
         # try full match first
-        if name in keys:
+        if name in self:
             return name
         # is there a partial ? - only match before `(`
-        name = name.split("(")[0]
-        return next((k for k in keys if name == k.split("(")[0]), None)
+        return self._class_keys.get(name.split("(")[0])
 
     def classes(self):
         "get a list of the class names in parent-child order"
-        classes = [k for k in self.keys() if isinstance(self[k], ClassSourceDict)]
-        # return sorted list
-        return sort_classes(classes)
+        return self._class_order.sorted()
 
     def add_import(self, imports: Union[str, List[str]]):
         "add a [list of] imports this module"
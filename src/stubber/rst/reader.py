@@ -87,6 +87,26 @@ from stubber.utils.config import CONFIG
 SEPERATOR = "::"
 
 
+class DocFixer:
+    """
+    Apply a list of (old, new) text replacements in a single pass over a text,
+    using one regex that matches any of the old strings, longest first.
+    """
+
+    def __init__(self, fixes: List[Tuple[str, str]]):
+        self.replacements = dict(fixes)
+        alternatives = sorted(self.replacements, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(old) for old in alternatives)) if alternatives else None
+
+    def __call__(self, text: str) -> str:
+        if not self.pattern:
+            return text
+        return self.pattern.sub(lambda m: self.replacements[m.group(0)], text)
+
+
+RST_FIXER = DocFixer(RST_DOC_FIXES)
+
+
 class FileReadWriter:
     """base class for reading rst files"""
 
@@ -105,12 +125,10 @@ class FileReadWriter:
         log.trace(f"Reading : {filename}")
         # ignore Unicode decoding issues
         with open(filename, errors="ignore", encoding="utf8") as file:
-            self.rst_text = file.readlines()
-        # Replace incorrect definitions in .rst files with better ones
-        for FIX in RST_DOC_FIXES:
-            self.rst_text = [line.replace(FIX[0], FIX[1]) for line in self.rst_text]
-        # some lines now may have \n sin them , so re-join and re-split the lines
-        self.rst_text = "".join(self.rst_text).splitlines(keepends=True)
+            text = file.read()
+        # Replace incorrect definitions in .rst files with better ones, in a single pass over the text
+        # and split the lines only once, as some fixes add a \n
+        self.rst_text = RST_FIXER(text).splitlines(keepends=True)
 
         self.filename = filename.as_posix()  # use fwd slashes in origin
         self.max_line = len(self.rst_text) - 1
@@ -35,11 +35,17 @@ to do:
 # ref: https://regex101.com/codegen?language=python
 # https://regex101.com/r/Ni8g2z/2
 
+import hashlib
+import json
 import re
-from typing import Dict, List, Optional, Union
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from loguru import logger as log
 
+from stubber import __version__
+
 from .lookup import LOOKUP_LIST, NONE_VERBS, TYPING_IMPORT
 
 # These are shown to import
@@ -49,6 +55,9 @@ __all__ = [
     "object_candidates",
     "distill_return",
     "return_type_from_context",
+    "ReturnTypeCache",
+    "return_type_cache",
+    "load_return_type_cache",
     "_type_from_context",  # For testing only
     "TYPING_IMPORT",
 ]
@@ -123,6 +132,19 @@ RE_GETS = r"Gets?\s(?P<return>[^.!?:;]*)"
 RE_LIT_AS_A = r"as a\s?(?P<return>[^.!?:;]*)"
 RE_LIT_SENTENCE = r"\s?(?P<return>[^.!?:;]*)"
 
+# precompiled regexes, with the boost of their results
+WEIGHTED_RETURN_RE = [
+    (re.compile(RE_RETURN_VALUE, re.MULTILINE | re.IGNORECASE), WEIGHT_RETURN_VAL),
+    (re.compile(RE_RETURN, re.MULTILINE | re.IGNORECASE), WEIGHT_RETURNS),
+    (re.compile(RE_GETS, re.MULTILINE | re.IGNORECASE), WEIGHT_GETS),
+]
+WEIGHTED_LITERAL_RE = [
+    (re.compile(RE_LIT_AS_A, re.MULTILINE | re.IGNORECASE), 1.0),
+    (re.compile(RE_LIT_SENTENCE, re.MULTILINE | re.IGNORECASE), 2.0),
+]
+# only the function name without the leading module
+FUNCTION_RE = re.compile(r"[\w|.]+(?=\()")
+
 
 def dist_rate(i: int) -> float:
     """"""
@@ -133,30 +155,96 @@ def dist_rate(i: int) -> float:
 WORD_TERMINATORS = ".,!;:?"
 
 
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton to find many keywords in a text in a single pass.
+    Case sensitive
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[str]] = [[]]
+        for kw in dict.fromkeys(keywords):
+            if kw:
+                self._add(kw)
+        # breadth-first to set the failure links, and the keywords that end in each state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def _add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.out[state] = [keyword]
+
+    def find(self, text: str) -> Dict[str, int]:
+        """
+        Find all keywords in the text.
+        returns the position of the first occurrence of each keyword that was found, the same as `text.find(keyword)`
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        found: Dict[str, int] = {}
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for kw in out[state]:
+                if kw not in found:
+                    found[kw] = i - len(kw) + 1
+        return found
+
+
+def match_words(match_string: str) -> Set[str]:
+    "the words in a string, without the word terminators"
+    return {w.strip(WORD_TERMINATORS) for w in match_string.split()}
+
+
 def simple_candidates(
     type: str,
     match_string: str,
     keywords: List[str],
     rate: float = 0.5,
     exclude: Optional[List[str]] = None,
+    *,
+    found: Optional[Dict[str, int]] = None,
+    words: Optional[Set[str]] = None,
 ):
     """
     find and rate possible types and confidence weighting for simple types.
     Case sensitive
+    found and words can be passed to re-use the keyword positions and the words of the match_string
     """
     if exclude is None:
         exclude = []
+    if found is None:
+        found = KeywordMatcher(keywords + exclude).find(match_string)
     candidates = []
-    if not any(t in match_string for t in keywords) or any(t in match_string for t in exclude):
+    if not any(t in found for t in keywords) or any(t in found for t in exclude):
         # quick bailout , there are no matches, or there is an exclude
         return []
 
     #  word matching
-    match_words = [w.strip(WORD_TERMINATORS) for w in match_string.split()]
+    if words is None:
+        words = match_words(match_string)
     #  kw =  single word -
     for kw in keywords:
-        i = match_string.find(kw)
-        if " " not in kw and kw not in match_words or " " in kw and i < 0:
+        i = found.get(kw, -1)
+        if " " not in kw and kw not in words or " " in kw and i < 0:
             continue
         # Assume unsigned are int
         result = BASE.copy()
@@ -173,31 +261,39 @@ def compound_candidates(
     keywords: List[str],
     rate: float = 0.85,
     exclude: Optional[List[str]] = None,
+    *,
+    found: Optional[Dict[str, int]] = None,
+    words: Optional[Set[str]] = None,
 ):
     """
     find and rate possible types and confidence weighting for compound types that can have a subscription.
     Case sensitive
+    found and words can be passed to re-use the keyword positions and the words of the match_string
     """
     if exclude is None:
         exclude = []
+    if found is None:
+        found = KeywordMatcher(keywords + exclude).find(match_string)
     candidates = []
-    if not any(t in match_string for t in keywords) or any(t in match_string for t in exclude):
+    if not any(t in found for t in keywords) or any(t in found for t in exclude):
         # quick bailout , there are no matches, or there is an exclude
         return []
 
     #  word matching
-    match_words = [w.strip(WORD_TERMINATORS) for w in match_string.split()]
+    if words is None:
+        words = match_words(match_string)
+    folded = match_string.casefold()
     #  kw =  single word -
     for kw in keywords:
-        i = match_string.find(kw)
-        if " " not in kw and kw not in match_words or " " in kw and i < 0:
+        i = found.get(kw, -1)
+        if " " not in kw and kw not in words or " " in kw and i < 0:
             continue
         # List / Dict / Generator of Any / Tuple /
         sub = None
         result = BASE.copy()
         confidence = rate
         for element in ("tuple", "string", "unsigned", "int"):
-            if element in match_string.casefold():
+            if element in folded:
                 j = match_string.find(element)
                 if i == j:
                     # do not match on the same main and sub
@@ -225,7 +321,13 @@ def compound_candidates(
     return candidates
 
 
-def object_candidates(match_string: str, rate: float = 0.81, exclude: Optional[List[str]] = None):
+def object_candidates(
+    match_string: str,
+    rate: float = 0.81,
+    exclude: Optional[List[str]] = None,
+    *,
+    found: Optional[Dict[str, int]] = None,
+):
     """
     find and rate possible types and confidence weighting for Object types.
     Case sensitive
@@ -235,16 +337,15 @@ def object_candidates(match_string: str, rate: float = 0.81, exclude: Optional[L
     if exclude is None:
         exclude = ["IRQ"]
     candidates = []
-    keywords = [
-        "Object",
-        "object",
-    ]  # Q&D
+    keywords = OBJECT_KEYWORDS
+    if found is None:
+        found = KeywordMatcher(keywords + exclude).find(match_string)
 
-    if not any(t in match_string for t in keywords) or any(t in match_string for t in exclude):
+    if not any(t in found for t in keywords) or any(t in found for t in exclude):
         # quick bailout , there are no matches, or there is an exclude
         return []
     for kw in keywords:
-        i = match_string.find(kw)
+        i = found.get(kw, -1)
         if i < 0:
             continue
         # List / Dict / Generator of Any / Tuple /
@@ -276,8 +377,7 @@ def object_candidates(match_string: str, rate: float = 0.81, exclude: Optional[L
 
 def has_none_verb(docstr: str) -> List:
     "returns a None result if the docstring starts with a verb that indicates None"
-    docstr = docstr.strip().casefold()
-    if not any(docstr.startswith(kw.casefold()) for kw in NONE_VERBS):
+    if not docstr.strip().casefold().startswith(NONE_VERBS_FOLDED):
         return []
     result = BASE.copy()
     result["type"] = "None"
@@ -285,36 +385,20 @@ def has_none_verb(docstr: str) -> List:
     return [result]
 
 
-def distill_return(return_text: str) -> List[Dict]:
-    """Find return type and confidence.
-    Returns a list of possible types and confidence weighting.
-    {
-
-        type :str               # the return type
-        confidence: float       # the confidence between 0.0 and 1
-        match: Optional[str]    # for debugging : the reason the match was made
-
-    }
-
-    """
-    candidates = [BASE]  # Default to the base , which is 'Any'
-
-    # clean up match_string
-    match_string = return_text.strip().rstrip(".")
-    match_string = match_string.replace("`", "")
+OBJECT_KEYWORDS = ["Object", "object"]  # Q&D
 
-    candidates += compound_candidates("Generator", match_string, ["generator"], C_GENERATOR)
-    candidates += compound_candidates("Iterator", match_string, ["iterator"], C_ITERATOR)
-    candidates += compound_candidates(
-        "List", match_string, ["a list of", "list of", "an array"], C_LIST
-    )
+NONE_VERBS_FOLDED = tuple(kw.casefold() for kw in NONE_VERBS)
 
-    candidates += simple_candidates(
-        "Dict", match_string, ["a dictionary", "dict", "Dictionary"], C_DICT
-    )
-    candidates += simple_candidates(
+# the keyword rules to distill the return type, in order of evaluation
+# (compound, type, keywords, rate, exclude)
+DISTILL_RULES = [
+    (True, "Generator", ["generator"], C_GENERATOR, None),
+    (True, "Iterator", ["iterator"], C_ITERATOR, None),
+    (True, "List", ["a list of", "list of", "an array"], C_LIST, None),
+    (False, "Dict", ["a dictionary", "dict", "Dictionary"], C_DICT, None),
+    (
+        False,
         "Tuple",
-        match_string,
         [
             "tuple",
             "a pair",
@@ -329,115 +413,188 @@ def distill_return(return_text: str) -> List[Dict]:
             "9-tuple",
         ],
         C_TUPLE,
-    )
-
-    candidates += simple_candidates(
-        "int", match_string, ["unsigned integer", "unsigned int", "unsigned"], C_UINT
-    )
-
-    candidates += simple_candidates(
-        "int",
-        match_string,
-        [
-            "number",
-            "integer",
-            "count",
-            "int",
-            "0 or 1",
-        ],
-        C_INT,
-    )
-
+        None,
+    ),
+    (False, "int", ["unsigned integer", "unsigned int", "unsigned"], C_UINT, None),
+    (False, "int", ["number", "integer", "count", "int", "0 or 1"], C_INT, None),
     # good but nor perfect indicators of integers
     # better match than bytes and bytearray or object
-    candidates += simple_candidates(
+    (
+        False,
         "int",
-        match_string,
-        [
-            "length",
-            "total size",
-            "size of",
-            "the index",
-            "number of",
-            "address of",
-            "the duration",
-        ],
+        ["length", "total size", "size of", "the index", "number of", "address of", "the duration"],
         C_INT_SIZES,
-    )
-
-    candidates += simple_candidates("int", match_string, [], C_INT_SIZES)
-
+        None,
+    ),
     # Assume numbers are signed int
-    candidates += simple_candidates(
-        "int",
-        match_string,
-        [
-            "index",
-            "**signed** value",
-            "seconds",
-            "nanoseconds",
-            "millisecond",
-            "offset",
-        ],
-        C_INT_LIKE,
-    )
-
+    (False, "int", ["index", "**signed** value", "seconds", "nanoseconds", "millisecond", "offset"], C_INT_LIKE, None),
     # better match than bytes
-    candidates += simple_candidates("bytearray", match_string, ["bytearray"], C_BYTEARRAY)
-
+    (False, "bytearray", ["bytearray"], C_BYTEARRAY, None),
     # OK, better than just string
-    candidates += simple_candidates("bytes", match_string, ["bytes", "byte string"], C_BYTES)
-
-    candidates += simple_candidates(
-        "bool", match_string, ["boolean", "bool", "True", "False"], C_BOOL
-    )
-    candidates += simple_candidates(
+    (False, "bytes", ["bytes", "byte string"], C_BYTES, None),
+    (False, "bool", ["boolean", "bool", "True", "False"], C_BOOL, None),
+    (
+        False,
         "float",
-        match_string,
-        [
-            "float",
-            "logarithm",
-            "sine",
-            "cosine",
-            "tangent",
-            "exponential",
-            "complex number",
-            "phase",
-            "ratio of",
-        ],
+        ["float", "logarithm", "sine", "cosine", "tangent", "exponential", "complex number", "phase", "ratio of"],
         C_FLOAT,
-    )
+        None,
+    ),
+    (False, "str", ["string", "(sub)string", "sub-string", "substring"], C_STR, None),
+    (False, "str", ["name", "names"], C_STR_NAMES, None),
+    ## "? contains 'None if there is no'  --> Union[Null, xxx]"
+    (False, "None", ["``None``", "None"], C_NONE_RETURN, ["previous value", "if there is no"]),
+]
 
-    candidates += simple_candidates(
-        "str", match_string, ["string", "(sub)string", "sub-string", "substring"], C_STR
-    )
+# a single matcher for all keywords of the rules and the object candidates
+DISTILL_MATCHER = KeywordMatcher(
+    [kw for _, _, keywords, _, exclude in DISTILL_RULES for kw in keywords + (exclude or [])] + OBJECT_KEYWORDS + ["IRQ"]
+)
 
-    candidates += simple_candidates("str", match_string, ["name", "names"], C_STR_NAMES)
-    ## "? contains 'None if there is no'  --> Union[Null, xxx]"
-    candidates += simple_candidates(
-        "None",
-        match_string,
-        ["``None``", "None"],
-        C_NONE_RETURN,
-        exclude=["previous value", "if there is no"],
-    )
 
-    candidates += object_candidates(match_string, C_OBJECTS)
+def distill_return(return_text: str) -> List[Dict]:
+    """Find return type and confidence.
+    Returns a list of possible types and confidence weighting.
+    {
+
+        type :str               # the return type
+        confidence: float       # the confidence between 0.0 and 1
+        match: Optional[str]    # for debugging : the reason the match was made
+
+    }
+
+    """
+    candidates = [BASE]  # Default to the base , which is 'Any'
+
+    # clean up match_string
+    match_string = return_text.strip().rstrip(".")
+    match_string = match_string.replace("`", "")
+
+    # find all keywords in one pass, and split the words only once
+    found = DISTILL_MATCHER.find(match_string)
+    if not found:
+        return candidates
+    words = match_words(match_string)
+    for compound, type, keywords, rate, exclude in DISTILL_RULES:
+        if compound:
+            candidates += compound_candidates(type, match_string, keywords, rate, exclude, found=found, words=words)
+        else:
+            candidates += simple_candidates(type, match_string, keywords, rate, exclude, found=found, words=words)
+
+    candidates += object_candidates(match_string, C_OBJECTS, found=found)
 
     return candidates
 
 
+LOOKUP_VERSION = hashlib.sha1(f"{__version__}|{LOOKUP_LIST!r}|{NONE_VERBS!r}".encode("utf-8")).hexdigest()[:12]
+"Version of the lookup tables and the inference, the cached return types of a different version are not used"
+
+
+class ReturnTypeCache:
+    """
+    Memo cache of the inferred return types, optionally stored in a json file.
+    The key is made of the module, signature, docstring, literal flag and the LOOKUP_VERSION,
+    so the cached types are re-used across micropython versions, as long as the lookup tables do not change.
+
+    - get / put - get or store a return type
+    - take_changes / merge - collect the new entries and statistics from a worker process, and merge them in the main process
+    """
+
+    def __init__(self, filename: Optional[Path] = None):
+        self.filename = filename
+        self.entries: Dict[str, str] = {}
+        self.new: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def key(*, docstring: Union[str, List[str]], signature: str, module: str, literal: bool = False) -> str:
+        if isinstance(docstring, list):
+            # normalized the same as in _type_from_context
+            docstring = " ".join(docstring)
+        return hashlib.sha1(f"{LOOKUP_VERSION}\0{module}\0{signature}\0{literal}\0{docstring}".encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+
+    def load(self) -> None:
+        if not self.filename or not self.filename.exists():
+            return
+        try:
+            data = json.loads(self.filename.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read return type cache {self.filename}: {e}")
+            return
+        if data.get("version") == LOOKUP_VERSION:
+            self.entries = data.get("entries", {})
+
+    def save(self) -> None:
+        "save the cache, only the entries of the current LOOKUP_VERSION are stored"
+        if not self.filename:
+            return
+        try:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            self.filename.write_text(json.dumps({"version": LOOKUP_VERSION, "entries": self.entries}))
+        except OSError as e:
+            log.debug(f"Could not save return type cache {self.filename}: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        if key in self.entries:
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, return_type: str) -> None:
+        self.entries[key] = return_type
+        self.new[key] = return_type
+
+    def take_changes(self) -> Tuple[Dict[str, str], int, int]:
+        "returns and resets the new entries, hits and misses since the last call"
+        changes = (self.new, self.hits, self.misses)
+        self.new, self.hits, self.misses = {}, 0, 0
+        return changes
+
+    def merge(self, new: Dict[str, str], hits: int, misses: int) -> None:
+        self.entries.update(new)
+        self.new.update(new)
+        self.hits += hits
+        self.misses += misses
+
+
+_return_type_cache = ReturnTypeCache()
+
+
+def return_type_cache() -> ReturnTypeCache:
+    "the return type cache that is used by return_type_from_context"
+    return _return_type_cache
+
+
+def load_return_type_cache(filename: Optional[Path]) -> ReturnTypeCache:
+    "load a return type cache from a file, and use it for return_type_from_context"
+    global _return_type_cache
+    _return_type_cache = ReturnTypeCache(filename)
+    return _return_type_cache
+
+
 def return_type_from_context(
     *, docstring: Union[str, List[str]], signature: str, module: str, literal: bool = False
 ):
+    key = ReturnTypeCache.key(module=module, signature=signature, docstring=docstring, literal=literal)
+    if (cached := _return_type_cache.get(key)) is not None:
+        return cached
     try:
-        return str(
+        return_type = str(
             _type_from_context(
                 module=module, signature=signature, docstring=docstring, literal=literal
             )["type"]
         )
     except Exception:
-        return "Incomplete"
+        return_type = "Incomplete"
+    _return_type_cache.put(key, return_type)
+    return return_type
 
 
 def _type_from_context(
@@ -466,22 +623,7 @@ def _type_from_context(
         docstring = " ".join(docstring)
 
     # give the regex that searches for returns a 0.2 boost as that is bound to be more relevant
-
-    weighted_regex = (
-        [
-            (RE_LIT_AS_A, 1.0),
-            (RE_LIT_SENTENCE, 2.0),
-        ]
-        if literal
-        else [
-            (RE_RETURN_VALUE, WEIGHT_RETURN_VAL),
-            (RE_RETURN, WEIGHT_RETURNS),
-            (RE_GETS, WEIGHT_GETS),
-            #       (reads_regex, 1.0),
-        ]
-    )
-    # only the function name without the leading module
-    function_re = re.compile(r"[\w|.]+(?=\()")
+    weighted_regex = WEIGHTED_LITERAL_RE if literal else WEIGHTED_RETURN_RE
 
     # matches: List[re.Match] = []
     candidates: List[Dict] = [{"match": "default", "type": "Incomplete", "confidence": 0}]
@@ -494,7 +636,7 @@ def _type_from_context(
     # ------------------------------------------------------
     # lookup returns that cannot be found based on the docstring from the lookup list
     try:
-        function_name = function_re.findall(signature)[0]
+        function_name = FUNCTION_RE.findall(signature)[0]
     except IndexError:
         function_name = signature.strip().strip(":()")
 
@@ -515,8 +657,7 @@ def _type_from_context(
     # ------------------------------------------------------
     # parse the docstring for the regexes and weigh the results accordingly
     for weighted in weighted_regex:
-        match_iter = re.finditer(weighted[0], docstring, re.MULTILINE | re.IGNORECASE)
-        for match in match_iter:
+        for match in weighted[0].finditer(docstring):
             # matches.append(match)
             distilled = distill_return(match.group("return"))
             for item in distilled:
@@ -3,43 +3,50 @@
 
 """Create, Process, and Maintain stubs ✏️  for MicroPython"""
 
+import importlib
 
 from stubber.commands.cli import stubber_cli
-from stubber.commands.build_cmd import cli_build
-from stubber.commands.clone_cmd import cli_clone
-from stubber.commands.config_cmd import cli_config
-from stubber.commands.enrich_folder_cmd import cli_enrich_folder
-from stubber.commands.get_core_cmd import cli_get_core
-from stubber.commands.get_docstubs_cmd import cli_docstubs
-from stubber.commands.get_frozen_cmd import cli_get_frozen
-from stubber.commands.get_lobo_cmd import cli_get_lobo
-from stubber.commands.merge_cmd import cli_merge_docstubs
-from stubber.commands.minify_cmd import cli_minify
-from stubber.commands.publish_cmd import cli_publish
-from stubber.commands.stub_cmd import cli_stub
-from stubber.commands.switch_cmd import cli_switch
-from stubber.commands.upd_fallback_cmd import cli_update_fallback
-from stubber.commands.upd_module_list_cmd import cli_update_module_list
-from stubber.commands.variants_cmd import cli_variants
+
+# command name -> module and function of the command, and its short help
+# the module of a command is only imported when that command is used
+COMMANDS = {
+    "build": ("stubber.commands.build_cmd:cli_build", "Commandline interface to publish stubs."),
+    "clone": ("stubber.commands.clone_cmd:cli_clone", "Clone/fetch the micropython repos locally."),
+    "show-config": ("stubber.commands.config_cmd:cli_config", "Show the current configuration"),
+    "enrich": (
+        "stubber.commands.enrich_folder_cmd:cli_enrich_folder",
+        "Enrich the stubs in stub_folder with the docstubs in docstubs_folder.",
+    ),
+    "get-core": ("stubber.commands.get_core_cmd:cli_get_core", "Download core CPython stubs from PyPi."),
+    "get-docstubs": ("stubber.commands.get_docstubs_cmd:cli_docstubs", "Build stubs from documentation."),
+    "get-frozen": ("stubber.commands.get_frozen_cmd:cli_get_frozen", "Get the frozen stubs for MicroPython."),
+    "get-lobo": ("stubber.commands.get_lobo_cmd:cli_get_lobo", "Get the frozen stubs for Lobo-esp32."),
+    "merge": ("stubber.commands.merge_cmd:cli_merge_docstubs", "Enrich the stubs in stub_folder with the docstubs in docstubs_folder."),
+    "minify": ("stubber.commands.minify_cmd:cli_minify", "Minify createstubs*.py."),
+    "publish": ("stubber.commands.publish_cmd:cli_publish", "Commandline interface to publish stubs."),
+    "stub": ("stubber.commands.stub_cmd:cli_stub", "Create or update .pyi type hint files."),
+    "switch": ("stubber.commands.switch_cmd:cli_switch", "Switch to a specific version of the micropython repos."),
+    "update-fallback": ("stubber.commands.upd_fallback_cmd:cli_update_fallback", "Update the fallback stubs."),
+    "update-module-list": (
+        "stubber.commands.upd_module_list_cmd:cli_update_module_list",
+        "Update the module list based on the information in the data folder",
+    ),
+    "make-variants": ("stubber.commands.variants_cmd:cli_variants", "Update all variants of createstubs*.py."),
+}
+
+for name, (import_path, short_help) in COMMANDS.items():
+    stubber_cli.add_lazy_command(name, import_path, short_help)
+
+
+def __getattr__(name: str):
+    "the command functions ( cli_build, ... ) can still be imported from this module"
+    for import_path, _ in COMMANDS.values():
+        module_name, func_name = import_path.split(":")
+        if func_name == name:
+            return getattr(importlib.import_module(module_name), func_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 ##########################################################################################
 if __name__ == "__main__":
-    # add all commands to the CLI
-    stubber_cli.add_command(cli_build)
-    stubber_cli.add_command(cli_config)
-    stubber_cli.add_command(cli_clone)
-    stubber_cli.add_command(cli_switch)
-    stubber_cli.add_command(cli_docstubs)
-    stubber_cli.add_command(cli_get_core)
-    stubber_cli.add_command(cli_get_frozen)
-    stubber_cli.add_command(cli_get_lobo)
-    stubber_cli.add_command(cli_stub)
-    stubber_cli.add_command(cli_enrich_folder)
-    stubber_cli.add_command(cli_minify)
-    stubber_cli.add_command(cli_publish)
-    stubber_cli.add_command(cli_merge_docstubs)
-    stubber_cli.add_command(cli_update_module_list)
-    stubber_cli.add_command(cli_update_fallback)
-    stubber_cli.add_command(cli_variants)
     stubber_cli()
@@ -3,20 +3,31 @@ Read the Micropython library documentation files and use them to build stubs tha
 using a custom-built parser to read and process the micropython RST files
 """
 
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 from loguru import logger as log
 
-from stubber.utils.post import run_autoflake, run_black
+from stubber.utils.post import autoflake_files, format_files
 
-from stubber import utils
+from stubber import __version__, utils
 from stubber.rst import (
     DOCSTUB_SKIP,
     U_MODULES,
+    load_return_type_cache,
+    lookup,
+    return_type_cache,
 )
 from stubber.rst.reader import RSTWriter
+from stubber.utils.config import CONFIG
+
+MANIFEST_VERSION = 1
+"Version of the docstub manifest format, a manifest with a different version is discarded"
 
 
 def generate_from_rst(
@@ -26,7 +37,16 @@ def generate_from_rst(
     release: Optional[str] = None,
     pattern: str = "*.rst",
     suffix: str = ".py",
+    jobs: int = 1,
+    force: bool = False,
 ) -> int:
+    """
+    Generate the docstubs for all rst files in rst_path.
+    Only the rst files that changed since the last run are processed, unless force is True.
+    A file is re-generated when its content or that of its included module.xxx.rst files,
+    the stubber version, the lookup tables or the version tag changed,
+    or when its outputs were changed or removed.
+    """
     # sourcery skip: remove-redundant-exception, simplify-single-exception-tuple
     if not dst_path.exists():
         dst_path.mkdir(parents=True)
@@ -41,11 +61,35 @@ def generate_from_rst(
     # simplify debugging
     # files = [f for f in files if f.name == "collections.rst"]
 
-    clean_destination(dst_path)
-    make_docstubs(dst_path, v_tag, release, suffix, files)
-
-    run_autoflake(dst_path, process_pyi=True)
-    run_black(dst_path)
+    # only (re-)generate the docstubs of rst files that changed since the last run
+    manifest_path = docstub_manifest_path(dst_path)
+    manifest = {} if force else read_docstub_manifest(manifest_path)
+    lookup_hash = hashlib.sha1(Path(lookup.__file__).read_bytes()).hexdigest()
+    keys = {f.name: docstub_key(f, v_tag, release, suffix, lookup_hash) for f in files}
+    stale = [f for f in files if not is_current(manifest.get(f.name), keys[f.name], dst_path)]
+    current = {t for f in files if f not in stale for t in docstub_targets(f, dst_path, suffix)}
+    log.info(f"{len(stale)} of {len(files)} rst files changed")
+
+    clean_destination(dst_path, keep=current)
+    # the inferred return types are shared across runs and versions
+    cache = load_return_type_cache(CONFIG.cache_path / "return_types.json")
+    written = make_docstubs(dst_path, v_tag, release, suffix, stale, jobs=jobs)
+    if cache.hits + cache.misses:
+        log.info(f"Return type cache: {cache.hits} hits, {cache.misses} misses, hit rate {cache.hit_rate:.0%}")
+    if cache.new:
+        cache.save()
+
+    # post-process only the new docstubs
+    autoflake_files(written, jobs=jobs)
+    format_files(written)
+
+    manifest = {name: entry for name, entry in manifest.items() if name in keys}
+    for f in stale:
+        manifest[f.name] = {
+            "key": keys[f.name],
+            "outputs": {t.name: file_hash(t) for t in docstub_targets(f, dst_path, suffix) if t.exists()},
+        }
+    write_docstub_manifest(manifest_path, manifest)
 
     # Generate a module manifest for the docstubs
     utils.make_manifest(
@@ -59,15 +103,76 @@ def generate_from_rst(
     return len(files)
 
 
-def clean_destination(dst_path: Path):
-    """Remove all .py/.pyi files in desination folder to avoid left-behinds"""
+def clean_destination(dst_path: Path, keep: Optional[Set[Path]] = None):
+    """Remove all .py/.pyi files in desination folder to avoid left-behinds, except the files to keep"""
     for f in dst_path.rglob(pattern="*.py*"):
+        if keep and f in keep:
+            continue
         try:
             os.remove(f)
         except OSError:
             pass
 
 
+def file_hash(file: Path) -> str:
+    return hashlib.sha1(file.read_bytes()).hexdigest()
+
+
+def docstub_manifest_path(dst_path: Path) -> Path:
+    "the manifest is stored next to the docstub folder, so that it is not included in the stub packages"
+    return dst_path.parent / f"{dst_path.name}.manifest.json"
+
+
+def read_docstub_manifest(manifest_path: Path) -> Dict[str, Dict]:
+    "read the manifest of rst file -> docstubs, returns an empty manifest if it does not exist or is outdated"
+    try:
+        data = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def write_docstub_manifest(manifest_path: Path, manifest: Dict[str, Dict]):
+    manifest_path.write_text(json.dumps({"version": MANIFEST_VERSION, "files": manifest}, indent=1, sort_keys=True))
+
+
+def docstub_sources(file: Path) -> List[Path]:
+    "the rst file and the module.xxx.rst files that can be included through its table of contents"
+    return [file] + sorted(file.parent.glob(f"{file.stem}.*.rst"))
+
+
+def docstub_key(file: Path, v_tag: str, release: str, suffix: str, lookup_hash: str) -> str:
+    "key of all the inputs that determine the docstubs generated from a rst file"
+    key = hashlib.sha1()
+    for source in docstub_sources(file):
+        key.update(f"{source.name}|".encode("utf-8"))
+        key.update(source.read_bytes())
+    key.update(f"{__version__}|{lookup_hash}|{v_tag}|{release}|{suffix}".encode("utf-8"))
+    return key.hexdigest()
+
+
+def docstub_targets(file: Path, dst_path: Path, suffix: str) -> List[Path]:
+    "the docstub files that are generated from a rst file"
+    targets = [(dst_path / file.name).with_suffix(suffix)]
+    if file.stem in U_MODULES:
+        # create umod.py file and mod.py file
+        targets.insert(0, (dst_path / ("u" + file.name)).with_suffix(suffix))
+    return targets
+
+
+def is_current(entry: Optional[Dict], key: str, dst_path: Path) -> bool:
+    "are the docstubs of a rst file generated from the same inputs, and not changed or removed since"
+    if not entry or entry["key"] != key or not entry["outputs"]:
+        return False
+    for name, digest in entry["outputs"].items():
+        target = dst_path / name
+        if not target.exists() or file_hash(target) != digest:
+            return False
+    return True
+
+
 def get_rst_sources(rst_path: Path, pattern: str) -> List[Path]:
     """Get the list of rst files to process"""
     files = [f for f in rst_path.glob(pattern) if f.stem != "index" and "." not in f.stem]
@@ -77,17 +182,41 @@ def get_rst_sources(rst_path: Path, pattern: str) -> List[Path]:
     return files
 
 
-def make_docstubs(dst_path: Path, v_tag: str, release: str, suffix: str, files: List[Path]):
-    """Create the docstubs"""
-
-    for file in files:
-        reader = RSTWriter(v_tag)
-        reader.source_release = release
-        log.debug(f"Reading: {file}")
-        reader.read_file(file)
-        reader.parse()
-        if file.stem in U_MODULES:
-            # create umod.py file and mod.py file
-            reader.write_file((dst_path / ("u" + file.name)).with_suffix(suffix))
-        reader.write_file((dst_path / file.name).with_suffix(suffix))
-        del reader
+def make_docstub(file: Path, dst_path: Path, v_tag: str, release: str, suffix: str) -> Tuple[List[Path], float, Tuple]:
+    """
+    Create the docstub(s) for a single rst file,
+    returns the files written, the time taken and the changes to the return type cache
+    """
+    start = time.perf_counter()
+    reader = RSTWriter(v_tag)
+    reader.source_release = release
+    log.debug(f"Reading: {file}")
+    reader.read_file(file)
+    reader.parse()
+    written = [target for target in docstub_targets(file, dst_path, suffix) if reader.write_file(target)]
+    return written, time.perf_counter() - start, return_type_cache().take_changes()
+
+
+def make_docstubs(dst_path: Path, v_tag: str, release: str, suffix: str, files: List[Path], jobs: int = 1) -> List[Path]:
+    """
+    Create the docstubs, with jobs > 1 the rst files are processed in a pool of processes.
+    The results are collected and logged in the order of the (sorted) rst files, regardless of the order the workers finish in.
+    The new return types inferred by the workers are merged into the return type cache of this process.
+    returns the files written
+    """
+    files = sorted(files)
+    args = (files, [dst_path] * len(files), [v_tag] * len(files), [release] * len(files), [suffix] * len(files))
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(make_docstub, *args))
+    else:
+        results = list(map(make_docstub, *args))
+
+    written = []
+    cache = return_type_cache()
+    for file, (outputs, duration, changes) in zip(files, results):
+        log.debug(f"{file.name} processed in {duration:.2f}s")
+        written += outputs
+        cache.merge(*changes)
+    log.info(f"Created {len(written)} docstubs from {len(files)} rst files in {sum(r[1] for r in results):.2f}s cpu time")
+    return written
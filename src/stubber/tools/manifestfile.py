@@ -27,6 +27,8 @@
 
 from __future__ import print_function
 import contextlib
+import copy
+import hashlib
 import os
 import sys
 import glob
@@ -67,6 +69,77 @@ class ManifestFileError(Exception):
     pass
 
 
+# Memoization of included manifests and directory listings, shared by all ManifestFile instances in this process.
+# The same port and library manifests are included by many boards, the recorded results are replayed
+# as long as the manifest, the files and the folders it refers to have not changed (based on their mtime),
+# and the path variables it used have the same values.
+_include_cache = {}
+_walk_cache = {}
+CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def clear_caches():
+    _include_cache.clear()
+    _walk_cache.clear()
+    CACHE_STATS.update(hits=0, misses=0)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cached_walk(top, followlinks):
+    # os.walk(top) as a list of (dirpath, mtime, filenames), re-walked if any of the folders changed
+    entry = _walk_cache.get((top, followlinks))
+    if entry is None or any(_mtime(dirpath) != mtime for dirpath, mtime, _ in entry):
+        entry = [(dirpath, _mtime(dirpath), filenames) for dirpath, _, filenames in os.walk(top, followlinks=followlinks)]
+        entry = entry or [(top, _mtime(top), [])]
+        _walk_cache[(top, followlinks)] = entry
+    return entry
+
+
+# The effects of an include() on the ManifestFile, to be replayed for later includes of the same manifest.
+class _IncludeRecording:
+    def __init__(self, outer):
+        # the metadata that was current when the include started
+        self.outer = outer
+        # (file_type, full_path, target_path, timestamp, kind, metadata reference, opt)
+        self.files = []
+        # metadata objects created during the include, referenced by index
+        self.metas = []
+        # metadata() calls that updated the outer metadata
+        self.outer_updates = []
+        self.pypi_dependencies = []
+        self.visited = []
+        # path -> mtime_ns of the manifests, files and folders used, to validate the recording
+        self.stats = {}
+        # name -> value of the path variables used, to match the recording to a ManifestFile
+        self.path_vars = {}
+
+    def meta_ref(self, metadata):
+        if metadata is self.outer:
+            return None
+        for i, m in enumerate(self.metas):
+            if m is metadata:
+                return i
+        self.metas.append(metadata)
+        return len(self.metas) - 1
+
+    def done(self):
+        # snapshot the created metadata, and release the outer metadata
+        self.metas = [copy.deepcopy(m) for m in self.metas]
+        self.outer = None
+
+    def uses_same_path_vars(self, path_vars):
+        return all(path_vars.get(name) == value for name, value in self.path_vars.items())
+
+    def is_valid(self, visited):
+        return not visited.intersection(self.visited) and all(_mtime(path) == mtime for path, mtime in self.stats.items())
+
+
 class ManifestIgnoreException(Exception):
     pass
 
@@ -181,11 +254,14 @@ class IncludeOptions:
 
 
 class ManifestFile:
-    def __init__(self, mode, path_vars=None):
+    def __init__(self, mode, path_vars=None, cwd=None):
         # See MODE_* constants above.
         self._mode = mode
         # Path substitution variables.
         self._path_vars = path_vars or {}
+        # Directory that relative paths are resolved to, instead of the process cwd,
+        # this allows multiple manifests to be processed concurrently.
+        self._cwd = os.path.abspath(cwd or os.getcwd())
         # List of files (as ManifestFileResult) references by this manifest.
         self._manifest_files = []
         # List of PyPI dependencies (when mode=MODE_PYPROJECT).
@@ -194,13 +270,24 @@ class ManifestFile:
         self._visited = set()
         # Stack of metadata for each level.
         self._metadata = [ManifestPackageMetadata()]
+        # Active recordings of (nested) includes.
+        self._recordings = []
 
     def _resolve_path(self, path):
         # Convert path to an absolute path, applying variable substitutions.
-        for name, value in self._path_vars.items():
-            if value is not None:
-                path = path.replace("$({})".format(name), value)
-        return os.path.abspath(path)
+        for name in self._path_vars:
+            if "$({})".format(name) in path:
+                value = self._path_var(name)
+                if value is not None:
+                    path = path.replace("$({})".format(name), value)
+        return os.path.normpath(os.path.join(self._cwd, path))
+
+    def _path_var(self, name):
+        # the value of a path variable, which is recorded as used by the active includes
+        value = self._path_vars[name]
+        for r in self._recordings:
+            r.path_vars[name] = value
+        return value
 
     def _manifest_globals(self, kwargs):
         # This is the "API" available to a manifest file.
@@ -270,7 +357,52 @@ class ManifestFile:
                 raise ManifestFileError("Expected .py file")
             kind = KIND_COMPILE_AS_MPY
 
-        self._manifest_files.append(ManifestOutput(FILE_TYPE_LOCAL, full_path, target_path, timestamp, kind, self._metadata[-1], opt))
+        output = ManifestOutput(FILE_TYPE_LOCAL, full_path, target_path, timestamp, kind, self._metadata[-1], opt)
+        self._add_output(output, stat.st_mtime_ns)
+
+    def _add_output(self, output, mtime):
+        self._manifest_files.append(output)
+        for r in self._recordings:
+            r.files.append(output[:5] + (r.meta_ref(output.metadata), output.opt))
+            r.stats[output.full_path] = mtime
+
+    def _add_pypi_dependency(self, name):
+        self._pypi_dependencies.append(name)
+        for r in self._recordings:
+            r.pypi_dependencies.append(name)
+
+    def _visit(self, manifest_path):
+        self._visited.add(manifest_path)
+        for r in self._recordings:
+            r.visited.append(manifest_path)
+            r.stats[manifest_path] = _mtime(manifest_path)
+
+    def _walk(self, top, followlinks=False):
+        # cached directory listing, the folders are recorded to validate the recorded includes
+        entry = _cached_walk(top, followlinks)
+        for r in self._recordings:
+            r.stats.update((dirpath, mtime) for dirpath, mtime, _ in entry)
+        return [(dirpath, filenames) for dirpath, _, filenames in entry]
+
+    def _replay(self, recording):
+        # apply the recorded effects of an include, returns False if the recording is no longer valid
+        if not recording.is_valid(self._visited):
+            return False
+        for path in recording.visited:
+            self._visit(path)
+        for r in self._recordings:
+            r.stats.update(recording.stats)
+            r.path_vars.update(recording.path_vars)
+        for kwargs in recording.outer_updates:
+            self.metadata(**kwargs)
+        for name in recording.pypi_dependencies:
+            self._add_pypi_dependency(name)
+        outer = self._metadata[-1]
+        metas = [copy.deepcopy(m) for m in recording.metas]
+        for file_type, full_path, target_path, timestamp, kind, ref, opt in recording.files:
+            metadata = outer if ref is None else metas[ref]
+            self._add_output(ManifestOutput(file_type, full_path, target_path, timestamp, kind, metadata, opt), recording.stats[full_path])
+        return True
 
     def _search(self, base_path, package_path, files, exts, kind, opt=None, strict=False):
         base_path = self._resolve_path(base_path)
@@ -282,14 +414,10 @@ class ManifestFile:
                     file = os.path.join(package_path, file)
                 self._add_file(os.path.join(base_path, file), file, kind=kind, opt=opt)
         else:
-            if base_path:
-                prev_cwd = os.getcwd()
-                os.chdir(self._resolve_path(base_path))
-
             # Find all candidate files.
-            for dirpath, _, filenames in os.walk(package_path or ".", followlinks=True):
+            for dirpath, filenames in self._walk(os.path.join(base_path, package_path or "."), followlinks=True):
                 for file in filenames:
-                    file = os.path.relpath(os.path.join(dirpath, file), ".")
+                    file = os.path.relpath(os.path.join(dirpath, file), base_path)
                     _, ext = os.path.splitext(file)
                     if ext.lower() in exts:
                         self._add_file(
@@ -301,9 +429,6 @@ class ManifestFile:
                     elif strict:
                         raise ManifestFileError("Unexpected file type")
 
-            if base_path:
-                os.chdir(prev_cwd)
-
     def metadata(self, **kwargs):
         """
         From within a manifest file, use this to set the metadata for the
@@ -316,6 +441,9 @@ class ManifestFile:
         """
         if kwargs:
             self._metadata[-1].update(self._mode, **kwargs)
+            for r in self._recordings:
+                if self._metadata[-1] is r.outer:
+                    r.outer_updates.append(kwargs)
         return self._metadata[-1]
 
     def include(self, manifest_path, is_require=False, **kwargs):
@@ -357,32 +485,58 @@ class ManifestFile:
                 manifest_path = os.path.join(manifest_path, "manifest.py")
             if manifest_path in self._visited:
                 return
-            self._visited.add(manifest_path)
+            self._visit(manifest_path)
+            try:
+                with open(manifest_path) as f:
+                    source = f.read()
+            except Exception as e:
+                raise ManifestFileError("Error in manifest file: {}: {}".format(manifest_path, e))
+            # replay an earlier include of the same manifest with the same options,
+            # for which the path vars that it used have the same values
+            key = (
+                manifest_path,
+                hashlib.sha1(source.encode("utf-8")).hexdigest(),
+                self._mode,
+                is_require,
+                self._metadata[-1]._initialised,
+                repr(sorted(kwargs.items())),
+            )
+            for recording in _include_cache.get(key, []):
+                if recording.uses_same_path_vars(self._path_vars) and self._replay(recording):
+                    CACHE_STATS["hits"] += 1
+                    return
+            CACHE_STATS["misses"] += 1
+            recording = _IncludeRecording(self._metadata[-1])
+            recording.stats[manifest_path] = _mtime(manifest_path)
+            self._recordings.append(recording)
             if is_require:
                 # This include is the result of require("name"), so push a new
                 # package metadata onto the stack.
                 self._metadata.append(ManifestPackageMetadata(is_require=True))
             try:
-                with open(manifest_path) as f:
-                    # Make paths relative to this manifest file while processing it.
-                    # Applies to includes and input files.
-                    prev_cwd = os.getcwd()
-                    os.chdir(os.path.dirname(manifest_path))
-                    try:
-                        exec(f.read(), self._manifest_globals(kwargs))
-                    finally:
-                        os.chdir(prev_cwd)
+                # Make paths relative to this manifest file while processing it.
+                # Applies to includes and input files.
+                prev_cwd = self._cwd
+                self._cwd = os.path.dirname(manifest_path)
+                try:
+                    exec(source, self._manifest_globals(kwargs))
+                finally:
+                    self._cwd = prev_cwd
             except ManifestIgnoreException:
                 # e.g. MODE_PYPROJECT and this was a stdlib dependency. No-op.
                 pass
             except ManifestUsePyPIException as e:
                 # e.g. MODE_PYPROJECT and this was a package from
                 # python-ecosys. Add PyPI dependency instead.
-                self._pypi_dependencies.append(e.pypi_name)
+                self._add_pypi_dependency(e.pypi_name)
             except Exception as e:
                 raise ManifestFileError("Error in manifest file: {}: {}".format(manifest_path, e))
+            finally:
+                self._recordings.remove(recording)
             if is_require:
                 self._metadata.pop()
+            recording.done()
+            _include_cache[key] = [r for r in _include_cache.get(key, []) if r.path_vars != recording.path_vars] + [recording]
 
     def require(self, name, version=None, unix_ffi=False, pypi=None, **kwargs):
         """
@@ -399,10 +553,10 @@ class ManifestFile:
             # In PYPROJECT mode, allow overriding the PyPI dependency name
             # explicitly. Otherwise if the dependent package has metadata
             # (pypi_publish) or metadata(pypi) we will use that.
-            self._pypi_dependencies.append(pypi)
+            self._add_pypi_dependency(pypi)
             return
 
-        if self._path_vars["MPY_LIB_DIR"]:
+        if self._path_var("MPY_LIB_DIR"):
             lib_dirs = ["micropython", "python-stdlib", "python-ecosys"]
             if unix_ffi:
                 # Search unix-ffi only if unix_ffi=True, and make unix-ffi modules
@@ -411,7 +565,7 @@ class ManifestFile:
 
             for lib_dir in lib_dirs:
                 # Search for {lib_dir}/**/{name}/manifest.py.
-                for root, dirnames, filenames in os.walk(os.path.join(self._path_vars["MPY_LIB_DIR"], lib_dir)):
+                for root, filenames in self._walk(os.path.join(self._path_var("MPY_LIB_DIR"), lib_dir)):
                     if os.path.basename(root) == name and "manifest.py" in filenames:
                         self.include(root, is_require=True, **kwargs)
                         return
@@ -463,7 +617,7 @@ class ManifestFile:
     def _freeze_internal(self, path, script, exts, kind, opt):
         if script is None:
             self._search(path, None, None, exts=exts, kind=kind, opt=opt)
-        elif isinstance(script, str) and os.path.isdir(os.path.join(path, script)):
+        elif isinstance(script, str) and os.path.isdir(os.path.join(self._resolve_path(path), script)):
             self._search(path, script, None, exts=exts, kind=kind, opt=opt)
         elif not isinstance(script, str):
             self._search(path, None, script, exts=exts, kind=kind, opt=opt)
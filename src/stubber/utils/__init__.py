@@ -1,5 +1,20 @@
 # type: ignore
+import importlib
+
 from .manifest import make_manifest, manifest
-from .post import do_post_processing
-from .stubmaker import generate_pyi_files, generate_pyi_from_file
 from .versions import clean_version
+
+# post processing and stubgen pull in mypy, black and libcst, so these are imported on first use
+_LAZY_IMPORTS = {
+    "do_post_processing": ".post",
+    "generate_pyi_files": ".stubmaker",
+    "generate_pyi_from_file": ".stubmaker",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,15 +1,64 @@
 """stubber configuration"""
 
+import json
+import time
 from pathlib import Path
+from typing import List, Optional
 
 from typedconfig.config import Config, key, section
 from typedconfig.source import EnvironmentConfigSource
 from .typed_config_toml import TomlConfigSource
 
 from loguru import logger as log
+from packaging.version import parse
+
 import stubber.basicgit as git
 
 
+VERSIONS_TTL = 24 * 60 * 60
+"seconds before the micropython versions are read from github again"
+OFFLINE_TTL = 60 * 60
+"seconds before github is tried again, after the versions were read from the local repo"
+FALLBACK_VERSIONS = ["1.19", "1.19.1", "1.20.0", "1.21.0"]
+
+
+def micropython_versions(cache_path: Path, mpy_path: Path, minver: Optional[str] = None) -> List[str]:
+    """
+    Get the micropython version tags.
+
+    The tags are read from github at most once per day, and stored in `micropython_versions.json` in the cache folder.
+    If github can not be reached, the tags of the local micropython repo are used, or else the stale cached tags.
+    """
+    cache_file = cache_path / "micropython_versions.json"
+    cached = {}
+    try:
+        cached = dict(json.loads(cache_file.read_text()))
+    except (OSError, ValueError, TypeError):
+        pass
+    ttl = VERSIONS_TTL if cached.get("source") == "github" else OFFLINE_TTL
+    if cached.get("tags") and time.time() - cached.get("fetched", 0) < ttl:
+        tags = cached["tags"]
+    else:
+        try:
+            tags, source = git.get_tags("micropython/micropython"), "github"
+        except Exception as e:
+            log.warning(f"Could not read micropython versions from github: {e}")
+            tags, source = [], ""
+        if not tags:
+            tags, source = git.get_local_tags(mpy_path) or cached.get("tags", []), "local"
+        if tags:
+            try:
+                cache_path.mkdir(parents=True, exist_ok=True)
+                tmp = cache_file.with_suffix(".tmp")
+                tmp.write_text(json.dumps({"source": source, "fetched": time.time(), "tags": tags}))
+                tmp.replace(cache_file)
+            except OSError as e:
+                log.debug(f"Could not cache micropython versions: {e}")
+    if minver:
+        tags = [tag for tag in tags if parse(tag) >= parse(minver)]
+    return sorted(tags)
+
+
 @section("micropython-stubber")
 class StubberConfig(Config):
     "stubber configuration class"
@@ -34,6 +83,9 @@ class StubberConfig(Config):
     )
     "a Path to the micropython-lib folder in the repos directory"
 
+    cache_path = key(key_name="cache-path", cast=Path, required=False, default=Path(".cache"))
+    "a Path to the folder in the repos directory where cached information is stored"
+
     # mpy_stubs_repo_path = key(key_name="mpy-stubs-repo-path", cast=Path, required=False, default=Path("./micropython-stubs"))
     # "a Path to the micropython-stubs folder in the repos directory"
 
@@ -53,17 +105,24 @@ class StubberConfig(Config):
     )
     "a Path to the publication folder that has the template files"
 
-    stable_version = key(key_name="stable-version", cast=str, required=False, default="1.20.0")
-
-    "last published stable"
-
-    all_versions = key(
-        key_name="all-versions",
-        cast=list,
-        required=False,
-        default=["1.17", "1.18", "1.19", "1.19.1", "1.20.0"],
-    )
-    "list of recent versions"
+    _all_versions: Optional[List[str]] = None
+
+    @property
+    def all_versions(self) -> List[str]:
+        "list of recent versions, read from the micropython git tags on first use"
+        if self._all_versions is None:
+            try:
+                self._all_versions = micropython_versions(self.cache_path, self.mpy_path, minver="v1.17")
+            except Exception as e:
+                log.warning(f"Could not read micropython versions: {e}")
+            self._all_versions = self._all_versions or FALLBACK_VERSIONS
+        return self._all_versions
+
+    @property
+    def stable_version(self) -> str:
+        "last published stable"
+        # the last version can be a preview version
+        return [v for v in self.all_versions if not v.endswith("preview")][-1]
 
     BLOCKED_PORTS = ["minimal", "bare-arm"]
     "ports that should be ignored as a source of stubs"
@@ -87,17 +146,8 @@ class StubberConfig(Config):
         # relative to repo path
         config_updates.update(mpy_path=self.repo_path / self.mpy_path)
         config_updates.update(mpy_lib_path=self.repo_path / self.mpy_lib_path)
-        # read the versions from the git tags
-        all_versions = []
-        try:
-            all_versions = git.get_tags("micropython/micropython", minver="v1.17")
-        except Exception as e:
-            log.warning(f"Could not read micropython versions from git: {e}")
-            all_versions = ["1.19", "1.19.1", "1.20.0", "1.21.0"]
-        config_updates.update(all_versions=all_versions)
-        config_updates.update(
-            stable_version=[v for v in all_versions if not v.endswith("preview")][-1]
-        )  # second last version - last version is the preview version
+        config_updates.update(cache_path=self.repo_path / self.cache_path)
+        # all_versions and stable_version are read on first use, not when the config is read
         return config_updates
 
 
@@ -1,8 +1,14 @@
 """Pre/Post Processing for createstubs.py"""
-import subprocess
+import functools
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Optional, Set, Tuple
 
+import autoflake
+import black
+from black.files import find_pyproject_toml, parse_pyproject_toml
+from black.mode import Mode, TargetVersion
 from loguru import logger as log
 
 from .stubmaker import generate_pyi_files
@@ -10,73 +16,137 @@ from .stubmaker import generate_pyi_files
 # # log = logging.getLogger(__name__)
 
 
-def do_post_processing(stub_paths: List[Path], pyi: bool, black: bool):
+def do_post_processing(stub_paths: List[Path], pyi: bool, black_format: bool, jobs: int = 1):
     "Common post processing"
     for path in stub_paths:
         if pyi:
             log.debug("Generate type hint files (pyi) in folder: {}".format(path))
-            generate_pyi_files(path)
-        if black:
+            generate_pyi_files(path, jobs=jobs)
+        if black_format:
             run_black(path)
 
 
+LINE_LENGTH = 140
+"line length for the stubs, overrides the line length of the [tool.black] configuration as the black cli option did"
+
+_black_formatted: Set[str] = set()
+"hashes of the file contents that are known to be formatted by black in this process"
+
+
+@functools.lru_cache(maxsize=None)
+def black_mode(folder: Path, is_pyi: bool) -> Mode:
+    """
+    The black mode for the files in a folder, from the [tool.black] section of the nearest pyproject.toml,
+    found in the same way as the black cli. The line length is always LINE_LENGTH.
+    """
+    config = {}
+    if pyproject := find_pyproject_toml((folder.as_posix(),)):
+        config = parse_pyproject_toml(pyproject)
+    return Mode(
+        line_length=LINE_LENGTH,
+        target_versions={TargetVersion[v.upper()] for v in config.get("target_version", [])},
+        is_pyi=is_pyi,
+    )
+
+
+def _black_key(content: bytes, mode: Mode) -> str:
+    return f"{hashlib.sha1(content).hexdigest()}{mode.get_cache_key()}"
+
+
+def python_files(path: Path) -> List[Path]:
+    "a single file, or all .py and .pyi files in a folder"
+    if path.is_file():
+        return [path]
+    return sorted(list(path.rglob("*.py")) + list(path.rglob("*.pyi")))
+
+
+def format_files(files: Iterable[Path]) -> int:
+    """
+    Format a set of .py and .pyi files with black in a single in-process pass.
+    Files with content that has already been formatted in this process are skipped,
+    so formatting a file again after an unrelated step is (nearly) free.
+
+    returns the number of files that could not be formatted
+    """
+    errors = 0
+    formatted = 0
+    for file in files:
+        mode = black_mode(file.parent.absolute(), file.suffix == ".pyi")
+        if _black_key(file.read_bytes(), mode) in _black_formatted:
+            continue
+        try:
+            black.format_file_in_place(file, fast=False, mode=mode, write_back=black.WriteBack.YES)
+        except Exception as e:  # black raises a variety of errors for code it cannot parse
+            log.warning(f"black could not format {file}: {e}")
+            errors += 1
+            continue
+        formatted += 1
+        _black_formatted.add(_black_key(file.read_bytes(), mode))
+    log.trace(f"black formatted {formatted} files")
+    return errors
+
+
 def run_black(path: Path, capture_output: bool = False):
     """
-    run black to format the code / stubs
+    run black to format the code / stubs in a file or folder
+    black is run in-process, with a line length of 140 and the other settings of the nearest pyproject.toml.
+    capture_output is only kept for compatibility.
+    returns 0 on success, or 123 if one or more files could not be formatted (as the black cli)
     """
-    cmd = [
-        "black",
-        path.as_posix(),
-        "--line-length",
-        "140",
-    ]
     log.debug("Running black on: {}".format(path))
-    # subprocess.run(cmd, capture_output=log.level >= logging.INFO)
-    result = subprocess.run(cmd, capture_output=capture_output)
-    return result.returncode
+    return 123 if format_files(python_files(path)) else 0
+
+
+_autoflake_clean: Set[str] = set()
+"hashes of the file contents that are known to have no unused imports to remove"
+
+
+def _autoflake_file(file: Path) -> Tuple[Path, Optional[str]]:
+    """remove the unused imports from a single file, returns the hash of the resulting content, or None on error"""
+    try:
+        source = file.read_bytes()
+        fixed = autoflake.fix_code(source.decode("utf-8")).encode("utf-8")
+    except Exception as e:  # pyflakes can fail on code it cannot parse
+        log.warning(f"autoflake failed on: {file} : {e}")
+        return file, None
+    if fixed != source:
+        log.trace(f"autoflake fixed: {file}")
+        file.write_bytes(fixed)
+    return file, hashlib.sha1(fixed).hexdigest()
 
 
-def run_autoflake(path: Path, capture_output: bool = False, process_pyi: bool = False):
+def run_autoflake(path: Path, capture_output: bool = False, process_pyi: bool = False, jobs: int = 1):
     """
     run autoflake to remove unused imports
     needs to be run BEFORE black otherwise it does not recognize long import from`s.
-    note: is run file-by-file to include processing .pyi files
+    autoflake is run in-process over all .py (and .pyi) files in a single pass, with jobs > 1 in a pool of processes.
+    files with content that has already been cleaned in this process are skipped.
+    capture_output is only kept for compatibility.
+    returns 0 on success, 1 if one or more files failed
     """
-    ret = 0
-    cmd = [
-        "autoflake",
-        "-r",
-        "--in-place",
-        # "--remove-all-unused-imports",
-        # "--ignore-init-module-imports",
-        path.as_posix(),
-        "-v",
-        "-v",  # show some feedback
-    ]
     log.debug("Running autoflake on: {}".format(path))
-    # subprocess.run(cmd, capture_output=log.level >= logging.INFO)
-    result = subprocess.run(cmd, capture_output=capture_output)
-    if result.returncode != 0:  # pragma: no cover
-        log.warning(f"autoflake failed on: {path}")
-        ret = result.returncode
-
-    if process_pyi:
-        for file in list(path.rglob("*.pyi")):
-            cmd = [
-                "autoflake",
-                "-r",
-                "--in-place",
-                # "--remove-all-unused-imports",
-                # "--ignore-init-module-imports",
-                file.as_posix(),
-                "-v",
-                "-v",  # show some feedback
-            ]
-            log.debug("Running autoflake on: {}".format(path))
-            # subprocess.run(cmd, capture_output=log.level >= logging.INFO)
-            result = subprocess.run(cmd, capture_output=capture_output)
-            if result.returncode != 0:
-                log.warning(f"autoflake failed on: {file}")
-                ret = result.returncode
+    files = python_files(path)
+    if not process_pyi:
+        files = [f for f in files if f.suffix != ".pyi"]
+    return autoflake_files(files, jobs=jobs)
+
+
+def autoflake_files(files: Iterable[Path], jobs: int = 1) -> int:
+    """
+    remove the unused imports from a set of .py and .pyi files, with jobs > 1 in a pool of processes.
+    returns 0 on success, 1 if one or more files failed
+    """
+    files = [f for f in files if hashlib.sha1(f.read_bytes()).hexdigest() not in _autoflake_clean]
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_autoflake_file, files, chunksize=8))
+    else:
+        results = [_autoflake_file(f) for f in files]
 
+    ret = 0
+    for _, digest in results:
+        if digest:
+            _autoflake_clean.add(digest)
+        else:
+            ret = 1
     return ret
@@ -5,6 +5,7 @@ import os
 import pkgutil
 import tempfile
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Tuple
 
@@ -29,17 +30,42 @@ def switch(tag: str, *, mpy_path: Path, mpy_lib_path: Path):
 
     The repros must be cloned already
     """
-    # fetch then switch
-    git.fetch(mpy_path)
-    git.fetch(mpy_lib_path)
-
     if not tag or tag in {"master", ""}:
         tag = "latest"
-    if tag == "latest":
-        git.switch_branch(repo=mpy_path, branch="master")
-    else:
-        git.checkout_tag(repo=mpy_path, tag=tag)
-    match_lib_with_mpy(version_tag=tag, lib_path=mpy_lib_path)
+    # fetch then switch
+    fetch_all(mpy_path, mpy_lib_path)
+    switch_repos(tag, mpy_path, mpy_lib_path)
+
+
+def fetch_all(*repos: Path):
+    """Fetch updates for all repos at the same time"""
+    with ThreadPoolExecutor(max_workers=len(repos)) as executor:
+        return list(executor.map(git.fetch, repos))
+
+
+def fetch_stubs_repo() -> bool:
+    """Fetch updates for the stubs repo, which is optional"""
+    try:
+        return git.fetch(CONFIG.stub_path.parent)
+    except Exception:
+        log.trace(f"no stubs repo found : {CONFIG.stub_path.parent}")
+        return False
+
+
+def switch_repos(tag: str, mpy_path: Path, mpy_lib_path: Path):
+    """
+    Switch the micropython repo to the tag, and the micropython-lib repo to the matching commit.
+    The repos are independent, so both are switched at the same time.
+    Within the git sessions a repo that is already at the requested tag or commit is not checked out again.
+    """
+    with git.session(mpy_path), git.session(mpy_lib_path), ThreadPoolExecutor(max_workers=2) as executor:
+        if tag == "latest":
+            mpy = executor.submit(git.switch_branch, repo=mpy_path, branch="master")
+        else:
+            mpy = executor.submit(git.checkout_tag, repo=mpy_path, tag=tag)
+        lib = executor.submit(match_lib_with_mpy, version_tag=tag, lib_path=mpy_lib_path)
+        mpy.result()
+        return lib.result()
 
 
 def read_micropython_lib_commits(filename: str = "data/micropython_tags.csv"):
@@ -92,22 +118,16 @@ def match_lib_with_mpy(version_tag: str, lib_path: Path):
 def fetch_repos(tag: str, mpy_path: Path, mpy_lib_path: Path):
     """Fetch updates, then switch to the provided tag"""
     log.info("fetch updates")
-    git.fetch(mpy_path)
-    git.fetch(mpy_lib_path)
-    try:
-        git.fetch(CONFIG.stub_path.parent)
-    except Exception:
-        log.trace("no stubs repo found : {CONFIG.stub_path.parent}")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stubs = executor.submit(fetch_stubs_repo)
+        fetch_all(mpy_path, mpy_lib_path)
+        stubs.result()
 
     if not tag:
         tag = "latest"
 
     log.info(f"Switching to {tag}")
-    if tag == "latest":
-        git.switch_branch(repo=mpy_path, branch="master")
-    else:
-        git.checkout_tag(repo=mpy_path, tag=tag)
-    result = match_lib_with_mpy(version_tag=tag, lib_path=mpy_lib_path)
+    result = switch_repos(tag, mpy_path, mpy_lib_path)
 
     log.info(f"{mpy_path} {git.get_local_tag(mpy_path)}")
     log.info(f"{mpy_lib_path} {git.get_local_tag(mpy_lib_path)}")
@@ -1,118 +1,181 @@
 """Generate stub files for micropython modules using mypy/stubgen"""
 
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 import mypy.stubgen as stubgen
 from loguru import logger as log
 from mypy.errors import CompileError
 
+
+@dataclass(frozen=True)
+class StubgenOptions:
+    """
+    Immutable stubgen options, the files and output folder are passed per call.
+    This allows stubs to be generated concurrently in threads or processes.
+    """
+
+    pyversion: Tuple[int, int] = (3, 8)  # documentation uses position-only argument indicator which requires 3.8 or higher
+    no_import: bool = False
+    include_private: bool = True
+    doc_dir: str = ""
+    search_path: Tuple[str, ...] = ()
+    interpreter: str = sys.executable
+    parse_only: bool = False
+    ignore_errors: bool = True
+    verbose: bool = True
+    quiet: bool = False
+    export_less: bool = False
+
+    def for_files(self, files: List[Path], output_dir: Path) -> stubgen.Options:
+        "create new stubgen options to process the files"
+        return stubgen.Options(
+            pyversion=self.pyversion,
+            no_import=self.no_import,
+            include_private=self.include_private,
+            doc_dir=self.doc_dir,
+            search_path=list(self.search_path),
+            interpreter=self.interpreter,
+            parse_only=self.parse_only,
+            ignore_errors=self.ignore_errors,
+            modules=[],
+            packages=[],
+            files=[str(f) for f in files],
+            output_dir=str(output_dir),
+            verbose=self.verbose,
+            quiet=self.quiet,
+            export_less=self.export_less,
+        )
+
+
 # default stubgen options
-STUBGEN_OPT = stubgen.Options(
-    pyversion=(3, 8),  # documentation uses position-only argument indicator which requires 3.8 or higher
-    no_import=False,
-    include_private=True,
-    doc_dir="",
-    search_path=[],
-    interpreter=sys.executable,
-    parse_only=False,
-    ignore_errors=True,
-    modules=[],
-    packages=[],
-    files=[],
-    output_dir="",
-    verbose=True,
-    quiet=False,
-    export_less=False,
-)
-
-
-def generate_pyi_from_file(file: Path) -> bool:
-    """Generate a .pyi stubfile from a single .py module using mypy/stubgen"""
+STUBGEN_OPT = StubgenOptions()
 
-    sg_opt = STUBGEN_OPT
-    # Deal with generator passed in
-    assert isinstance(file, Path)
 
-    sg_opt.files = [str(file)]
-    sg_opt.output_dir = str(file.parent)
+def _stubgen(files: List[Path], output_dir: Path, options: StubgenOptions = STUBGEN_OPT) -> bool:
+    """Run stubgen once on a list of .py files, with a single mypy build"""
     try:
-        log.debug(f"Calling stubgen on {str(file)}")
+        log.debug(f"Calling stubgen on {len(files)} files in {output_dir}")
         # TDOD: Stubgen.generate_stubs does not provide a way to return the errors
         # such as `cannot perform relative import`
-
-        stubgen.generate_stubs(sg_opt)
+        stubgen.generate_stubs(options.for_files(files, output_dir))
         return True
     except (Exception, CompileError, SystemExit) as e:
         # the only way to know if an error was encountered by generate_stubs
         # TODO: Extract info from e.code or e.args[0] and add that to the manifest ?
-        log.warning(e.args[0])
+        log.warning(e.args[0] if e.args else e)
         return False
 
 
-def generate_pyi_files(modules_folder: Path) -> bool:
+def generate_pyi_from_file(file: Path, options: StubgenOptions = STUBGEN_OPT) -> bool:
+    """Generate a .pyi stubfile from a single .py module using mypy/stubgen"""
+    # Deal with generator passed in
+    assert isinstance(file, Path)
+    return _stubgen([file], file.parent, options)
+
+
+def module_root(py: Path) -> Tuple[Path, str]:
+    """
+    The folder that stubgen uses as the root for a .py file, and the module name of the file.
+    Folders with an __init__.py are packages, so the root is the first folder above the packages.
+    """
+    root = py.parent
+    parts = [] if py.stem == "__init__" else [py.stem]
+    while (root / "__init__.py").exists() and root.parent != root:
+        parts.insert(0, root.name)
+        root = root.parent
+    return root, ".".join(parts)
+
+
+def stub_groups(py_files: List[Path]) -> List[Tuple[Path, List[Path]]]:
+    """
+    Split the .py files into groups that stubgen can process in a single run.
+    The files in a group share the same root folder and have unique module names,
+    so that duplicate modules in different subfolders ( ie v1.14 and v1.15 ) end up in different groups.
+    returns a list of (root, files)
+    """
+    groups: Dict[Tuple[Path, int], Dict[str, Path]] = {}
+    for py in py_files:
+        root, module = module_root(py)
+        n = 0
+        while module in groups.setdefault((root, n), {}):
+            n += 1
+        groups.setdefault((root, n), {})[module] = py
+    return [(root, list(modules.values())) for (root, _), modules in groups.items() if modules]
+
+
+def generate_pyi_group(root: Path, py_files: List[Path], options: StubgenOptions = STUBGEN_OPT) -> List[Path]:
+    """
+    Generate the .pyi files for a group of modules with a single stubgen run,
+    then run stubgen once per file for the files that still have no .pyi file.
+    Returns the files that could not be stubbed
+    """
+    log.debug(f"::group::[stubgen] running stubgen on {len(py_files)} files in {root}")
+    if not _stubgen(py_files, root, options):
+        # in case of failure, then Plan B
+        log.debug("::group::[stubgen] Failure on folder, attempt to run stubgen per file")
+    # stub only the files that have not been stubbed yet, each file is tried once
+    pyi_files = {pyi for folder in {py.parent for py in py_files} for pyi in folder.glob("*.pyi")}
+    failed = []
+    for py in py_files:
+        if py.with_suffix(".pyi") not in pyi_files and not _stubgen([py], root, options):
+            # todo: report failures by adding to module manifest
+            failed.append(py)
+    return failed
+
+
+def generate_pyi_folders(folders: List[Path], jobs: int = 1, options: StubgenOptions = STUBGEN_OPT) -> Dict[Path, List[Path]]:
+    """
+    Generate typeshed files for all scripts in a number of folders using mypy/stubgen,
+    such as the port/board folders of the frozen stubs.
+
+    The scripts in all folders are split in groups of non-conflicting modules, and stubgen runs once per group.
+    With jobs > 1 the groups of all folders are processed in a pool of processes.
+
+    Returns: for each folder, the files that had an issue generating a stub
+    """
+    work: List[Tuple[Path, Path, List[Path]]] = []
+    for folder in folders:
+        # stubgen cannot process folders with duplicate modules ( ie v1.14 and v1.15 )
+        # NOTE: FIX 1 add __init__.py to umqtt
+        if (folder / "umqtt/robust.py").exists():  # and not (freeze_path / "umqtt" / "__init__.py").exists():
+            log.debug("add missing : umqtt/__init__.py")
+            with open(folder / "umqtt" / "__init__.py", "a") as f:
+                f.write("")
+        work += [(folder, root, files) for root, files in stub_groups(sorted(set(folder.rglob("*.py"))))]
+
+    args = ([w[1] for w in work], [w[2] for w in work], [options] * len(work))
+    if jobs > 1 and len(work) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(generate_pyi_group, *args))
+    else:
+        results = list(map(generate_pyi_group, *args))
+
+    failed: Dict[Path, List[Path]] = {folder: [] for folder in folders}
+    for (folder, _, _), group_failed in zip(work, results):
+        failed[folder] += group_failed
+    for folder, files in failed.items():
+        if files:
+            log.warning(f"stubgen could not create a stub for {len(files)} files in {folder}")
+    return failed
+
+
+def generate_pyi_files(modules_folder: Path, jobs: int = 1, options: StubgenOptions = STUBGEN_OPT) -> bool:
     """
     Generate typeshed files for all scripts in a folder using mypy/stubgen
+    A folder with multiple module manifests (modules.json) is processed per manifest folder.
 
     Returns: False if one or more files had an issue generating a stub
     """
-    # stubgen cannot process folders with duplicate modules ( ie v1.14 and v1.15 )
-    # NOTE: FIX 1 add __init__.py to umqtt
-    if (modules_folder / "umqtt/robust.py").exists():  # and not (freeze_path / "umqtt" / "__init__.py").exists():
-        log.debug("add missing : umqtt/__init__.py")
-        with open(modules_folder / "umqtt" / "__init__.py", "a") as f:
-            f.write("")
-
     modlist = list(modules_folder.glob("**/modules.json"))
-    r = True
     if len(modlist) > 1:
-        # try to process each module seperatlely
-        for mod_manifest in modlist:
-            ## generate fyi files for folder
-            r = r and generate_pyi_files(mod_manifest.parent)
-    else:  # one or less module manifests
-        ## generate fyi files for folder
-        log.debug("::group::[stubgen] running stubgen on {0}".format(modules_folder))
-
-        Error_Found = False
-        sg_opt = STUBGEN_OPT
-        sg_opt.files = [str(modules_folder)]
-        sg_opt.output_dir = str(modules_folder)
-        try:
-            stubgen.generate_stubs(sg_opt)
-        except (ValueError, SystemExit) as e:
-            # the only way to know if an error was encountered by generate_stubs
-            # mypy.errors.CompileError and others ?
-            # TODO: Extract info from e.code or e.args[0]
-            log.warning(e.args[0])
-            Error_Found = True
-
-        if Error_Found:
-            # in case of failure ( duplicate module in subfolder) then Plan B
-            # - run stubgen on each *.py
-            log.debug("::group::[stubgen] Failure on folder, attempt to run stubgen per file")
-            py_files = list(modules_folder.rglob("*.py"))
-            for py in py_files:
-                generate_pyi_from_file(py)
-                # todo: report failures by adding to module manifest
-
-        # for py missing pyi:
-        py_files = list(modules_folder.rglob("*.py"))
-        pyi_files = list(modules_folder.rglob("*.pyi"))
-
-        worklist = pyi_files.copy()
-        for pyi in worklist:
-            # remove all py files that have been stubbed successfully from the list
-            try:
-                py_files.remove(pyi.with_suffix(".py"))
-                pyi_files.remove(pyi)
-            except ValueError:
-                log.debug(f"no matching py for : {str(pyi)}")
-
-        # now stub the rest
-        # note in some cases this will try a file twice
-        for py in py_files:
-            r = r and generate_pyi_from_file(py)
-            # todo: report failures by adding to module manifest
-
-    return r
+        # only process the module folders, nested module folders are processed with their parent
+        folders = sorted({m.parent for m in modlist})
+        folders = [f for f in folders if not any(p in folders for p in f.parents)]
+    else:
+        folders = [modules_folder]
+    failed = generate_pyi_folders(folders, jobs=jobs, options=options)
+    return not any(failed.values())
@@ -1,6 +1,5 @@
 """Handle versions of micropython based on the git tags in the repo """
 
-from github import Github
 from packaging.version import parse
 
 
@@ -46,6 +45,8 @@ def clean_version(
 def micropython_versions(start: str = "v1.9.2"):
     """Get the list of micropython versions from github tags"""
     try:
+        from github import Github
+
         g = Github()
         repo = g.get_repo("micropython/micropython")
         return [tag.name for tag in repo.get_tags() if parse(tag.name) >= parse(start)]
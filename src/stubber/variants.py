@@ -80,7 +80,7 @@ def create_variants(
                 f.write(variant.code)
 
             # format file with black
-            run_black(variant_path, capture_output=True)
+            run_black(variant_path)
             # TODO: check with pyright if it is valid python
 
         # Minify file with pyminifier
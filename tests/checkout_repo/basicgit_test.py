@@ -193,3 +193,75 @@ def test_run_git_fails(mocker: MockerFixture):
     r = git.switch_branch(branch="foobar")
     mock_run_git.assert_called_once()
     assert r == False
+
+
+def _git(repo: Path, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def tag_repo(tmp_path: Path) -> Path:
+    "a repo with 2 annotated version tags, checked out at the oldest tag"
+    repo = tmp_path / "repo"
+    for n, tag in enumerate(["v1.19", "v1.20"]):
+        (repo / "ports" / f"port{n}" / "boards" / "GENERIC").mkdir(parents=True)
+        (repo / "ports" / f"port{n}" / "boards" / "GENERIC" / "board.h").write_text("")
+        if n == 0:
+            _git(repo, "init", "--quiet", "--initial-branch=master")
+        _git(repo, "add", ".")
+        _git(repo, "commit", "--quiet", "-m", tag)
+        _git(repo, "tag", "-a", tag, "-m", tag)
+    _git(repo, "checkout", "--quiet", "tags/v1.19")
+    return repo
+
+
+def test_session_list_tree_folders(tag_repo: Path):
+    expected = [
+        git.list_tree_folders(ref, path, repo=tag_repo) for ref in ["v1.20", "refs/tags/v1.19", "nope"] for path in ["ports", "", "nope"]
+    ]
+    with git.session(tag_repo) as session:
+        assert git.active_session(tag_repo) is session
+        found = [
+            git.list_tree_folders(ref, path, repo=tag_repo)
+            for ref in ["v1.20", "refs/tags/v1.19", "nope"]
+            for path in ["ports", "", "nope"]
+        ]
+    assert found == expected
+    assert git.active_session(tag_repo) is None
+    assert "ports/port1/boards/GENERIC" in found[0]
+
+
+@pytest.mark.mocked
+def test_session_caches_per_head(tag_repo: Path, mocker: MockerFixture):
+    with git.session(tag_repo):
+        m_run_git = mocker.spy(git, "_run_local_git")
+        assert git.get_local_tag(tag_repo) == "v1.19"
+        assert git.get_local_tags(tag_repo) == ["v1.19", "v1.20"]
+        calls = m_run_git.call_count
+        # cached until HEAD changes
+        assert git.get_local_tag(tag_repo) == "v1.19"
+        assert git.get_local_tags(tag_repo, minver="v1.20") == ["v1.20"]
+        assert m_run_git.call_count == calls
+        # already at the tag, so no checkout
+        assert git.checkout_tag("v1.19", repo=tag_repo)
+        assert not [c for c in m_run_git.call_args_list[calls:] if "checkout" in c.args[0]]
+        assert git.checkout_tag("v1.20", repo=tag_repo)
+        assert git.get_local_tag(tag_repo) == "v1.20"
+
+
+def test_session_checkout_resets_dirty_worktree(tag_repo: Path):
+    board = tag_repo / "ports/port0/boards/GENERIC/board.h"
+    board.write_text("changed")
+    with git.session(tag_repo):
+        # already at the tag, but the changes are reset by the forced checkout
+        assert git.checkout_tag("v1.19", repo=tag_repo)
+    assert board.read_text() == ""
+
+
+def test_get_git_describe_ref(tag_repo: Path):
+    # HEAD is at the oldest tag, master is at the newest
+    assert git.get_git_describe(tag_repo.as_posix()) == "v1.19"
+    assert git.get_git_describe(tag_repo.as_posix(), ref="master") == "v1.20"
+    with git.session(tag_repo):
+        assert git.get_git_describe(tag_repo.as_posix(), ref="master") == "v1.20"
+        assert git.get_git_describe(tag_repo.as_posix()) == "v1.19"
@@ -1,7 +1,8 @@
+import shutil
 from pathlib import Path
 
 import pytest
-from stubber.codemod.enrich import enrich_folder, enrich_file
+from stubber.codemod.enrich import enrich_file, enrich_folder, index_docstubs
 
 # mark all tests
 pytestmark = pytest.mark.codemod
@@ -37,3 +38,30 @@ def test_enrich_folder():
         write_back=False,
     )
     assert count >= 18
+
+
+def test_index_docstubs(tmp_path: Path):
+    for name in ["os.pyi", "uos.pyi", "time.pyi", "ucollections.pyi", "machine.py", "machine.pyi"]:
+        (tmp_path / name).write_text("")
+    index = index_docstubs(tmp_path)
+    # exact names are preferred over aliases
+    assert index["os"].name == "os.pyi"
+    assert index["uos"].name == "uos.pyi"
+    # aliases with and without a leading u
+    assert index["utime"].name == "time.pyi"
+    assert index["collections"].name == "ucollections.pyi"
+    # .pyi is preferred over .py
+    assert index["machine"].name == "machine.pyi"
+    assert "network" not in index
+
+
+def test_enrich_folder_jobs(tmp_path: Path):
+    "enriching in parallel gives the same result as enriching in sequence"
+    source = Path("./tests/data/stub_merge/micropython-v1_18-esp32")
+    docstubs = Path("./tests/data/stub_merge/micropython-v1_18-docstubs")
+    shutil.copytree(source, tmp_path / "sequential")
+    shutil.copytree(source, tmp_path / "parallel")
+    count = enrich_folder(tmp_path / "sequential", docstubs, write_back=True, jobs=1)
+    assert enrich_folder(tmp_path / "parallel", docstubs, write_back=True, jobs=4) == count
+    for f in sorted((tmp_path / "sequential").rglob("*.py*")):
+        assert f.read_text() == (tmp_path / "parallel" / f.relative_to(tmp_path / "sequential")).read_text()
@@ -0,0 +1,84 @@
+"""
+Track the import time of the stubber CLI.
+The commands, and the heavy dependencies they use, should only be imported when a command is used.
+"""
+import subprocess
+import sys
+from typing import Dict
+
+import click
+import pytest
+from loguru import logger as log
+
+from stubber.stubber import COMMANDS, stubber_cli
+
+HEAVY_MODULES = ["libcst", "mypy", "github", "pysondb", "python_minifier", "black"]
+MAX_IMPORT_TIME = 1_000_000
+"microseconds, well above the expected import time, to catch regressions without flaky failures"
+
+
+def importtime(code: str) -> Dict[str, int]:
+    "run the code with `python -X importtime`, returns the cumulative import time in microseconds per module"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:") :].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.cli
+def test_cli_import_time():
+    times = importtime("import stubber.stubber")
+    log.info(f"import stubber.stubber: {times['stubber.stubber'] / 1000:.0f} ms")
+    heavy = [m for m in times if m.split(".")[0] in HEAVY_MODULES]
+    assert not heavy, "heavy modules should only be imported by the commands that use them"
+    assert not [m for m in times if m.startswith("stubber.commands.") and m.endswith("_cmd")]
+    assert times["stubber.stubber"] < MAX_IMPORT_TIME
+
+
+@pytest.mark.cli
+def test_command_imported_on_use():
+    # in a new process, as the commands are already imported by the other tests
+    code = "import sys; from stubber.stubber import stubber_cli; stubber_cli(['show-config'], standalone_mode=False); print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    modules = result.stdout.split()
+    assert "stubber.commands.config_cmd" in modules
+    assert "stubber.commands.build_cmd" not in modules
+
+
+@pytest.mark.cli
+def test_help_imports_no_commands():
+    # the help lists the commands with their registered short help
+    code = (
+        "import sys; from stubber.stubber import stubber_cli; stubber_cli(['--help'], standalone_mode=False); print(' '.join(sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert "Commands:" in result.stdout
+    assert "Switch to a specific version of the micropython repos." in result.stdout
+    modules = result.stdout.split()
+    assert not [m for m in modules if m.startswith("stubber.commands.") and m.endswith("_cmd")]
+    assert not [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+
+
+@pytest.mark.cli
+def test_switch_versions_not_read_on_import():
+    # the micropython versions are only read when the switch command checks a version
+    code = "from stubber.commands import switch_cmd; print(switch_cmd.version_list.cache_info().currsize)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "0"
+
+
+@pytest.mark.cli
+@pytest.mark.parametrize("name", list(COMMANDS))
+def test_lazy_commands(name: str):
+    ctx = click.Context(stubber_cli)
+    assert name in stubber_cli.list_commands(ctx)
+    command = stubber_cli.get_command(ctx, name)
+    assert command is not None
+    assert command.name == name
+    # the registered short help is the same as the help of the command
+    _, short_help = COMMANDS[name]
+    assert short_help == (command.help or "").split("\n\n")[0].replace("\n", " ").strip()
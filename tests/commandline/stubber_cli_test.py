@@ -156,6 +156,17 @@ def test_cmd_switch_version(mocker: MockerFixture, version: str):
     assert m_checkout.call_count >= 0
 
 
+@pytest.mark.mocked
+def test_cmd_switch_unknown_version(mocker: MockerFixture):
+    runner = CliRunner()
+    mocker.patch("stubber.commands.switch_cmd.version_list", return_value=["v1.20.0", "latest"])
+    m_fetch_repos: MagicMock = mocker.patch("stubber.commands.switch_cmd.fetch_repos", autospec=True)
+    result = runner.invoke(stubber.stubber_cli, ["switch", "v0.1"])
+    assert result.exit_code == 2
+    assert "'v0.1' is not one of 'v1.20.0', 'latest'" in result.output
+    m_fetch_repos.assert_not_called()
+
+
 ##########################################################################################
 # minify
 ##########################################################################################
@@ -198,9 +209,9 @@ def test_cmd_stub(mocker: MockerFixture):
     # fake run on current folder
     result = runner.invoke(stubber.stubber_cli, ["stub", "--source", "."])
 
-    m_generate.assert_called_once_with(Path("."))
+    m_generate.assert_called_once_with(Path("."), jobs=1)
     m_postprocessing.assert_called_once()
-    m_postprocessing.assert_called_once_with([Path(".")], pyi=False, black=True)
+    m_postprocessing.assert_called_once_with([Path(".")], pyi=False, black_format=True)
     assert result.exit_code == 0
 
 
@@ -224,7 +235,7 @@ def test_cmd_get_frozen(mocker: MockerFixture, tmp_path: Path):
     m_freeze_any.assert_called_once()
     m_get_local_tag.assert_called_once()
 
-    m_post.assert_called_once_with([tmp_path / "micropython-v1_42-frozen"], True, True)
+    m_post.assert_called_once_with([tmp_path / "micropython-v1_42-frozen"], True, True, jobs=1)
 
 
 ##########################################################################################
@@ -348,3 +359,14 @@ def test_cmd_publish(mocker: MockerFixture, cmdline: List[str]):
     result = runner.invoke(stubber.stubber_cli, cmdline)
     assert result.exit_code == 0
     m_publish_multiple.assert_called_once()
+
+
+@pytest.mark.mocked
+def test_cmd_publish_offline(mocker: MockerFixture):
+    runner = CliRunner()
+    m_publish_multiple: MagicMock = mocker.patch("stubber.commands.publish_cmd.publish_multiple", autospec=True, return_value={})
+    m_set_offline: MagicMock = mocker.patch("stubber.commands.publish_cmd.set_offline", autospec=True)
+    result = runner.invoke(stubber.stubber_cli, ["publish", "--test-pypi", "--dry-run", "--offline"])
+    assert result.exit_code == 0
+    m_set_offline.assert_called_once()
+    m_publish_multiple.assert_called_once()
@@ -1,6 +1,7 @@
 """
 Shared Test Fixtures
 """
+import builtins
 import logging
 import os
 import sys
@@ -8,6 +9,7 @@ from pathlib import Path
 
 import pytest
 from _pytest.config import Config
+from pytest_mock import MockerFixture
 
 # config
 from stubber.utils.config import CONFIG
@@ -44,29 +46,42 @@ def fx_add_minified_path(pytestconfig: Config):
     return
 
 
+def _unload_modules(*paths: str):
+    "remove the modules that were imported from the paths, so the next test imports them again"
+    for name, module in list(sys.modules.items()):
+        if any((getattr(module, "__file__", None) or "").startswith(path) for path in paths):
+            del sys.modules[name]
+
+
 @pytest.fixture()
-def mock_pycopy_path(pytestconfig: Config):
+def mock_pycopy_path(pytestconfig: Config, mocker: MockerFixture):
     "Add pycopy-CPython, and machine to path  temporarily"
     source_path = str(pytestconfig.rootpath / "tests" / "mocks" / "pycopy-cpython_core")
     machine_path = str(pytestconfig.rootpath / "tests" / "mocks" / "machine")
     if not source_path in sys.path:
         sys.path[1:1] = [source_path, machine_path]
+    # the mocked micropython module replaces builtins.open, restore it after the test
+    mocker.patch("builtins.open", builtins.open)
     yield source_path
     sys.path.remove(source_path)
     sys.path.remove(machine_path)
+    _unload_modules(source_path, machine_path)
     return
 
 
 @pytest.fixture()
-def mock_micropython_path(pytestconfig: Config):
+def mock_micropython_path(pytestconfig: Config, mocker: MockerFixture):
     "Add micropython-CPython and machine to path  temporarily"
     source_path = str(pytestconfig.rootpath / "tests" / "mocks" / "micropython-cpython_core")
     machine_path = str(pytestconfig.rootpath / "tests" / "mocks" / "machine")
     if not source_path in sys.path:
         sys.path[1:1] = [source_path, machine_path]
+    # the mocked micropython module replaces builtins.open, restore it after the test
+    mocker.patch("builtins.open", builtins.open)
     yield source_path
     sys.path.remove(source_path)
     sys.path.remove(machine_path)
+    _unload_modules(source_path, machine_path)
     return
 
 
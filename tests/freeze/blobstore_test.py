@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+
+from stubber.freeze.blobstore import BlobStore
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    src = tmp_path / "src" / "module.py"
+    src.parent.mkdir()
+    src.write_text("def foo(): ...\n")
+    return src
+
+
+@pytest.mark.parametrize("link_mode", ["copy", "reflink", "hardlink"])
+def test_blobstore_materialize(tmp_path: Path, source: Path, link_mode: str):
+    store = BlobStore(tmp_path / "blobs", link_mode)
+    digest = store.add(source)
+    assert store.add(source) == digest
+    assert len(list((tmp_path / "blobs").rglob("*"))) == 2, "one folder and one blob"
+
+    for board in ("GENERIC", "TINYPICO"):
+        dest = tmp_path / "stubs" / board / "module.py"
+        method = store.materialize(digest, dest)
+        assert dest.read_text() == "def foo(): ...\n"
+        if link_mode == "hardlink":
+            assert method == "hardlink"
+            assert dest.samefile(store.blob_path(digest))
+        else:
+            assert method in ("copy", "reflink")
+            assert not dest.samefile(store.blob_path(digest))
+
+
+def test_blobstore_changed_in_place(tmp_path: Path, source: Path):
+    store = BlobStore(tmp_path / "blobs", "hardlink")
+    digest = store.add(source)
+    dest = tmp_path / "stubs" / "module.py"
+    store.materialize(digest, dest)
+    store.save()
+    # a hard linked file that is formatted in place also changes the blob
+    dest.write_text("def foo():\n    ...\n")
+
+    store = BlobStore(tmp_path / "blobs", "hardlink")
+    assert store.add(source) == digest
+    assert store.blob_path(digest).read_text() == "def foo(): ...\n"
+    assert dest.read_text() == "def foo():\n    ...\n"
@@ -252,13 +252,13 @@ def test_freeze_any_mocked(
 
     m_freeze_folders: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_folders", autospec=True, return_value=[1])
     # m_freeze_one_manifest_1: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_one_manifest_1", autospec=True, return_value=1)
-    m_freeze_one_manifest_2: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_one_manifest_2", autospec=True, return_value=1)
+    m_freeze_manifests_2: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_manifests_2", autospec=True, return_value=1)
     x = freeze_any(tmp_path, version=mpy_version, mpy_path=testrepo_micropython, mpy_lib_path=testrepo_micropython_lib)
-    # calls = m_freeze_folders.call_count + m_freeze_one_manifest_1.call_count + m_freeze_one_manifest_2.call_count
-    calls = m_freeze_folders.call_count + m_freeze_one_manifest_2.call_count
+    # calls = m_freeze_folders.call_count + m_freeze_one_manifest_1.call_count + m_freeze_manifests_2.call_count
+    calls = m_freeze_folders.call_count + m_freeze_manifests_2.call_count
     print(f" m_freeze_folders.call_count {m_freeze_folders.call_count}")
     # print(f" m_freeze_one_manifest_1.call_count {m_freeze_one_manifest_1.call_count}")
-    print(f" m_freeze_one_manifest_2.call_count {m_freeze_one_manifest_2.call_count}")
+    print(f" m_freeze_manifests_2.call_count {m_freeze_manifests_2.call_count}")
 
     # TODO: fix me
     # assert calls >= 1
@@ -276,13 +276,14 @@ def test_freeze_manifest2_error_mocked(
 
     m_freeze_folders: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_folders", autospec=True, return_value=[1])
     # m_freeze_one_manifest_1: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_one_manifest_1", autospec=True, return_value=1)
-    m_freeze_one_manifest_2: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_one_manifest_2", autospec=True, return_value=1)
+    m_freeze_manifests_2: MagicMock = mocker.patch("stubber.freeze.get_frozen.freeze_manifests_2", autospec=True, return_value=34)
     # get the correct version to test
     switch(mpy_version, mpy_path=testrepo_micropython, mpy_lib_path=testrepo_micropython_lib)
     x = freeze_any(tmp_path, version=mpy_version, mpy_path=testrepo_micropython, mpy_lib_path=testrepo_micropython_lib)
     assert x >= 1, "expect >= 1 stubs"
     assert m_freeze_folders.call_count == 0, "expect no calls to freeze_folders"
-    assert m_freeze_one_manifest_2.call_count == 34, "34 calls to freeze_one_manifest_2"
+    assert m_freeze_manifests_2.call_count == 1
+    assert len(m_freeze_manifests_2.call_args.args[0]) == 34, "34 manifests to freeze_manifests_2"
     # assert m_freeze_one_manifest_1.call_count == 0
 
 
@@ -302,3 +303,119 @@ def test_get_manifests(
     for m in manifests:
         assert isinstance(m, Path), "expect Path object"
         assert m.name == "manifest.py", "expect manifest.py"
+
+
+def fake_mpy_repo(root: Path) -> Path:
+    "a minimal micropython repo with 2 boards that freeze the same modules, using relative paths"
+    mpy = root / "micropython"
+    (mpy / "ports/esp32/modules").mkdir(parents=True)
+    (mpy / "ports/esp32/boards").mkdir(parents=True)
+    (mpy / "ports/esp32/modules/_boot.py").write_text("import gc\n")
+    (mpy / "ports/esp32/boards/manifest.py").write_text('freeze("../modules")\ninclude("$(MPY_DIR)/extmod/manifest.py")\n')
+    (mpy / "extmod/lib").mkdir(parents=True)
+    (mpy / "extmod/lib/shared.py").write_text("def foo(): ...\n")
+    (mpy / "extmod/manifest.py").write_text('module("shared.py", base_path="lib")\n')
+    for board in ("GENERIC", "TINYPICO"):
+        (mpy / f"ports/esp32/boards/{board}").mkdir()
+        (mpy / f"ports/esp32/boards/{board}/manifest.py").write_text('include("$(PORT_DIR)/boards/manifest.py")\n')
+    return mpy
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_freeze_manifests_2(tmp_path: Path, jobs: int):
+    from stubber.freeze.freeze_manifest_2 import freeze_manifests_2
+
+    mpy = fake_mpy_repo(tmp_path)
+    stub_folder = tmp_path / "stubs"
+    cwd = Path.cwd()
+    manifests = sorted((mpy / "ports/esp32/boards").glob("*/manifest.py"))
+    count = freeze_manifests_2(manifests, stub_folder, mpy, tmp_path / "micropython-lib", "v1.19", jobs=jobs)
+    assert count == 2
+    assert Path.cwd() == cwd, "the working directory should not change"
+    for board in ("GENERIC", "TINYPICO"):
+        assert (stub_folder / f"esp32/{board}/_boot.py").exists()
+        assert (stub_folder / f"esp32/{board}/shared.py").read_text() == "def foo(): ...\n"
+    # without a blob store each board gets its own copy
+    assert not (stub_folder / "esp32/GENERIC/shared.py").samefile(stub_folder / "esp32/TINYPICO/shared.py")
+
+
+@pytest.mark.parametrize("link_mode", ["copy", "hardlink"])
+def test_freeze_manifests_2_skip_unchanged(tmp_path: Path, link_mode: str):
+    from stubber.freeze.blobstore import BlobStore
+    from stubber.freeze.freeze_manifest_2 import freeze_manifests_2
+
+    mpy = fake_mpy_repo(tmp_path)
+    stub_folder = tmp_path / "stubs"
+    manifests = sorted((mpy / "ports/esp32/boards").glob("*/manifest.py"))
+    store = BlobStore(tmp_path / "blobs", link_mode)
+    freeze_manifests_2(manifests, stub_folder, mpy, tmp_path / "micropython-lib", "v1.19", store=store, skip_unchanged=True)
+    assert store.stats == {link_mode: 4}
+    shared = stub_folder / "esp32/GENERIC/shared.py"
+    # only a hard link shares the file between the boards
+    assert shared.samefile(stub_folder / "esp32/TINYPICO/shared.py") == (link_mode == "hardlink")
+    (stub_folder / "esp32/GENERIC/shared.pyi").write_text("def foo() -> None: ...\n")
+    mtime = shared.stat().st_mtime_ns
+
+    # second run, only the changed module is written
+    (mpy / "ports/esp32/modules/_boot.py").write_text("import gc\ngc.collect()\n")
+    store = BlobStore(tmp_path / "blobs", link_mode)
+    freeze_manifests_2(manifests, stub_folder, mpy, tmp_path / "micropython-lib", "v1.19", store=store, skip_unchanged=True)
+    assert store.stats == {link_mode: 2, "unchanged": 2}
+    assert shared.stat().st_mtime_ns == mtime
+    assert (stub_folder / "esp32/GENERIC/shared.pyi").exists(), "the stub of an unchanged file is kept"
+    assert (stub_folder / "esp32/TINYPICO/_boot.py").read_text() == "import gc\ngc.collect()\n"
+    assert (stub_folder / "esp32/TINYPICO/modules.json").exists()
+
+
+def _freeze_files(mpy: Path, board: str):
+    "the files to freeze for a board, with the path vars of that board"
+    from stubber.freeze.freeze_manifest_2 import get_manifest_files
+
+    manifest = mpy / f"ports/esp32/boards/{board}/manifest.py"
+    _, _, files = get_manifest_files(manifest, mpy, mpy.parent / "micropython-lib")
+    return [(f.full_path, f.target_path, f.kind) for f in files]
+
+
+def test_manifest_include_cache(tmp_path: Path):
+    from stubber.tools import manifestfile
+
+    mpy = fake_mpy_repo(tmp_path)
+    manifestfile.clear_caches()
+    generic = _freeze_files(mpy, "GENERIC")
+    assert manifestfile.CACHE_STATS == {"hits": 0, "misses": 3}
+    # the port manifest is shared by both boards, and is replayed with the same result
+    assert _freeze_files(mpy, "TINYPICO") == generic
+    assert manifestfile.CACHE_STATS == {"hits": 1, "misses": 4}
+    assert sorted(Path(f[1]).name for f in generic) == ["_boot.py", "shared.py"]
+
+
+def test_manifest_include_cache_board_dir(tmp_path: Path):
+    "an included manifest that uses $(BOARD_DIR) is not shared between boards, but the manifests it includes are"
+    from stubber.tools import manifestfile
+
+    mpy = fake_mpy_repo(tmp_path)
+    port_manifest = mpy / "ports/esp32/boards/manifest.py"
+    port_manifest.write_text(port_manifest.read_text() + 'freeze("$(BOARD_DIR)/modules")\n')
+    for board in ("GENERIC", "TINYPICO"):
+        (mpy / f"ports/esp32/boards/{board}/modules").mkdir()
+        (mpy / f"ports/esp32/boards/{board}/modules/{board.lower()}.py").write_text("pass\n")
+    manifestfile.clear_caches()
+    _freeze_files(mpy, "GENERIC")
+    files = _freeze_files(mpy, "TINYPICO")
+    assert manifestfile.CACHE_STATS == {"hits": 1, "misses": 5}
+    assert sorted(Path(f[1]).name for f in files) == ["_boot.py", "shared.py", "tinypico.py"]
+
+
+def test_manifest_include_cache_invalidated(tmp_path: Path):
+    from stubber.tools import manifestfile
+
+    mpy = fake_mpy_repo(tmp_path)
+    manifestfile.clear_caches()
+    _freeze_files(mpy, "GENERIC")
+    # a new file in a frozen folder, and a changed included manifest
+    (mpy / "ports/esp32/modules/flashbdev.py").write_text("bdev = None\n")
+    (mpy / "extmod/manifest.py").write_text('module("shared.py", base_path="lib")\nmodule("other.py", base_path="lib")\n')
+    (mpy / "extmod/lib/other.py").write_text("def bar(): ...\n")
+    files = _freeze_files(mpy, "TINYPICO")
+    assert manifestfile.CACHE_STATS["hits"] == 0
+    assert sorted(Path(f[1]).name for f in files) == ["_boot.py", "flashbdev.py", "other.py", "shared.py"]
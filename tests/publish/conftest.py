@@ -4,9 +4,9 @@ import shutil
 from pathlib import Path
 
 import pytest
-from pysondb import PysonDB
 from pytest_mock import MockerFixture
 
+from stubber.publish.database import get_database
 from stubber.publish.enums import COMBO_STUBS
 from stubber.publish.package import create_package
 
@@ -47,12 +47,7 @@ def temp_db(
     """"""
     db_src = pytestconfig.rootpath / "tests/publish/data/package_data_test.jsondb"
     db_path = tmp_path / "package_data_test.jsondb"
-    # copy file to temp location
+    # copy file to temp location, and migrate it
     shutil.copy(db_src, db_path)
-    db = PysonDB(db_path.as_posix())
-
-    def fake_commit():
-        pass
-
-    db.commit = fake_commit
+    db = get_database(tmp_path, production=False)
     yield db
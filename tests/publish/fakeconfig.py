@@ -20,11 +20,13 @@ class FakeConfig:
     mpy_path: Path = Path(".override/repos/mpy")
     mpy_lib_path: Path = Path(".override/repos/mpy-lib")
     mpy_stubs_repo_path: Path = Path(".override/repos/mpy-stubs")
+    cache_path: Path = Path(".override/repos/.cache")
 
     def __post_init__(self, tmp_path: Optional[Path] = None, rootpath: Optional[Path] = None):
         if tmp_path and rootpath:
             self.publish_path = tmp_path / "publish"
             self.stub_path = rootpath / "repos/micropython-stubs/stubs"
             self.template_path = rootpath / "tests/publish/data/template"
+            self.cache_path = tmp_path / ".cache"
 
             self.publish_path.mkdir(parents=True, exist_ok=True)
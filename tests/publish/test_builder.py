@@ -0,0 +1,103 @@
+"""Test the in-process builder for stub-only packages"""
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+try:
+    import tomllib  # type: ignore
+except ModuleNotFoundError:
+    import tomli as tomllib  # type: ignore
+
+from stubber.publish import builder
+
+
+@pytest.fixture
+def stub_package(tmp_path: Path, pytestconfig: pytest.Config):
+    """A minimal stub-only package folder, based on the test template"""
+    template = pytestconfig.rootpath / "tests/publish/data/template"
+    pkg_path = tmp_path / "micropython-v1_19_1-esp32-stubs"
+    pkg_path.mkdir()
+    for name in ["README.md", "LICENSE.md", "pyproject.toml"]:
+        (pkg_path / name).write_bytes((template / name).read_bytes())
+    (pkg_path / "machine.pyi").write_text("def reset() -> None: ...\n")
+    (pkg_path / "collections").mkdir()
+    (pkg_path / "collections" / "__init__.pyi").write_text("class deque: ...\n")
+    with open(pkg_path / "pyproject.toml", "rb") as f:
+        pyproject = tomllib.load(f)
+    poetry = pyproject["tool"]["poetry"]
+    poetry["name"] = "micropython-esp32-stubs"
+    poetry["version"] = "1.19.1.post2"
+    poetry["packages"] = [{"include": "collections/__init__.pyi"}, {"include": "machine.pyi"}]
+    return pkg_path, pyproject
+
+
+@pytest.mark.parametrize(
+    "constraint, expected",
+    [
+        ("^3.8", ">=3.8,<4.0"),
+        ("^0.9", ">=0.9,<0.10"),
+        ("~1.2.3", ">=1.2.3,<1.3"),
+        (">=1.0, <2.0", ">=1.0,<2.0"),
+        ("1.2.3", "==1.2.3"),
+        ("*", ""),
+    ],
+)
+def test_poetry_constraint(constraint: str, expected: str):
+    assert builder.poetry_constraint(constraint) == expected
+
+
+def test_poetry_constraint_unsupported():
+    with pytest.raises(builder.UnsupportedPackageError):
+        builder.poetry_constraint("^1.0 || ^2.0")
+
+
+def test_check_package(stub_package):
+    pkg_path, pyproject = stub_package
+    assert builder.check_package(pkg_path, pyproject) == []
+
+    pyproject["tool"]["poetry"]["version"] = "latest"
+    assert builder.check_package(pkg_path, pyproject)
+
+    pyproject["tool"]["poetry"]["version"] = "1.19.1"
+    pyproject["tool"]["poetry"]["scripts"] = {"foo": "bar:main"}
+    with pytest.raises(builder.UnsupportedPackageError):
+        builder.check_package(pkg_path, pyproject)
+
+
+def test_build_wheel(stub_package, tmp_path: Path):
+    pkg_path, pyproject = stub_package
+    wheel = builder.build_wheel(pkg_path, pyproject, tmp_path / "dist")
+    assert wheel.name == "micropython_esp32_stubs-1.19.1.post2-py3-none-any.whl"
+    with zipfile.ZipFile(wheel) as zf:
+        names = zf.namelist()
+        dist_info = "micropython_esp32_stubs-1.19.1.post2.dist-info"
+        assert "machine.pyi" in names
+        assert "collections/__init__.pyi" in names
+        assert "pyproject.toml" not in names
+        assert names[-1] == f"{dist_info}/RECORD"
+        metadata = zf.read(f"{dist_info}/METADATA").decode()
+        record = zf.read(f"{dist_info}/RECORD").decode()
+    assert "Name: micropython-esp32-stubs" in metadata
+    assert "Version: 1.19.1.post2" in metadata
+    assert "Requires-Python: >=3.8,<4.0" in metadata
+    assert "Description-Content-Type: text/markdown" in metadata
+    # all files except the RECORD itself are hashed
+    assert len(record.splitlines()) == len(names)
+    assert all("sha256=" in line for line in record.splitlines()[:-1])
+
+    # an unchanged package builds to an identical wheel
+    content = wheel.read_bytes()
+    assert builder.build_wheel(pkg_path, pyproject, tmp_path / "dist").read_bytes() == content
+
+
+def test_build_sdist(stub_package, tmp_path: Path):
+    pkg_path, pyproject = stub_package
+    sdist = builder.build_sdist(pkg_path, pyproject, tmp_path / "dist")
+    assert sdist.name == "micropython_esp32_stubs-1.19.1.post2.tar.gz"
+    with tarfile.open(sdist) as tar:
+        names = tar.getnames()
+    base = "micropython_esp32_stubs-1.19.1.post2"
+    for name in ["machine.pyi", "collections/__init__.pyi", "pyproject.toml", "README.md", "LICENSE.md", "PKG-INFO"]:
+        assert f"{base}/{name}" in names
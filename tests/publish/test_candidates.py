@@ -1,12 +1,16 @@
 """Test candidates.py"""
+import subprocess
 from pathlib import Path
 from typing import Generator, List, Union
 
 import pytest
 
+import stubber.publish.candidates as candidates
 from stubber.publish.candidates import (
     COMBO_STUBS,
     DOC_STUBS,
+    CandidateIndex,
+    board_candidates,
     docstub_candidates,
     frozen_candidates,
     subfolder_names,
@@ -167,3 +171,86 @@ def test_worklist(
     # no exact match meeted , +- .05 or +- 2 is good enough
     assert len(wl) == pytest.approx(count, rel=0.05), f"expected {count}, found {len(wl)} {msg}."
     assert len(wl) == pytest.approx(count, abs=2), f"expected {count}, found {len(wl)} {msg}."
+
+
+def _git(repo: Path, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args], cwd=repo, check=True, capture_output=True)
+
+
+def _add_board(repo: Path, port: str, board: str):
+    (repo / "ports" / port / "boards" / board).mkdir(parents=True)
+    (repo / "ports" / port / "boards" / board / "mpconfigboard.h").write_text("")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "--quiet", "-m", f"add {port}/{board}")
+
+
+@pytest.fixture
+def mpy_repo(tmp_path: Path) -> Path:
+    "a minimal micropython repo with 2 version tags, checked out at the oldest tag"
+    repo = tmp_path / "micropython"
+    repo.mkdir()
+    _git(repo, "init", "--quiet", "--initial-branch=master")
+    _add_board(repo, "esp32", "GENERIC")
+    _add_board(repo, "esp32", "UM_TINYPICO")
+    _add_board(repo, "minimal", "FOO")
+    _git(repo, "tag", "v1.19")
+    _add_board(repo, "rp2", "PICO")
+    _git(repo, "tag", "v1.20")
+    _git(repo, "checkout", "--quiet", "v1.19")
+    return repo
+
+
+def test_board_candidates_git_tree(tmp_path: Path, mpy_repo: Path):
+    "ports and boards are read from the git tree of each version, without a checkout"
+    index = CandidateIndex(tmp_path / "candidate_index.json")
+    wl = list(board_candidates(versions=["v1.19", "v1.20", "latest"], mpy_path=mpy_repo, index=index))
+    found = [f"{c['version']}-{c['port']}-{c['board']}" for c in wl]
+    assert found == [
+        "v1.19-esp32-GENERIC",
+        "v1.19-esp32-UM_TINYPICO",
+        "v1.20-esp32-GENERIC",
+        "v1.20-esp32-UM_TINYPICO",
+        "v1.20-rp2-GENERIC",
+        "v1.20-rp2-PICO",
+        "latest-esp32-GENERIC",
+        "latest-esp32-UM_TINYPICO",
+        "latest-rp2-GENERIC",
+        "latest-rp2-PICO",
+    ]
+    # the working tree is not changed
+    assert not (mpy_repo / "ports" / "rp2").exists()
+
+
+def test_candidate_index(tmp_path: Path, mpy_repo: Path, mocker):
+    "the ports and boards are cached per commit, and re-read when a version moves to a new commit"
+    index_file = tmp_path / "candidate_index.json"
+    versions = ["v1.19", "v1.20", "latest"]
+    list(board_candidates(versions=versions, mpy_path=mpy_repo, index=CandidateIndex(index_file)))
+    assert index_file.exists()
+
+    m_list = mocker.spy(candidates, "list_micropython_ports_boards")
+    index = CandidateIndex(index_file)
+    # v1.20 and latest are the same commit
+    assert len(index.trees) == 2
+    assert len(list(board_candidates(versions=versions, mpy_path=mpy_repo, index=index))) == 10
+    assert m_list.call_count == 0
+
+    # a new commit on master invalidates latest only
+    _git(mpy_repo, "checkout", "--quiet", "master")
+    _add_board(mpy_repo, "rp2", "PICO_W")
+    wl = list(board_candidates(versions=versions, mpy_path=mpy_repo, index=index))
+    assert m_list.call_count == 1
+    assert [c["board"] for c in wl if c["version"] == "latest" and c["port"] == "rp2"] == ["GENERIC", "PICO", "PICO_W"]
+
+
+def test_candidate_index_stub_folders(tmp_path: Path):
+    "the stub folders are re-read when a folder is added"
+    stubs = tmp_path / "stubs"
+    stubs.mkdir()
+    index = CandidateIndex(tmp_path / "candidate_index.json")
+    (stubs / "micropython-v1_19-frozen").mkdir()
+    assert index.stub_folders(stubs) == ["micropython-v1_19-frozen"]
+    (stubs / "micropython-v1_20-frozen").mkdir()
+    assert index.stub_folders(stubs) == ["micropython-v1_19-frozen", "micropython-v1_20-frozen"]
+    # stored in the index file
+    assert CandidateIndex(tmp_path / "candidate_index.json").folders
@@ -1,7 +1,12 @@
 # test get package from database
+import json
+import shutil
 from pathlib import Path
+
 import pytest
 
+from stubber.publish.database import PackageDB, get_database
+
 from stubber.publish.package import get_package_info
 
 
@@ -15,11 +20,8 @@ from stubber.publish.package import get_package_info
         ("pycopy-foo-stubs", "1.18", False),
     ],
 )
-def test_get_package_info(pytestconfig, package_name, version, present):
-    # Cache database in memory?
-    # TODO: use test database with known content
-    testdata = pytestconfig.rootpath / "tests/publish/data"
-    db = get_database(testdata, production=False)
+def test_get_package_info(temp_db: PackageDB, package_name, version, present):
+    db = temp_db
     pkg_info = get_package_info(db, Path("foo"), pkg_name=package_name, mpy_version=version)
     if present:
         assert pkg_info
@@ -34,4 +36,48 @@ def test_get_package_info(pytestconfig, package_name, version, present):
         assert pkg_info == None
 
 
-from stubber.publish.database import get_database
+def test_migrate_database(pytestconfig: pytest.Config, tmp_path: Path):
+    db_src = pytestconfig.rootpath / "tests/publish/data/package_data_test.jsondb"
+    shutil.copy(db_src, tmp_path / "package_data_test.jsondb")
+    db = get_database(tmp_path, production=False)
+    assert (tmp_path / "package_data_test.jsonl").exists()
+    assert len(db) == len(json.loads(db_src.read_text())["data"])
+    # re-open the migrated database
+    assert len(get_database(tmp_path, production=False)) == len(db)
+
+
+def test_database_append(tmp_path: Path):
+    db = get_database(tmp_path, production=True)
+    assert len(db) == 0
+    rec = {"name": "micropython-foo-stubs", "mpy_version": "1.20.0", "pkg_version": "1.20.0.post1"}
+    db.add(rec)
+    db.add({**rec, "pkg_version": "1.20.0.post10"})
+    db.add({**rec, "pkg_version": "1.20.0.post2"})
+    db.commit()
+    lines = (tmp_path / "package_data.jsonl").read_text().splitlines()
+    assert len(lines) == 3
+
+    db = get_database(tmp_path, production=True)
+    assert db.get_latest("micropython-foo-stubs", "1.20.0")["pkg_version"] == "1.20.0.post10"  # type: ignore
+    assert db.get("micropython-foo-stubs", "1.20.0", "1.20.0.post2")
+    assert db.get("micropython-foo-stubs", "1.19.1", "1.20.0.post2") is None
+    assert db.get_latest("micropython-bar-stubs", "1.20.0") is None
+
+    # commit only appends the new records
+    db.add({**rec, "pkg_version": "1.20.0.post11"})
+    db.commit()
+    assert (tmp_path / "package_data.jsonl").read_text().splitlines()[:3] == lines
+    assert len(get_database(tmp_path, production=True)) == 4
+
+
+def test_database_transaction(tmp_path: Path):
+    db = get_database(tmp_path, production=True)
+    rec = {"name": "micropython-foo-stubs", "mpy_version": "1.20.0", "pkg_version": "1.20.0.post1"}
+    with db.transaction():
+        db.add(rec)
+    with pytest.raises(ValueError):
+        with db.transaction():
+            db.add({**rec, "pkg_version": "1.20.0.post2"})
+            raise ValueError("abort")
+    assert db.get_latest("micropython-foo-stubs", "1.20.0")["pkg_version"] == "1.20.0.post1"  # type: ignore
+    assert len(get_database(tmp_path, production=True)) == 1
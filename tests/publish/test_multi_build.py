@@ -4,6 +4,7 @@ import pytest
 from mock import MagicMock
 from pytest_mock import MockerFixture
 
+from stubber.publish.enums import COMBO_STUBS
 from stubber.publish.publish import build_multiple
 
 from .fakeconfig import FakeConfig
@@ -96,3 +97,26 @@ def test_build_force(mocker: MockerFixture, tmp_path: Path, pytestconfig: pytest
     assert len(result) > 0
     assert m_p_build.call_count >= 1
     assert m_p_publish.call_count == 0
+
+
+@pytest.mark.mocked
+@pytest.mark.linux
+def test_build_multiple_jobs(mocker: MockerFixture, tmp_path: Path, pytestconfig: pytest.Config):
+    """Test build_multiple using a process pool, the results should be returned in the order of the worklist"""
+    # use the test config
+    config = FakeConfig(tmp_path=tmp_path, rootpath=pytestconfig.rootpath)
+    # no stubs are available, so all packages should be skipped
+    config.stub_path = tmp_path / "stubs"
+    mocker.patch("stubber.publish.publish.CONFIG", config)
+    mocker.patch("stubber.publish.stubpacker.CONFIG", config)
+    worklist = [
+        {"family": "micropython", "version": "1.19.1", "port": port, "board": "GENERIC", "pkg_type": COMBO_STUBS}
+        for port in ["esp32", "stm32", "rp2", "esp8266"]
+    ]
+    mocker.patch("stubber.publish.publish.build_worklist", autospec=True, return_value=worklist)
+    mocker.patch("stubber.publish.publish.prefetch_pypi_versions", autospec=True)
+
+    result = build_multiple(production=False, jobs=2)
+    assert len(result) == len(worklist)
+    assert [r["name"] for r in result] == [f"micropython-{w['port']}-stubs" for w in worklist]
+    assert all(r["error"] for r in result), "all packages should be skipped"
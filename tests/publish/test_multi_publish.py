@@ -5,6 +5,8 @@ from mock import MagicMock
 from pytest_mock import MockerFixture
 from .fakeconfig import FakeConfig
 
+from stubber.publish.database import get_database
+from stubber.publish.enums import COMBO_STUBS
 from stubber.publish.publish import publish_multiple
 
 
@@ -149,3 +151,34 @@ def test_publish_force(mocker: MockerFixture, tmp_path: Path, pytestconfig: pyte
     assert len(result) > 0
     assert m_p_build.call_count >= 1, "Build should be called"
     assert m_p_publish.call_count >= 1, "Publish should be called"
+
+
+@pytest.mark.mocked
+@pytest.mark.linux
+def test_publish_multiple_jobs_error(mocker: MockerFixture, tmp_path: Path, pytestconfig: pytest.Config):
+    """An error in one package should not stop the other packages, and their records should still be added to the database"""
+    config = FakeConfig(tmp_path=tmp_path, rootpath=pytestconfig.rootpath)
+    mocker.patch("stubber.publish.publish.CONFIG", config)
+    mocker.patch("stubber.publish.stubpacker.CONFIG", config)
+    worklist = [
+        {"family": "micropython", "version": "1.19.1", "port": port, "board": "GENERIC", "pkg_type": COMBO_STUBS}
+        for port in ["esp32", "stm32", "rp2"]
+    ]
+    mocker.patch("stubber.publish.publish.build_worklist", autospec=True, return_value=worklist)
+    mocker.patch("stubber.publish.publish.prefetch_pypi_versions", autospec=True)
+
+    def publish(self, db, **kwargs):
+        db.add({"name": self.package_name, "mpy_version": self.mpy_version, "pkg_version": "1.19.1.post1"})
+        if "stm32" in self.package_name:
+            raise RuntimeError("upload interrupted")
+        return True
+
+    # the workers are forked, and inherit the patched method
+    mocker.patch("stubber.publish.stubpacker.StubPackage.publish", autospec=True, side_effect=publish)
+
+    result = publish_multiple(production=False, jobs=2)
+    assert [r["name"] for r in result] == [f"micropython-{w['port']}-stubs" for w in worklist]
+    assert [bool(r["error"]) for r in result] == [False, True, False]
+    assert "upload interrupted" in str(result[1]["error"])
+    db = get_database(config.publish_path, production=False)
+    assert [r["name"] for r in db.get_all()] == [f"micropython-{w['port']}-stubs" for w in worklist]
@@ -228,3 +228,38 @@ def run_common_package_tests(package: StubPackage, pkg_name, publish_path: Path,
     package.clean()
     filelist = list((package.package_path).rglob("*.py")) + list((package.package_path).rglob("*.pyi"))
     assert len(filelist) == 0
+
+
+@pytest.mark.mocked
+def test_pyproject_cache(fake_package: StubPackage):
+    pkg = fake_package
+    toml_text = pkg.toml_path.read_text()
+    reads = pkg.toml_io["read"]
+
+    for n in range(1, 4):
+        pkg.pkg_version = f"1.19.1.post{n}"
+        assert pkg.pkg_version == f"1.19.1.post{n}"
+    # no reads or writes until the changes are written
+    assert pkg.toml_io["read"] == reads
+    assert pkg.toml_path.read_text() == toml_text
+    assert pkg.toml_io["read_saved"] >= 3
+    assert pkg.toml_io["write_saved"] >= 2
+
+    pkg.write_pyproject()
+    assert "1.19.1.post3" in pkg.toml_path.read_text()
+    writes = pkg.toml_io["write"]
+    # nothing changed, so nothing to write
+    pkg.write_pyproject()
+    assert pkg.toml_io["write"] == writes
+
+
+@pytest.mark.mocked
+def test_pyproject_cache_skipped_package(fake_package: StubPackage, mocker: MockerFixture):
+    """the in-memory pyproject.toml is dropped with the package folder of a skipped package"""
+    pkg = fake_package
+    pkg.pkg_version = "1.19.1.post5"
+    mocker.patch.object(pkg, "are_package_sources_available", return_value=False)
+    assert not pkg.build(production=False)
+    assert not pkg.package_path.exists(), "the package folder should not be re-created"
+    assert pkg.pkg_version == pkg.mpy_version
+    assert pkg.status["version"] == pkg.mpy_version
@@ -1,13 +1,13 @@
 """Test publish module - refactored"""
 from pathlib import Path
 import pytest
-from mock import MagicMock
+from mock import MagicMock, patch
 from pytest_mock import MockerFixture
 from packaging.version import parse
 
 
 from stubber.publish.stubpacker import StubPackage
-from pysondb import PysonDB
+from stubber.publish.database import PackageDB
 
 
 @pytest.mark.mocked
@@ -54,6 +54,35 @@ def test_hash(mocker: MockerFixture, tmp_path: Path, pytestconfig: pytest.Config
     assert pkg.is_changed(include_md=False), "should show as changed after stub hash change"
 
 
+@pytest.mark.mocked
+def test_hash_manifest(mocker: MockerFixture, fake_package: StubPackage):
+    pkg = fake_package
+    (pkg.package_path / "foo.pyi").write_text("def foo() -> int: ...\n")
+    (pkg.package_path / "bar.pyi").write_text("def bar() -> str: ...\n")
+
+    pkg.update_hashes()
+    assert pkg.manifest_path.exists()
+    assert not pkg.is_changed()
+    assert pkg.changed_files() == []
+
+    # an unchanged package should not be re-hashed
+    with patch("stubber.publish.stubpacker.open", wraps=open) as m_open:
+        assert pkg.calculate_hash() == pkg.hash
+    assert not any(c.args[0] != pkg.manifest_path for c in m_open.call_args_list), "only the manifest should be read"
+
+    # change, add and remove files
+    (pkg.package_path / "foo.pyi").write_text("def foo() -> float: ...\n")
+    (pkg.package_path / "baz.pyi").write_text("def baz() -> None: ...\n")
+    (pkg.package_path / "bar.pyi").unlink()
+    assert pkg.is_changed()
+    assert pkg.is_changed(include_md=False)
+    assert pkg.changed_files() == ["bar.pyi", "baz.pyi", "foo.pyi"]
+
+    pkg.update_hashes()
+    assert not pkg.is_changed()
+    assert pkg.changed_files() == []
+
+
 @pytest.mark.integration
 def test_update_package(fake_package: StubPackage):
     pkg = fake_package
@@ -116,7 +145,7 @@ def test_build_package(mocker: MockerFixture, tmp_path: Path, pytestconfig: pyte
 
 
 @pytest.mark.integration
-def test_publish_package(mocker: MockerFixture, tmp_path: Path, pytestconfig: pytest.Config, fake_package: StubPackage, temp_db: PysonDB):
+def test_publish_package(mocker: MockerFixture, tmp_path: Path, pytestconfig: pytest.Config, fake_package: StubPackage, temp_db: PackageDB):
     pkg = fake_package
     db = temp_db
 
@@ -0,0 +1,157 @@
+"""Test the PyPI version cache against a local stand-in simple index"""
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from stubber.publish.publish import _init_worker
+from stubber.publish.pypi import TEST_PYPI_ENDPOINT, PyPIVersionCache, get_pypi_versions
+
+PROJECTS = {
+    "micropython-esp32-stubs": ["1.19.1.post1", "1.19.1.post2", "1.20.0.post1"],
+    "micropython-rp2-stubs": ["1.20.0.post1"],
+}
+
+
+class SimpleIndexHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        project = self.path.strip("/").split("/")[-1]
+        self.requests_seen.append(project)
+        if project not in PROJECTS:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{project}-{len(PROJECTS[project])}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        name = project.replace("-", "_")
+        files = [{"filename": f"{name}-{v}-py3-none-any.whl"} for v in PROJECTS[project]]
+        files += [{"filename": f"{name}-{v}.tar.gz"} for v in PROJECTS[project]]
+        body = json.dumps({"name": project, "files": files}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.pypi.simple.v1+json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def simple_index():
+    SimpleIndexHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SimpleIndexHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/simple/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_versions(simple_index: str, tmp_path: Path):
+    cache = PyPIVersionCache(tmp_path / "pypi.json")
+    assert cache.get(simple_index, "micropython-esp32-stubs") == PROJECTS["micropython-esp32-stubs"]
+    assert cache.get(simple_index, "micropython-foo-stubs") == []
+    # served from the cache
+    assert cache.get(simple_index, "micropython-esp32-stubs") == PROJECTS["micropython-esp32-stubs"]
+    assert SimpleIndexHandler.requests_seen == ["micropython-esp32-stubs", "micropython-foo-stubs"]
+    # persisted to disk
+    cache2 = PyPIVersionCache(tmp_path / "pypi.json")
+    assert cache2.get(simple_index, "micropython-esp32-stubs") == PROJECTS["micropython-esp32-stubs"]
+    assert len(SimpleIndexHandler.requests_seen) == 2
+
+
+def test_revalidate_etag(simple_index: str, tmp_path: Path):
+    cache = PyPIVersionCache(tmp_path / "pypi.json", ttl=0)
+    first = cache.get(simple_index, "micropython-rp2-stubs")
+    etag = cache.entries[simple_index]["micropython-rp2-stubs"]["etag"]
+    assert etag
+    # stale entry is revalidated, and not modified
+    assert cache.get(simple_index, "micropython-rp2-stubs") == first
+    assert cache.entries[simple_index]["micropython-rp2-stubs"]["etag"] == etag
+    assert len(SimpleIndexHandler.requests_seen) == 2
+
+
+def test_prefetch(simple_index: str, tmp_path: Path):
+    cache = PyPIVersionCache(tmp_path / "pypi.json")
+    names = ["micropython-esp32-stubs", "micropython-rp2-stubs", "micropython-foo-stubs", "micropython-esp32-stubs"]
+    result = cache.prefetch(simple_index, names, max_workers=4)
+    assert result["micropython-rp2-stubs"] == PROJECTS["micropython-rp2-stubs"]
+    assert result["micropython-foo-stubs"] == []
+    assert sorted(SimpleIndexHandler.requests_seen) == sorted(set(names))
+    # all fresh, no more requests
+    cache.prefetch(simple_index, names)
+    assert len(SimpleIndexHandler.requests_seen) == 3
+
+
+def test_offline(simple_index: str, tmp_path: Path):
+    cache = PyPIVersionCache(tmp_path / "pypi.json", ttl=0)
+    cache.get(simple_index, "micropython-rp2-stubs")
+    cache.offline = True
+    assert cache.get(simple_index, "micropython-rp2-stubs") == PROJECTS["micropython-rp2-stubs"]
+    assert cache.get(simple_index, "micropython-esp32-stubs") == []
+    assert SimpleIndexHandler.requests_seen == ["micropython-rp2-stubs"]
+
+
+def test_spawned_worker_uses_cache(tmp_path: Path):
+    """The workers get the cache file and offline mode from the initializer, not by forking the main process"""
+    cache_file = tmp_path / "pypi.json"
+    entry = {"versions": PROJECTS["micropython-rp2-stubs"], "etag": None, "fetched": 0}
+    cache_file.write_text(json.dumps({TEST_PYPI_ENDPOINT: {"micropython-rp2-stubs": entry}}))
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker, initargs=(cache_file, True)) as executor:
+        versions = executor.submit(get_pypi_versions, "micropython-rp2-stubs", production=False).result()
+    assert [str(v) for v in versions] == PROJECTS["micropython-rp2-stubs"]
+
+
+def test_refresh(simple_index: str, tmp_path: Path):
+    cache = PyPIVersionCache(tmp_path / "pypi.json")
+    cache.get(simple_index, "micropython-rp2-stubs")
+    # a fresh entry is revalidated when asked to refresh
+    assert cache.get(simple_index, "micropython-rp2-stubs", refresh=True) == PROJECTS["micropython-rp2-stubs"]
+    assert len(SimpleIndexHandler.requests_seen) == 2
+    # but not when offline
+    cache.offline = True
+    cache.get(simple_index, "micropython-rp2-stubs", refresh=True)
+    assert len(SimpleIndexHandler.requests_seen) == 2
+
+
+def test_add_version(simple_index: str, tmp_path: Path):
+    cache = PyPIVersionCache(tmp_path / "pypi.json")
+    cache.get(simple_index, "micropython-rp2-stubs")
+    cache.add_version(simple_index, "micropython-rp2-stubs", "1.20.0.post2")
+    assert cache.get(simple_index, "micropython-rp2-stubs") == ["1.20.0.post1", "1.20.0.post2"]
+    # persisted to disk
+    assert PyPIVersionCache(tmp_path / "pypi.json").entries[simple_index]["micropython-rp2-stubs"]["versions"][-1] == "1.20.0.post2"
+    assert len(SimpleIndexHandler.requests_seen) == 1
+
+
+def test_read_only_changes_merged(simple_index: str, tmp_path: Path):
+    """A worker does not save the cache, the main process merges its changes and saves once"""
+    main = PyPIVersionCache(tmp_path / "pypi.json")
+    main.get(simple_index, "micropython-esp32-stubs")
+    main.take_changes()
+    worker = PyPIVersionCache(tmp_path / "pypi.json", read_only=True)
+    worker.get(simple_index, "micropython-rp2-stubs")
+    worker.add_version(simple_index, "micropython-esp32-stubs", "1.20.0.post2")
+    assert "micropython-rp2-stubs" not in PyPIVersionCache(tmp_path / "pypi.json").entries[simple_index]
+    changes = worker.take_changes()
+    assert sorted(changes[simple_index]) == ["micropython-esp32-stubs", "micropython-rp2-stubs"]
+    assert worker.take_changes() == {}
+    main.merge(changes)
+    main.save()
+    saved = PyPIVersionCache(tmp_path / "pypi.json").entries[simple_index]
+    assert saved["micropython-rp2-stubs"]["versions"] == PROJECTS["micropython-rp2-stubs"]
+    assert saved["micropython-esp32-stubs"]["versions"][-1] == "1.20.0.post2"
+    assert [f.name for f in tmp_path.iterdir()] == ["pypi.json"]
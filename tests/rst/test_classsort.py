@@ -6,7 +6,7 @@ import pytest
 pytestmark = pytest.mark.doc_stubs
 
 # SOT
-from stubber.rst import sort_classes
+from stubber.rst import ClassOrder, sort_classes
 
 
 def test_sort_classes():
@@ -54,3 +54,24 @@ def test_sort_classes_full():
     assert len(sorted) == len(classes)
     assert sorted[0] == "class Bar():"
     assert sorted[1] == "class Foo(Bar):"
+
+
+@pytest.mark.parametrize(
+    "classes",
+    [
+        ["class Spam(Foo)", "class Foo(Bar)", "class Bar(Parrot)", "class Parrot()"],
+        ["class Foo(Bar):", "class Bar():", "class Baz(Exception):"],
+        ["class Foo(Foo):", "class Spam(Foo):", "class Bar():"],
+        [],
+    ],
+)
+def test_class_order(classes):
+    order = ClassOrder()
+    for c in classes:
+        order.add(c)
+    assert order.sorted() == sort_classes(classes)
+    # incremental updates
+    order.add("class Egg(Spam):")
+    assert order.sorted() == sort_classes(classes + ["class Egg(Spam):"])
+    order.remove("class Egg(Spam):")
+    assert order.sorted() == sort_classes(classes)
@@ -300,3 +300,24 @@ def test_exception_class():
 
     assert "class AssertionError(Exception) : ..." in lines
     assert od.find("class AssertionError") != None
+
+
+def test_find_class_index():
+    od = ModuleSourceDict("utest")
+    od += ClassSourceDict(name="class Foo(Bar):")
+    od += ClassSourceDict(name="class Bar():")
+    od.add_line("def fly():")
+    assert od.find("class Foo(Bar):") == "class Foo(Bar):"
+    assert od.find("Foo") == "class Foo(Bar):"
+    assert od.find("class Bar") == "class Bar():"
+    assert od.find("class fly") is None
+    assert od.classes() == ["class Bar():", "class Foo(Bar):"]
+    # sorted in place
+    str(od)
+    assert list(od.keys())[5:] == ["class Bar():", "class Foo(Bar):", "1"]
+    # updating a class keeps the index
+    od += ClassSourceDict(name="class Foo(Bar):")
+    assert od.classes() == ["class Bar():", "class Foo(Bar):"]
+    del od["class Foo(Bar):"]
+    assert od.find("Foo") is None
+    assert od.classes() == ["class Bar():"]
@@ -2,9 +2,14 @@ from typing import List, Tuple
 import pytest
 from pathlib import Path
 import json
+import time
+
+from pytest_mock import MockerFixture
 
 # SOT
-from stubber.rst.rst_utils import _type_from_context, return_type_from_context
+from stubber.rst.reader import RSTWriter
+from stubber.rst import rst_utils
+from stubber.rst.rst_utils import KeywordMatcher, ReturnTypeCache, _type_from_context, load_return_type_cache, return_type_from_context
 
 # mark all tests
 pytestmark = pytest.mark.doc_stubs
@@ -69,3 +74,105 @@ def test_returns(module, signature, docstring, expected_type):
     # assert r["confidence"] >= confidence
     t = return_type_from_context(docstring=docstring, signature=signature, module=module)
     assert t == expected_type
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "an unsigned integer with the number of bytes",
+        "a list of tuples, or a list of lists",
+        "aaaa",
+        "",
+    ],
+)
+def test_keyword_matcher(text: str):
+    keywords = [
+        "unsigned integer",
+        "unsigned int",
+        "unsigned",
+        "int",
+        "integer",
+        "number",
+        "number of",
+        "list of",
+        "a list of",
+        "aa",
+        "aaa",
+    ]
+    found = KeywordMatcher(keywords).find(text)
+    # same as str.find for all keywords
+    assert found == {kw: text.find(kw) for kw in keywords if kw in text}
+
+
+@pytest.fixture
+def keep_return_type_cache(monkeypatch: pytest.MonkeyPatch):
+    "restore the global return type cache after the test, also if the test fails"
+    monkeypatch.setattr(rst_utils, "_return_type_cache", rst_utils.return_type_cache())
+    yield
+
+
+@pytest.mark.usefixtures("keep_return_type_cache")
+def test_return_type_cache(tmp_path: Path, mocker: MockerFixture):
+    # the cache folder does not exist yet
+    cache_file = tmp_path / "cache" / "rst" / "return_types.json"
+    cache = load_return_type_cache(cache_file)
+    m_infer = mocker.spy(rst_utils, "_type_from_context")
+    kwargs = dict(module="machine", signature=".. method:: Pin.value([x])", docstring=["Returns the pin value", "as an integer."])
+    first = return_type_from_context(**kwargs)
+    assert return_type_from_context(**kwargs) == first
+    assert m_infer.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+    # a str docstring is normalized the same as a list
+    assert ReturnTypeCache.key(**{**kwargs, "docstring": "Returns the pin value as an integer."}) == ReturnTypeCache.key(**kwargs)
+    cache.save()
+    assert cache_file.exists()
+
+    # shared across runs
+    cache = load_return_type_cache(cache_file)
+    assert return_type_from_context(**kwargs) == first
+    assert m_infer.call_count == 1
+    assert cache.hits == 1
+
+    # discarded when the lookup tables change
+    mocker.patch.object(rst_utils, "LOOKUP_VERSION", "changed")
+    cache = load_return_type_cache(cache_file)
+    assert not cache.entries
+
+
+MAX_TIME_PER_DOCSTRING = 2_000
+"microseconds, well above the measured ~20 us per docstring, to catch regressions without flaky failures"
+
+
+@pytest.mark.slow
+def test_return_type_benchmark(testrepo_micropython: Path, pytestconfig: pytest.Config, mocker: MockerFixture):
+    "micro-benchmark of the return type inference over all docstrings in the rst corpus"
+    rst_files = sorted((pytestconfig.rootpath / "tests/rst/data").glob("*.rst"))
+    rst_files += sorted((testrepo_micropython / "docs/library").glob("*.rst"))
+    # collect the docstrings that the rst reader passes to the inference
+    corpus = []
+
+    def collect(**kwargs):
+        corpus.append(kwargs)
+        return return_type_from_context(**kwargs)
+
+    mocker.patch("stubber.rst.reader.return_type_from_context", side_effect=collect)
+    for file in rst_files:
+        reader = RSTWriter("v1.20.0")
+        reader.read_file(file)
+        reader.parse()
+    assert corpus
+
+    # best of 3, to reduce the noise of other processes
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for kwargs in corpus:
+            _type_from_context(**kwargs)
+        timings.append(time.perf_counter() - start)
+    elapsed = min(timings)
+    per_docstring = elapsed / len(corpus) * 1e6
+    print(
+        f"\nreturn type inference: {len(corpus)} docstrings from {len(rst_files)} rst files in {elapsed * 1000:.1f} ms, {per_docstring:.1f} us per docstring"
+    )
+    assert per_docstring < MAX_TIME_PER_DOCSTRING
@@ -1,18 +1,20 @@
 # others
 import json
+import shutil
 import subprocess
 from pathlib import Path
 from typing import Dict, List
 
 import pytest
 from helpers import read_stub
+from mock import MagicMock
 
 import stubber.basicgit as git
 
 pytestmark = pytest.mark.doc_stubs
 
 from stubber.rst.lookup import TYPING_IMPORT
-from stubber.rst.reader import RSTWriter
+from stubber.rst.reader import DocFixer, RSTWriter
 
 # SOT
 from stubber.stubs_from_docs import generate_from_rst
@@ -167,6 +169,27 @@ def test_rst_parse_class_10(line: str):
     assert line in [l.rstrip() for l in r.output], f"did not generate : '{line}'"
 
 
+def test_doc_fixer():
+    fix = DocFixer([("poll(", "class poll("), (".. function:: poll(", ".. class:: poll("), (":class: x\n", ""), ("a / b", "a\nb")])
+    # a single pass, longest match first, replacements are not fixed again
+    text = ".. function:: poll(\n:class: x\n  poll(a / b)\n"
+    assert fix(text) == ".. class:: poll(\n  class poll(a\nb)\n"
+    assert DocFixer([])(text) == text
+
+
+def test_read_file_fixes(tmp_path: Path):
+    rst = tmp_path / "fixes.rst"
+    rst.write_text(".. function:: deque(iterable, maxlen)\n.. method:: AIOESPNow._aiter__() / async AIOESPNow.__anext__()\n")
+    r = RSTWriter()
+    r.read_file(rst)
+    assert r.rst_text == [
+        ".. class:: deque(iterable, maxlen)\n",
+        ".. method:: AIOESPNow._aiter__()\n",
+        "            async AIOESPNow.__anext__()\n",
+    ]
+    assert r.max_line == 2
+
+
 @pytest.mark.parametrize(
     "param_in, expected",
     [
@@ -457,3 +480,61 @@ def test_doc_CONSTANTS(error, modulename, pyright_results, capsys):
     for issue in issues:
         print(f"{issue['message']} in {issue['file']} line {issue['range']['start']['line']}")
     assert len(issues) == 0
+
+
+def test_make_docstubs_jobs(tmp_path: Path, pytestconfig: pytest.Config):
+    "docstubs created in parallel are the same as those created in sequence"
+    from stubber.stubs_from_docs import make_docstubs
+
+    files = list((pytestconfig.rootpath / "tests/rst/data").glob("*.rst"))
+    (tmp_path / "sequential").mkdir()
+    (tmp_path / "parallel").mkdir()
+    sequential = make_docstubs(tmp_path / "sequential", "v1.20.0", "v1.20.0", ".pyi", files)
+    parallel = make_docstubs(tmp_path / "parallel", "v1.20.0", "v1.20.0", ".pyi", files, jobs=3)
+    assert [f.name for f in sequential] == [f.name for f in parallel]
+    assert [f.name for f in sequential] == sorted(f.with_suffix(".pyi").name for f in files)
+    for f in sequential:
+        assert f.read_text() == (tmp_path / "parallel" / f.name).read_text()
+
+
+def test_generate_from_rst_incremental(tmp_path: Path, pytestconfig: pytest.Config, mocker):
+    "only the docstubs of changed rst files are re-generated"
+    import stubber.stubs_from_docs as stubs_from_docs
+
+    rst_folder = tmp_path / "rst"
+    shutil.copytree(pytestconfig.rootpath / "tests/rst/data", rst_folder)
+    dst_folder = tmp_path / "stubs" / "micropython-v1_20_0-docstubs"
+    m_make: MagicMock = mocker.spy(stubs_from_docs, "make_docstub")
+
+    count = generate_from_rst(rst_folder, dst_folder, v_tag="v1.20.0", suffix=".pyi")
+    assert m_make.call_count == count == 6
+    generated = {f.name: f.read_text() for f in dst_folder.glob("*.pyi")}
+    assert len(generated) == 6
+
+    # nothing changed
+    generate_from_rst(rst_folder, dst_folder, v_tag="v1.20.0", suffix=".pyi")
+    assert m_make.call_count == 6
+    assert {f.name: f.read_text() for f in dst_folder.glob("*.pyi")} == generated
+
+    # one rst file changed, one output removed
+    (rst_folder / "class_10.rst").write_text((rst_folder / "class_10.rst").read_text() + "\n")
+    (dst_folder / "function_10.pyi").unlink()
+    generate_from_rst(rst_folder, dst_folder, v_tag="v1.20.0", suffix=".pyi")
+    assert m_make.call_count == 8
+    assert {f.name: f.read_text() for f in dst_folder.glob("*.pyi")} == generated
+
+    # a changed module.xxx.rst file re-generates the module that includes it
+    (rst_folder / "class_10.Sub.rst").write_text("Sub\n")
+    generate_from_rst(rst_folder, dst_folder, v_tag="v1.20.0", suffix=".pyi")
+    assert m_make.call_count == 9
+    assert m_make.call_args.args[0].name == "class_10.rst"
+
+    # a new version tag re-generates all
+    generate_from_rst(rst_folder, dst_folder, v_tag="v1.21.0", suffix=".pyi")
+    assert m_make.call_count == 15
+
+    # a removed rst file removes its docstub
+    (rst_folder / "class_10.rst").unlink()
+    generate_from_rst(rst_folder, dst_folder, v_tag="v1.21.0", suffix=".pyi")
+    assert m_make.call_count == 15
+    assert not (dst_folder / "class_10.pyi").exists()
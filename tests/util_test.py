@@ -1,7 +1,6 @@
 # others
 import shutil
 from pathlib import Path
-from types import SimpleNamespace
 
 import pytest
 from mock import MagicMock
@@ -99,14 +98,12 @@ def test_post_processing(tmp_path, pytestconfig, mocker: MockerFixture):
     # shutil.copytree(source, dest)
 
     m_generate_pyi_files: MagicMock = mocker.patch("stubber.utils.post.generate_pyi_files", autospec=True)
-    return_val = SimpleNamespace()
-    return_val.returncode = 0
-    m_spr: MagicMock = mocker.patch("stubber.utils.post.subprocess.run", autospec=True, return_value=return_val)
+    m_black: MagicMock = mocker.patch("stubber.utils.post.run_black", autospec=True, return_value=0)
 
-    utils.do_post_processing([dest], pyi=True, black=True)
+    utils.do_post_processing([dest], pyi=True, black_format=True)
 
     m_generate_pyi_files.assert_called_once()
-    m_spr.assert_called_once()
+    m_black.assert_called_once()
 
 
 def test_stub_one_file(tmp_path, pytestconfig):
@@ -154,3 +151,49 @@ def test_make_stub_files_issues(tmp_path, pytestconfig):
             pass
 
     assert len(py_files) == PROBLEMATIC, "py and pyi files should match 1:1 and stored in the same folder"
+
+
+def test_stub_groups(tmp_path: Path):
+    from stubber.utils.stubmaker import stub_groups
+
+    for version in ("v1.14", "v1.15"):
+        (tmp_path / version / "umqtt").mkdir(parents=True)
+        (tmp_path / version / "umqtt" / "__init__.py").touch()
+        (tmp_path / version / "umqtt" / "simple.py").touch()
+        (tmp_path / version / "ntptime.py").touch()
+    groups = stub_groups(sorted(tmp_path.rglob("*.py")))
+    # duplicate modules in different subfolders are stubbed in separate groups
+    assert sorted(root.name for root, _ in groups) == ["v1.14", "v1.15"]
+    for root, files in groups:
+        assert len(files) == 3
+        assert all(root in f.parents for f in files)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_make_stub_files_duplicate_modules(tmp_path, pytestconfig, jobs: int):
+    source = pytestconfig.rootpath / "tests/data/stubs-ok/tst-micropython-1_15-frozen"
+    dest = tmp_path / "stubs"
+    shutil.copytree(source / "esp32", dest / "v1.14")
+    shutil.copytree(source / "esp32", dest / "v1.15")
+    for manifest in dest.rglob("modules.json"):
+        manifest.unlink()
+    assert utils.generate_pyi_files(dest, jobs=jobs)
+    py_files = {py.with_suffix("") for py in dest.rglob("*.py")}
+    assert py_files == {pyi.with_suffix("") for pyi in dest.rglob("*.pyi")}
+
+
+def test_generate_pyi_folders(tmp_path, pytestconfig):
+    from stubber.utils.stubmaker import STUBGEN_OPT, generate_pyi_folders
+
+    ok = tmp_path / "ok"
+    issues = tmp_path / "issues"
+    shutil.copytree(pytestconfig.rootpath / "tests/data/stubs-ok/tst-micropython-1_15-frozen/rp2/GENERIC", ok)
+    shutil.copytree(pytestconfig.rootpath / "tests/data/stubs-issues/tst-micropython-linux-1_13", issues)
+    defaults = repr(STUBGEN_OPT)
+
+    failed = generate_pyi_folders([ok, issues], jobs=2)
+    # results are reported per folder
+    assert failed[ok] == []
+    assert [f.name for f in failed[issues]] == ["machine.py"]
+    # the shared options are not changed
+    assert repr(STUBGEN_OPT) == defaults
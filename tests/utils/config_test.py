@@ -0,0 +1,46 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from stubber.utils.config import micropython_versions, readconfig
+
+TAGS = ["v1.9.4", "v1.17", "v1.19.1", "v1.20.0", "v1.21.0", "v1.22.0-preview"]
+
+
+@pytest.mark.mocked
+def test_readconfig_is_lazy(mocker: MockerFixture, tmp_path: Path):
+    m_get_tags = mocker.patch("stubber.utils.config.git.get_tags", autospec=True, return_value=TAGS)
+    config = readconfig()
+    m_get_tags.assert_not_called()
+    mocker.patch.object(type(config), "cache_path", tmp_path)
+    assert config.all_versions == ["v1.17", "v1.19.1", "v1.20.0", "v1.21.0", "v1.22.0-preview"]
+    assert config.stable_version == "v1.21.0"
+    m_get_tags.assert_called_once()
+
+
+@pytest.mark.mocked
+def test_micropython_versions_cached(mocker: MockerFixture, tmp_path: Path):
+    m_get_tags = mocker.patch("stubber.utils.config.git.get_tags", autospec=True, return_value=TAGS)
+    assert micropython_versions(tmp_path, tmp_path / "micropython", minver="v1.20") == ["v1.20.0", "v1.21.0", "v1.22.0-preview"]
+    assert micropython_versions(tmp_path, tmp_path / "micropython") == sorted(TAGS)
+    m_get_tags.assert_called_once()
+    # stale cache is read again from github
+    data = json.loads((tmp_path / "micropython_versions.json").read_text())
+    data["fetched"] = time.time() - 2 * 24 * 60 * 60
+    (tmp_path / "micropython_versions.json").write_text(json.dumps(data))
+    micropython_versions(tmp_path, tmp_path / "micropython")
+    assert m_get_tags.call_count == 2
+
+
+@pytest.mark.mocked
+def test_micropython_versions_offline(mocker: MockerFixture, tmp_path: Path):
+    mocker.patch("stubber.utils.config.git.get_tags", autospec=True, side_effect=ConnectionError("offline"))
+    m_local_tags = mocker.patch("stubber.utils.config.git.get_local_tags", autospec=True, return_value=["v1.19.1", "v1.20.0"])
+    assert micropython_versions(tmp_path, tmp_path / "micropython") == ["v1.19.1", "v1.20.0"]
+    m_local_tags.assert_called_once_with(tmp_path / "micropython")
+    # the local tags are cached as well
+    assert micropython_versions(tmp_path, tmp_path / "micropython") == ["v1.19.1", "v1.20.0"]
+    m_local_tags.assert_called_once()
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+from mock import MagicMock
+from pytest_mock import MockerFixture
+
+import stubber.utils.post as post
+
+
+def test_run_black_in_process(tmp_path: Path, mocker: MockerFixture):
+    (tmp_path / "foo.py").write_text("def foo( a,b ):\n  return a\n")
+    (tmp_path / "foo.pyi").write_text("def foo( a,b ): ...\n\n\n\ndef bar(): ...\n")
+    (tmp_path / "bad.py").write_text("def foo(:\n")
+    m_spr: MagicMock = mocker.patch("subprocess.run", autospec=True)
+
+    # one file cannot be parsed
+    assert post.run_black(tmp_path) == 123
+    m_spr.assert_not_called()
+    assert (tmp_path / "foo.py").read_text() == "def foo(a, b):\n    return a\n"
+    assert (tmp_path / "foo.pyi").read_text() == "def foo(a, b): ...\ndef bar(): ...\n"
+
+
+def test_format_files_skips_formatted(tmp_path: Path, mocker: MockerFixture):
+    file = tmp_path / "machine.pyi"
+    file.write_text("class Pin( object ): ...\n")
+    m_format: MagicMock = mocker.spy(post.black, "format_file_in_place")
+    assert post.format_files([file]) == 0
+    assert post.format_files([file]) == 0
+    assert m_format.call_count == 1
+    # changed content is formatted again
+    file.write_text(file.read_text() + "def foo( ): ...\n")
+    assert post.format_files([file]) == 0
+    assert m_format.call_count == 2
+
+
+def test_run_autoflake_in_process(tmp_path: Path, mocker: MockerFixture):
+    "unused standard library imports are removed from .py and .pyi files, without starting a subprocess"
+    for name in ["foo.py", "foo.pyi", "bar.pyi"]:
+        (tmp_path / name).write_text("import os\nimport sys\nfrom typing import Any\n\nx: Any = sys.path\n")
+    m_spr: MagicMock = mocker.patch("subprocess.run", autospec=True)
+
+    assert post.run_autoflake(tmp_path, process_pyi=True, jobs=2) == 0
+    m_spr.assert_not_called()
+    for name in ["foo.py", "foo.pyi", "bar.pyi"]:
+        assert (tmp_path / name).read_text() == "import sys\nfrom typing import Any\n\nx: Any = sys.path\n"
+
+
+def test_run_autoflake_skips_clean(tmp_path: Path, mocker: MockerFixture):
+    (tmp_path / "foo.py").write_text("import os\n")
+    (tmp_path / "foo.pyi").write_text("import os\n")
+    m_fix: MagicMock = mocker.spy(post.autoflake, "fix_code")
+    assert post.run_autoflake(tmp_path) == 0
+    # .pyi files are only processed on request
+    assert (tmp_path / "foo.pyi").read_text() == "import os\n"
+    assert m_fix.call_count == 1
+    assert post.run_autoflake(tmp_path) == 0
+    assert m_fix.call_count == 1
+
+
+def test_black_mode_from_pyproject(tmp_path: Path):
+    "the black settings are read from the nearest pyproject.toml, but the line length is always 140"
+    (tmp_path / "pyproject.toml").write_text("[tool.black]\nline-length = 40\ntarget-version = ['py38']\n")
+    (tmp_path / "stubs").mkdir()
+    file = tmp_path / "stubs" / "foo.py"
+    file.write_text("def foo(first, second, third, fourth, fifth): ...\n")
+    mode = post.black_mode((tmp_path / "stubs").absolute(), False)
+    assert mode.line_length == post.LINE_LENGTH == 140
+    assert mode.target_versions == {post.TargetVersion.PY38}
+    assert post.format_files([file]) == 0
+    assert file.read_text() == "def foo(first, second, third, fourth, fifth):\n    ...\n"
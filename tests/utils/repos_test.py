@@ -1,7 +1,11 @@
+from pathlib import Path
+
 import pytest
+from pytest_mock import MockerFixture
 
 # module under test :
 from stubber.commands.switch_cmd import VERSION_LIST
+from stubber.utils import repos
 from stubber.utils.repos import read_micropython_lib_commits
 
 
@@ -13,3 +17,20 @@ def test_stubber_switch_version_commit_list(version: str):
         assert len(mpy_lib_commits) > 0
         assert version in mpy_lib_commits, "match"
     # TODO : check latest / master
+
+
+def test_fetch_repos_without_stubs_repo(mocker: MockerFixture, tmp_path: Path):
+    "the stubs repo is optional, failing to fetch it does not stop the switch"
+    mpy_path, mpy_lib_path = tmp_path / "micropython", tmp_path / "micropython-lib"
+
+    def fetch(repo: Path):
+        if repo not in (mpy_path, mpy_lib_path):
+            raise ChildProcessError("fatal: not a git repository")
+        return True
+
+    m_fetch = mocker.patch("stubber.utils.repos.git.fetch", autospec=True, side_effect=fetch)
+    m_switch = mocker.patch("stubber.utils.repos.switch_repos", autospec=True, return_value=True)
+    mocker.patch("stubber.utils.repos.git.get_local_tag", autospec=True, return_value="v1.20.0")
+    assert repos.fetch_repos("v1.20.0", mpy_path, mpy_lib_path)
+    assert m_fetch.call_count == 3
+    m_switch.assert_called_once_with("v1.20.0", mpy_path, mpy_lib_path)